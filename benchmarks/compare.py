@@ -0,0 +1,54 @@
+"""Compare two benchmarks.run result files.
+
+    python -m benchmarks.compare before.json after.json [--threshold 10]
+
+Prints median timings side by side and exits non-zero if any target got
+slower by more than ``--threshold`` percent.
+"""
+import argparse
+import json
+import sys
+
+
+def compare(before: dict, after: dict, threshold: float) -> tuple[list[str], list[str]]:
+    lines = [f"{'target':<28} {'before ms':>11} {'after ms':>11} {'change':>9}"]
+    regressions = []
+    names = list(before["results"]) + [n for n in after["results"] if n not in before["results"]]
+    for name in names:
+        old = before["results"].get(name)
+        new = after["results"].get(name)
+        if old is None or new is None:
+            lines.append(f"{name:<28} {'—' if old is None else old['median_ms']:>11} "
+                         f"{'—' if new is None else new['median_ms']:>11} {'':>9}")
+            continue
+        change = (new["median_ms"] - old["median_ms"]) / old["median_ms"] * 100 if old["median_ms"] else 0.0
+        lines.append(f"{name:<28} {old['median_ms']:>11.3f} {new['median_ms']:>11.3f} {change:>+8.1f}%")
+        if change > threshold:
+            regressions.append(name)
+    return lines, regressions
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--threshold", type=float, default=10.0, help="allowed slowdown in percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+
+    print(f"before: {before['meta'].get('commit')}  {before['meta'].get('volumes')}")
+    print(f"after:  {after['meta'].get('commit')}  {after['meta'].get('volumes')}")
+    lines, regressions = compare(before, after, args.threshold)
+    print("\n".join(lines))
+    if regressions:
+        print(f"\nSlower by more than {args.threshold}%: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
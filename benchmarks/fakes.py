@@ -0,0 +1,68 @@
+"""Stand-ins for Telegram objects and the connection pool used by the
+benchmark scripts."""
+from dataclasses import dataclass, field
+
+
+class FakeBot:
+    """Just enough of aiogram.Bot for the scheduler jobs."""
+
+    def __init__(self):
+        self.sent = 0
+
+    async def send_message(self, chat_id, text, reply_markup=None, **kwargs):
+        self.sent += 1
+
+
+@dataclass
+class FakeMessage:
+    text: str = ""
+    edits: int = 0
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        self.edits += 1
+
+    async def answer(self, text, reply_markup=None, **kwargs):
+        self.edits += 1
+
+
+@dataclass
+class FakeCallback:
+    data: str
+    message: FakeMessage = field(default_factory=FakeMessage)
+    answers: int = 0
+
+    async def answer(self, text=None, show_alert=False, **kwargs):
+        self.answers += 1
+
+
+class SingleConnectionPool:
+    """Stands in for asyncpg.Pool on top of one connection, so a benchmark
+    can run model code inside a transaction and roll it back."""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    async def fetch(self, query, *args, **kwargs):
+        return await self.conn.fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        return await self.conn.fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        return await self.conn.fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        return await self.conn.execute(query, *args, **kwargs)
+
+    def acquire(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return None
+
+    def __getattr__(self, name):
+        return getattr(self.conn, name)
@@ -0,0 +1,226 @@
+"""Load test: synthetic updates through the real Dispatcher.
+
+Builds the dispatcher from bot.main against the benchmark database and a
+local fake Bot API (benchmarks.fake_api), feeds a mix of /list, page
+navigation and pay_* callback updates at a target rate, and reports
+handler latency percentiles and achieved updates/second as JSON.
+
+    python -m benchmarks.load --rate 200 --duration 30 --latency-ms 40 --rate-limit-ratio 0.01
+
+pay_* callbacks really mark payments, so run it against a scratch
+database seeded with benchmarks.seed.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import statistics
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiogram.types import Update
+
+from bot import db, models
+from bot.config import config
+from bot.fsm_storage import PostgresStorage
+from bot.keyboards.callback_data import HosterListPage, HosterServers, PayDone, PayOk, PayProblem, ServerPage
+from bot.keyboards.inline import HOSTER_PAGE_SIZE
+from bot.main import create_dispatcher
+from benchmarks import seed
+from benchmarks.fake_api import FakeTelegramAPI, start_server
+
+logger = logging.getLogger(__name__)
+
+FAKE_TOKEN = "123456:load-test-token"
+CHAT_ID = 1000
+# Relative weights of the synthetic update kinds.
+MIX = {"list": 1, "hoster_page": 3, "hoster_servers": 3, "server_page": 3, "pay": 2}
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+class UpdateFactory:
+    def __init__(self, samples: dict, seed_value: int = 0):
+        self.samples = samples
+        self._ids = itertools.count(1)
+        self._random = random.Random(seed_value)
+        self._kinds = [k for k, w in MIX.items() for _ in range(w)]
+
+    def _user(self) -> dict:
+        return {"id": CHAT_ID, "is_bot": False, "first_name": "Load"}
+
+    def _message(self, message_id: int, text: str, **extra) -> dict:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": CHAT_ID, "type": "private"},
+            "from": self._user(),
+            "text": text,
+            **extra,
+        }
+
+    def _callback(self, update_id: int, data: str) -> dict:
+        return {
+            "update_id": update_id,
+            "callback_query": {
+                "id": str(update_id),
+                "from": self._user(),
+                "chat_instance": "load",
+                "data": data,
+                "message": self._message(update_id, "Ваши хостеры:"),
+            },
+        }
+
+    def next(self) -> tuple[str, dict]:
+        update_id = next(self._ids)
+        kind = self._random.choice(self._kinds)
+        s = self.samples
+        if kind == "list":
+            return kind, {
+                "update_id": update_id,
+                "message": self._message(
+                    update_id, "/list", entities=[{"type": "bot_command", "offset": 0, "length": 5}],
+                ),
+            }
+        if kind == "hoster_page":
+            data = HosterListPage(page=1, before=False, cursor=self._random.choice(s["hoster_cursors"]))
+        elif kind == "hoster_servers":
+            data = HosterServers(hoster_id=self._random.choice(s["hosters"]))
+        elif kind == "server_page":
+            data = ServerPage(page=1, before=False, cursor=self._random.choice(s["server_ids"]))
+        else:
+            action = self._random.choice((PayDone, PayOk, PayProblem))
+            data = action(payment_id=self._random.choice(s["payment_ids"]))
+        return kind, self._callback(update_id, data.pack())
+
+
+async def _samples() -> dict:
+    pool = db.get_pool()
+    hosters = [r["hoster_id"] for r in await pool.fetch(
+        "SELECT hoster_id FROM hoster_stats ORDER BY hoster LIMIT 200")]
+    server_ids = [r["id"] for r in await pool.fetch(
+        "SELECT id FROM servers WHERE is_active ORDER BY id DESC LIMIT 500")]
+    payment_ids = [r["id"] for r in await pool.fetch(
+        "SELECT id FROM payments WHERE status = 'pending' ORDER BY due_date, id LIMIT 500")]
+    return {
+        "hosters": hosters,
+        "hoster_cursors": hosters[:max(1, len(hosters) - HOSTER_PAGE_SIZE)],
+        "server_ids": server_ids,
+        "payment_ids": payment_ids,
+    }
+
+
+async def drive(bot: Bot, dp, factory: UpdateFactory, rate: float, duration: float) -> dict:
+    latencies: dict[str, list[float]] = {k: [] for k in MIX}
+    errors: dict[str, int] = {k: 0 for k in MIX}
+    tasks: set[asyncio.Task] = set()
+
+    async def handle(kind: str, raw: dict) -> None:
+        update = Update.model_validate(raw, context={"bot": bot})
+        started = time.perf_counter()
+        try:
+            await dp.feed_update(bot, update)
+        except Exception:
+            errors[kind] += 1
+            logger.debug("Update %s failed", raw["update_id"], exc_info=True)
+            return
+        latencies[kind].append(time.perf_counter() - started)
+
+    interval = 1 / rate
+    started = time.perf_counter()
+    sent = 0
+    while time.perf_counter() - started < duration:
+        kind, raw = factory.next()
+        task = asyncio.create_task(handle(kind, raw))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+        sent += 1
+        # Fixed schedule (not fixed sleep) so slow handlers don't lower the offered rate.
+        delay = started + sent * interval - time.perf_counter()
+        if delay > 0:
+            await asyncio.sleep(delay)
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+
+    def summary(values: list[float]) -> dict:
+        ms = sorted(v * 1000 for v in values)
+        return {
+            "count": len(ms),
+            "p50_ms": round(_percentile(ms, 0.50), 2),
+            "p99_ms": round(_percentile(ms, 0.99), 2),
+            "mean_ms": round(statistics.fmean(ms), 2) if ms else 0.0,
+        }
+
+    all_latencies = [v for values in latencies.values() for v in values]
+    return {
+        "offered_rate": rate,
+        "sent": sent,
+        "completed": len(all_latencies),
+        "errors": sum(errors.values()),
+        "elapsed_s": round(elapsed, 2),
+        "updates_per_second": round(len(all_latencies) / elapsed, 1),
+        "overall": summary(all_latencies),
+        "by_kind": {k: {**summary(v), "errors": errors[k]} for k, v in latencies.items()},
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rate", type=float, default=100.0, help="offered updates per second")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--api-url", help="use an already running fake API instead of starting one")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency-ms", type=float, default=30.0)
+    parser.add_argument("--jitter-ms", type=float, default=10.0)
+    parser.add_argument("--rate-limit-ratio", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    api = runner = None
+    api_url = args.api_url
+    if api_url is None:
+        api = FakeTelegramAPI(args.latency_ms, args.jitter_ms, args.rate_limit_ratio, args.retry_after)
+        runner = await start_server(api, port=args.port)
+        api_url = f"http://127.0.0.1:{args.port}"
+
+    config.database_url = seed.bench_dsn()
+    await db.init_db()
+    await models.init_settings_cache()
+    storage = PostgresStorage()
+    await storage.start()
+    session = AiohttpSession(api=TelegramAPIServer.from_base(api_url))
+    bot = Bot(token=FAKE_TOKEN, session=session)
+    dp = create_dispatcher(storage)
+    try:
+        factory = UpdateFactory(await _samples())
+        report = await drive(bot, dp, factory, args.rate, args.duration)
+        if api is not None:
+            report["fake_api"] = api.stats()
+    finally:
+        await bot.session.close()
+        await storage.close()
+        await db.close_db()
+        if runner is not None:
+            await runner.cleanup()
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(main())
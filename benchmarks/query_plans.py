@@ -0,0 +1,223 @@
+"""Query-plan regression check for the hot queries.
+
+Runs the real model/scheduler functions against the benchmark database
+with a pool stand-in that EXPLAINs every statement before executing it,
+and fails if any of them plans a sequential scan over a large table, or
+if a due-date query scans more monthly payments partitions than its window
+covers (partition pruning stopped working). Also checks that problem
+reminders still reach problem payments older than the retention window.
+
+    python -m benchmarks.query_plans [--seed]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import sys
+
+from bot import archive, db, models, scheduler
+from benchmarks import seed
+from benchmarks.fakes import FakeBot, SingleConnectionPool
+
+logger = logging.getLogger(__name__)
+
+# Tables that grow with the fleet; a Seq Scan on them is a regression.
+LARGE_TABLES = ("servers", "payments")
+# Partitions below this many rows (future months, the default partition)
+# are cheaper to scan than to probe; scans on them are not regressions.
+SMALL_TABLE_ROWS = 1000
+
+
+def partition_budget() -> dict[str, int]:
+    """Hot query -> payments partitions it may touch (its months, plus the default)."""
+    return {
+        "get_upcoming_payments": 2 + 1,
+        "notify_due_payments": 2 + 1,
+    }
+
+
+class _Rollback(Exception):
+    pass
+
+
+class ExplainingPool(SingleConnectionPool):
+    """Records EXPLAIN output for each query, then runs it."""
+
+    def __init__(self, conn):
+        super().__init__(conn)
+        self.plans: list[tuple[str, dict]] = []
+
+    async def _explain(self, query: str, args) -> None:
+        raw = await self.conn.fetchval("EXPLAIN (FORMAT JSON) " + query, *args)
+        self.plans.append((query, json.loads(raw)[0]["Plan"]))
+
+    async def fetch(self, query, *args, **kwargs):
+        await self._explain(query, args)
+        return await super().fetch(query, *args, **kwargs)
+
+    async def fetchrow(self, query, *args, **kwargs):
+        await self._explain(query, args)
+        return await super().fetchrow(query, *args, **kwargs)
+
+    async def fetchval(self, query, *args, **kwargs):
+        await self._explain(query, args)
+        return await super().fetchval(query, *args, **kwargs)
+
+    async def execute(self, query, *args, **kwargs):
+        if args:
+            await self._explain(query, args)
+        return await super().execute(query, *args, **kwargs)
+
+
+def _seq_scans(plan: dict) -> list[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        relation = plan.get("Relation Name", "")
+        if any(relation == t or relation.startswith(t + "_") for t in LARGE_TABLES):
+            found.append(relation)
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def _payment_partitions(plan: dict) -> set[str]:
+    found = set()
+    if plan.get("Relation Name", "").startswith("payments_"):
+        found.add(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found |= _payment_partitions(child)
+    return found
+
+
+async def _small_relations(conn, names: set[str]) -> set[str]:
+    rows = await conn.fetch(
+        "SELECT relname FROM pg_class WHERE relname = ANY($1::text[]) AND reltuples < $2",
+        list(names), SMALL_TABLE_ROWS,
+    )
+    return {r["relname"] for r in rows}
+
+
+async def _sample_ids(conn) -> dict:
+    row = await conn.fetchrow(
+        """
+        SELECT
+            (SELECT hoster FROM hoster_stats ORDER BY hoster OFFSET 10 LIMIT 1) AS hoster,
+            (SELECT hoster_id FROM hoster_stats ORDER BY hoster OFFSET 10 LIMIT 1) AS hoster_id,
+            (SELECT id FROM servers WHERE is_active ORDER BY id DESC LIMIT 1) AS server_id,
+            (SELECT id FROM payments WHERE status = 'pending' ORDER BY id DESC LIMIT 1) AS payment_id
+        """
+    )
+    return dict(row)
+
+
+def hot_queries(sample: dict) -> dict:
+    """name -> zero-argument coroutine factory exercising one hot path."""
+    return {
+        "get_upcoming_payments": lambda: models.get_upcoming_payments(14),
+        "notify_due_payments": lambda: scheduler.notify_due_payments(FakeBot()),
+        "check_problems": lambda: scheduler.check_problems(FakeBot()),
+        "list_hosters_page": lambda: models.list_hosters_page(sample["hoster_id"]),
+        "list_servers_page": lambda: models.list_servers_page(hoster_id=sample["hoster_id"]),
+        "list_servers_page_cursor": lambda: models.list_servers_page(cursor_id=sample["server_id"]),
+        "list_servers_by_hoster": lambda: models.list_servers_by_hoster(sample["hoster"]),
+        "hoster_listing": lambda: models.hoster_listing(sample["server_id"]),
+        "get_server": lambda: models.get_server(sample["server_id"]),
+        "get_payment": lambda: models.get_payment(sample["payment_id"]),
+    }
+
+
+async def check_plans(conn) -> list[tuple[str, str, str]]:
+    """Run every hot query; return (name, query, problem) failures."""
+    sample = await _sample_ids(conn)
+    budget = partition_budget()
+    failures = []
+    for name, run in hot_queries(sample).items():
+        pool = ExplainingPool(conn)
+        db.pool = pool
+        try:
+            # Writes made by the job under test are rolled back.
+            async with conn.transaction():
+                await run()
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            db.pool = None
+        for query, plan in pool.plans:
+            scans = set(_seq_scans(plan))
+            scans -= await _small_relations(conn, scans)
+            if scans:
+                failures.append((name, query, f"sequential scan on {', '.join(sorted(scans))}"))
+            partitions = _payment_partitions(plan)
+            if name in budget and len(partitions) > budget[name]:
+                failures.append((name, query, f"{len(partitions)} payments partitions scanned, expected <= {budget[name]}"))
+        logger.info("%-28s %d statement(s) checked", name, len(pool.plans))
+    return failures
+
+
+async def check_old_problems(conn) -> list[str]:
+    """Problem reminders must not skip payments older than the retention window.
+
+    Such months are never archived while they hold a problem payment.
+    """
+    server_id = await conn.fetchval("SELECT id FROM servers WHERE is_active ORDER BY id LIMIT 1")
+    due = archive.retention_start() - datetime.timedelta(days=40)
+    failures = []
+    db.pool = SingleConnectionPool(conn)
+    try:
+        async with conn.transaction():
+            payment_id = await conn.fetchval(
+                """
+                INSERT INTO payments (server_id, due_date, status) VALUES ($1, $2, 'problem')
+                ON CONFLICT (server_id, due_date) DO UPDATE SET status = 'problem'
+                RETURNING id
+                """,
+                server_id, due,
+            )
+            await scheduler.check_problems(FakeBot(), run_key="query_plans")
+            if not await conn.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM outbox WHERE dedupe_key = $1)", f"problem:{payment_id}:query_plans",
+            ):
+                failures.append(f"no reminder queued for problem payment {payment_id} due {due}")
+            raise _Rollback
+    except _Rollback:
+        pass
+    finally:
+        db.pool = None
+    return failures
+
+
+async def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", action="store_true", help="reset and seed the benchmark database first")
+    parser.add_argument("--servers", type=int, default=seed.DEFAULT_SERVERS)
+    parser.add_argument("--hosters", type=int, default=seed.DEFAULT_HOSTERS)
+    parser.add_argument("--months", type=int, default=seed.DEFAULT_MONTHS)
+    args = parser.parse_args()
+
+    conn = await seed.connect()
+    try:
+        if args.seed:
+            await seed.reset_schema(conn)
+            await seed.seed(conn, args.servers, args.hosters, args.months)
+        failures = await check_plans(conn)
+        old_problems = await check_old_problems(conn)
+    finally:
+        await conn.close()
+
+    for name, query, problem in failures:
+        logger.error("%s: %s\n%s", name, problem, query.strip())
+    for problem in old_problems:
+        logger.error("check_problems: %s", problem)
+    if failures:
+        logger.error("%d hot query plan(s) regressed", len(failures))
+    if failures or old_problems:
+        return 1
+    logger.info("All hot query plans use indexes and prune partitions")
+    return 0
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,65 @@
+"""Microbenchmark: dict(record) vs slotted row classes on a large listing.
+
+Fetches ``--rows`` servers from the benchmark database once, then times
+and measures (tracemalloc) converting them into each representation.
+
+    python -m benchmarks.row_types --rows 100000
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+
+from bot.models import Server
+from benchmarks import seed
+
+REPEATS = 5
+
+
+def _measure(convert, records) -> dict:
+    best = float("inf")
+    for _ in range(REPEATS):
+        gc.collect()
+        started = time.perf_counter()
+        result = convert(records)
+        best = min(best, time.perf_counter() - started)
+        del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = convert(records)
+    retained, _peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"seconds": round(best, 4), "retained_bytes": retained}
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    conn = await seed.connect()
+    try:
+        records = await conn.fetch("SELECT * FROM servers ORDER BY id LIMIT $1", args.rows)
+    finally:
+        await conn.close()
+
+    results = {
+        "rows": len(records),
+        "dict": _measure(lambda rs: [dict(r) for r in rs], records),
+        "Server": _measure(lambda rs: [Server.from_record(r) for r in rs], records),
+    }
+    base, slotted = results["dict"], results["Server"]
+    results["saved"] = {
+        "seconds": round(base["seconds"] - slotted["seconds"], 4),
+        "retained_bytes": base["retained_bytes"] - slotted["retained_bytes"],
+        "bytes_per_row": round((base["retained_bytes"] - slotted["retained_bytes"]) / max(1, len(records)), 1),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
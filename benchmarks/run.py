@@ -0,0 +1,270 @@
+"""Benchmark suite for the model, scheduler and callback hot paths.
+
+Seeds (optionally) the database given by BENCH_DATABASE_URL, times each
+target and writes JSON that benchmarks.compare can diff between commits.
+
+    python -m benchmarks.run --seed --servers 100000 --hosters 2000 --months 36 -o before.json
+    python -m benchmarks.run -o after.json
+    python -m benchmarks.compare before.json after.json
+
+Every iteration runs inside a transaction that is rolled back, so write
+paths (payment generation, deletes, pay_* callbacks) see the same data
+each time. Telegram rate limits are lifted: the fake bot answers
+instantly and only our own code is measured.
+"""
+import argparse
+import asyncio
+import datetime
+import io
+import json
+import logging
+import platform
+import statistics
+import subprocess
+import time
+
+from aiogram.filters.callback_data import CallbackData
+
+from bot import db, exporter, importer, models, scheduler, screens
+from bot.config import config
+from bot.handlers import callbacks
+from bot.keyboards.callback_data import (
+    BackToHoster,
+    HosterListPage,
+    HosterServers,
+    PayDone,
+    PayOk,
+    PayProblem,
+    ServerDelete,
+    ServerDeleteConfirm,
+    ServerInfo,
+    ServerPage,
+)
+from bot.keyboards.inline import HOSTER_PAGE_SIZE, SERVER_PAGE_SIZE
+from benchmarks import seed
+from benchmarks.fakes import FakeBot, FakeCallback, FakeMessage, SingleConnectionPool
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ITERATIONS = 20
+# /import benchmark upload: half the rows update existing servers, half are new.
+IMPORT_ROWS = 10_000
+
+
+class _Rollback(Exception):
+    pass
+
+
+async def _samples(conn) -> dict:
+    row = await conn.fetchrow(
+        """
+        WITH h AS (
+            SELECT hoster, hoster_id FROM hoster_stats ORDER BY server_count DESC, hoster LIMIT 1
+        )
+        SELECT
+            (SELECT hoster FROM h) AS hoster,
+            (SELECT hoster_id FROM h) AS hoster_id,
+            (SELECT hoster_id FROM hoster_stats ORDER BY hoster OFFSET $1 LIMIT 1) AS hoster_cursor,
+            (SELECT s.id FROM servers s, h WHERE s.hoster_id = h.hoster_id AND s.is_active
+             ORDER BY s.server_name, s.id OFFSET $2 LIMIT 1) AS server_cursor,
+            (SELECT s.id FROM servers s, h WHERE s.hoster_id = h.hoster_id AND s.is_active
+             ORDER BY s.id DESC LIMIT 1) AS server_id,
+            (SELECT id FROM payments WHERE status = 'pending' ORDER BY due_date DESC, id LIMIT 1) AS payment_id
+        """,
+        HOSTER_PAGE_SIZE - 1, SERVER_PAGE_SIZE - 1,
+    )
+    return dict(row)
+
+
+async def _import_csv(conn, rows: int = IMPORT_ROWS) -> bytes:
+    existing = await conn.fetch(
+        "SELECT hoster, server_name FROM servers WHERE is_active ORDER BY id LIMIT $1", rows // 2,
+    )
+    lines = ["hoster,server_name,payment_day,payment_type,monthly_cost,currency,count"]
+    lines += [f"{r['hoster']},{r['server_name']},15,invoice,42.00,EUR,2" for r in existing]
+    lines += [f"import-{i % 50},imported-{i},{1 + i % 28},auto,{10 + i % 90},USD,1" for i in range(rows - len(existing))]
+    return "\n".join(lines).encode()
+
+
+def _callback(data: str, text: str = "") -> FakeCallback:
+    return FakeCallback(data=data, message=FakeMessage(text=text))
+
+
+async def _drain(rows) -> int:
+    return sum([1 async for _ in rows])
+
+
+async def _export(kind: str, **filters) -> int:
+    async with exporter.export(kind, **filters) as result:
+        return result.rows
+
+
+async def _cached(render) -> object:
+    """Serve a screen through the render cache, as with a live LISTEN connection.
+
+    The cache outlives the per-iteration rollback, so every iteration after
+    the first is a hit.
+    """
+    data_version = models.data_version
+    models.data_version = lambda: 0
+    try:
+        return await render()
+    finally:
+        models.data_version = data_version
+
+
+async def _check_and_drain(bot) -> None:
+    # Queue the day's reminders and deliver them, as the two jobs do.
+    await scheduler.check_and_notify(bot)
+    await scheduler.drain_outbox(bot)
+
+
+def _call(handler, data: CallbackData, text: str = ""):
+    return handler(_callback(data.pack(), text), data)
+
+
+def targets(sample: dict) -> dict:
+    """name -> zero-argument coroutine factory."""
+    bot = FakeBot()
+    hoster, hoster_id = sample["hoster"], sample["hoster_id"]
+    server_id, payment_id = sample["server_id"], sample["payment_id"]
+    return {
+        # Models / scheduler
+        "generate_monthly_payments": lambda: scheduler.generate_monthly_payments(),
+        # Steady state (no server lags the current month) vs. the full-fleet baseline.
+        "generate_payments_steady": lambda: models.generate_payments(datetime.date.today(), 0),
+        "generate_payments_for_month": lambda: models.generate_payments_for_month(datetime.date.today()),
+        "check_and_notify": lambda: _check_and_drain(bot),
+        "check_problems": lambda: scheduler.check_problems(bot),
+        "list_hosters": lambda: models.list_hosters(),
+        "list_hosters_page": lambda: models.list_hosters_page(limit=HOSTER_PAGE_SIZE),
+        "list_servers_by_hoster": lambda: models.list_servers_by_hoster(hoster),
+        "list_servers_page": lambda: models.list_servers_page(hoster_id=hoster_id, limit=SERVER_PAGE_SIZE),
+        "get_upcoming_payments": lambda: models.get_upcoming_payments(14),
+        "iter_upcoming_payments": lambda: _drain(models.iter_upcoming_payments(14)),
+        "get_month_stats": lambda: models.get_month_stats(datetime.date(2000, 1, 1), datetime.date(2100, 1, 1)),
+        "get_monthly_spend": lambda: models.get_monthly_spend(),
+        "export_servers": lambda: _export("servers"),
+        "export_payments_quarter": lambda: _export(
+            "payments", start=datetime.date.today() - datetime.timedelta(days=91), end=datetime.date.today()),
+        "import_servers": lambda: importer.import_servers(io.BytesIO(sample["import_csv"]), "bench.csv"),
+        # Callback handlers (handlers/callbacks.py)
+        "cb_noop": lambda: callbacks.cb_noop(_callback("noop")),
+        "cb_hoster_list_page": lambda: _call(
+            callbacks.cb_hoster_list_page, HosterListPage(page=1, before=False, cursor=sample["hoster_cursor"])),
+        "cb_hoster_page": lambda: _call(
+            callbacks.cb_hoster_page, ServerPage(page=1, before=False, cursor=sample["server_cursor"])),
+        "cb_hoster_servers": lambda: _call(callbacks.cb_hoster_servers, HosterServers(hoster_id=hoster_id)),
+        "cb_server_info": lambda: _call(callbacks.cb_server_info, ServerInfo(server_id=server_id)),
+        "cb_server_delete_confirm": lambda: _call(
+            callbacks.cb_server_delete_confirm, ServerDelete(server_id=server_id)),
+        "cb_server_delete": lambda: _call(callbacks.cb_server_delete, ServerDeleteConfirm(server_id=server_id)),
+        "cb_back_list": lambda: callbacks.cb_back_list(_callback("srv_back_list")),
+        "cb_back_hoster": lambda: _call(callbacks.cb_back_hoster, BackToHoster(server_id=server_id)),
+        # The same screens served from the render cache (the callbacks above bypass it: no LISTEN here)
+        "screen_hoster_list_cached": lambda: _cached(lambda: screens.hoster_list(1, sample["hoster_cursor"])),
+        "screen_hoster_servers_cached": lambda: _cached(lambda: screens.hoster_servers(hoster_id)),
+        "screen_server_page_cached": lambda: _cached(
+            lambda: screens.server_page(1, sample["server_cursor"], False)),
+        "cb_pay_done": lambda: _call(callbacks.cb_pay_done, PayDone(payment_id=payment_id), "Оплата"),
+        "cb_pay_ok": lambda: _call(callbacks.cb_pay_ok, PayOk(payment_id=payment_id), "Списание"),
+        "cb_pay_problem": lambda: _call(callbacks.cb_pay_problem, PayProblem(payment_id=payment_id), "Списание"),
+    }
+
+
+async def _time(conn, run, iterations: int) -> dict:
+    timings = []
+    for _ in range(iterations):
+        try:
+            async with conn.transaction():
+                started = time.perf_counter()
+                await run()
+                timings.append(time.perf_counter() - started)
+                raise _Rollback
+        except _Rollback:
+            pass
+    timings.sort()
+    ms = [t * 1000 for t in timings]
+    return {
+        "iterations": iterations,
+        "min_ms": round(ms[0], 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+    }
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(conn, iterations: int, only: list[str] | None = None) -> dict:
+    await models.set_setting("notify_chat_id", "1")
+    sample = await _samples(conn)
+    sample["import_csv"] = await _import_csv(conn)
+    results = {}
+    for name, target in targets(sample).items():
+        if only and name not in only:
+            continue
+        results[name] = await _time(conn, target, iterations)
+        logger.info("%-26s median %9.3f ms", name, results[name]["median_ms"])
+    volumes = await conn.fetchrow(
+        "SELECT (SELECT COUNT(*) FROM servers) AS servers,"
+        " (SELECT COUNT(*) FROM hoster_stats) AS hosters,"
+        " (SELECT COUNT(*) FROM payments) AS payments"
+    )
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "volumes": dict(volumes),
+        },
+        "results": results,
+    }
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--seed", action="store_true", help="reset and seed the benchmark database first")
+    parser.add_argument("--servers", type=int, default=seed.DEFAULT_SERVERS)
+    parser.add_argument("--hosters", type=int, default=seed.DEFAULT_HOSTERS)
+    parser.add_argument("--months", type=int, default=seed.DEFAULT_MONTHS)
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--only", nargs="*", help="run just these targets")
+    parser.add_argument("-o", "--output", help="write JSON results here (default: stdout)")
+    args = parser.parse_args()
+
+    dsn = seed.bench_dsn()
+    config.database_url = dsn
+    config.notify_global_rate = config.notify_per_chat_rate = 1e9
+
+    conn = await seed.connect(dsn)
+    db.pool = SingleConnectionPool(conn)
+    try:
+        if args.seed:
+            await seed.reset_schema(conn)
+            await seed.seed(conn, args.servers, args.hosters, args.months)
+        await models.init_settings_cache()
+        report = await run(conn, args.iterations, args.only)
+    finally:
+        db.pool = None
+        await db.close_db()
+        await conn.close()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(main())
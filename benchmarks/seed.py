@@ -0,0 +1,133 @@
+"""Synthetic dataset for benchmarks and query-plan checks.
+
+Works against a scratch database given by BENCH_DATABASE_URL (never the
+bot's DATABASE_URL). ``--reset`` drops the public schema there and
+re-applies migrations/ before seeding.
+
+    python -m benchmarks.seed --reset --servers 100000 --hosters 2000 --months 36
+"""
+import argparse
+import asyncio
+import logging
+import os
+import pathlib
+import time
+
+import asyncpg
+
+from bot.db import _init_connection
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = pathlib.Path(__file__).resolve().parent.parent / "migrations"
+
+DEFAULT_SERVERS = 100_000
+DEFAULT_HOSTERS = 2_000
+DEFAULT_MONTHS = 36
+# One payment in PROBLEM_EVERY is left in 'problem' state.
+PROBLEM_EVERY = 1000
+
+
+def bench_dsn() -> str:
+    dsn = os.getenv("BENCH_DATABASE_URL", "")
+    if not dsn:
+        raise SystemExit("BENCH_DATABASE_URL is not set")
+    return dsn
+
+
+async def connect(dsn: str | None = None) -> asyncpg.Connection:
+    conn = await asyncpg.connect(dsn or bench_dsn())
+    await _init_connection(conn)
+    return conn
+
+
+async def reset_schema(conn: asyncpg.Connection) -> None:
+    await conn.execute("DROP SCHEMA public CASCADE; CREATE SCHEMA public;")
+    for path in sorted(MIGRATIONS_DIR.glob("*.sql")):
+        logger.info("Applying %s", path.name)
+        await conn.execute(path.read_text())
+
+
+async def seed(
+    conn: asyncpg.Connection,
+    servers: int = DEFAULT_SERVERS,
+    hosters: int = DEFAULT_HOSTERS,
+    months: int = DEFAULT_MONTHS,
+) -> None:
+    """Insert ``servers`` servers spread over ``hosters`` hosters and
+    ``months`` months of payment history up to the current month.
+
+    Everything is derived from generate_series, so the same arguments
+    always produce the same data.
+    """
+    await conn.execute(
+        """
+        INSERT INTO servers (hoster, server_name, payment_day, payment_type, monthly_cost, currency, count)
+        SELECT 'hoster-' || lpad((g % $2)::text, 5, '0'),
+               'srv-' || lpad(g::text, 7, '0'),
+               1 + g % 31,
+               CASE WHEN g % 3 = 0 THEN 'auto' ELSE 'invoice' END,
+               CASE WHEN g % 17 = 0 THEN NULL ELSE (5 + g % 95)::numeric END,
+               (ARRAY['RUB', 'USD', 'EUR'])[1 + g % 3],
+               CASE WHEN g % 10 = 0 THEN 3 ELSE 1 END
+        FROM generate_series(1, $1) g
+        """,
+        servers, hosters,
+    )
+    # Past months are settled (with a sprinkle of problems); the current
+    # month is still pending, like a live installation.
+    await conn.execute(
+        "SELECT payments_ensure_partitions((CURRENT_DATE - make_interval(months => $1))::date, CURRENT_DATE)",
+        months,
+    )
+    await conn.execute(
+        """
+        INSERT INTO payments (server_id, due_date, status, paid_at, notified_3d, notified_1d)
+        SELECT s.id, d.due_date,
+               CASE
+                   WHEN d.due_date >= date_trunc('month', CURRENT_DATE) THEN 'pending'
+                   WHEN (s.id + d.n) % $2 = 0 THEN 'problem'
+                   WHEN s.payment_type = 'auto' THEN 'confirmed'
+                   ELSE 'paid'
+               END,
+               CASE WHEN d.due_date < date_trunc('month', CURRENT_DATE) THEN d.due_date::timestamp END,
+               d.due_date < date_trunc('month', CURRENT_DATE),
+               d.due_date < date_trunc('month', CURRENT_DATE)
+        FROM servers s
+        CROSS JOIN LATERAL (
+            SELECT n, m::date + (LEAST(
+                       s.payment_day,
+                       EXTRACT(DAY FROM m + INTERVAL '1 month' - INTERVAL '1 day')::integer
+                   ) - 1) AS due_date
+            FROM generate_series(0, $1) n,
+                 LATERAL (SELECT date_trunc('month', CURRENT_DATE) - make_interval(months => n) AS m) mm
+        ) d
+        """,
+        months, PROBLEM_EVERY,
+    )
+    await conn.execute("UPDATE servers SET generated_through = date_trunc('month', CURRENT_DATE)")
+    await conn.execute("ANALYZE")
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--reset", action="store_true", help="drop the schema and re-apply migrations first")
+    parser.add_argument("--servers", type=int, default=DEFAULT_SERVERS)
+    parser.add_argument("--hosters", type=int, default=DEFAULT_HOSTERS)
+    parser.add_argument("--months", type=int, default=DEFAULT_MONTHS)
+    args = parser.parse_args()
+
+    conn = await connect()
+    try:
+        if args.reset:
+            await reset_schema(conn)
+        started = time.perf_counter()
+        await seed(conn, args.servers, args.hosters, args.months)
+        logger.info("Seeded in %.1fs", time.perf_counter() - started)
+    finally:
+        await conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(name)s: %(message)s")
+    asyncio.run(main())
@@ -0,0 +1,77 @@
+"""Monthly partitions of payments: creation ahead of time and archival.
+
+Partitions are created config.payment_partitions_ahead months in advance
+(and at least as far as payments are generated). A month older than
+config.payments_retention_months whose payments are all settled is
+detached, dumped to ``<archive dir>/payments_YYYY_MM.csv.gz`` and dropped.
+A run interrupted after the detach leaves a standalone table; the next
+run archives it.
+"""
+import datetime
+import logging
+import os
+from functools import partial
+
+from bot import models
+from bot.config import config
+from bot.exporter import gzip_copy
+
+logger = logging.getLogger(__name__)
+
+
+def _add_months(month: datetime.date, n: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+def retention_start(today: datetime.date | None = None) -> datetime.date:
+    """First month that stays attached; older settled months are archived."""
+    today = today or datetime.date.today()
+    return _add_months(today.replace(day=1), -config.payments_retention_months)
+
+
+async def ensure_partitions(today: datetime.date | None = None) -> int:
+    today = today or datetime.date.today()
+    horizon = max(
+        _add_months(today.replace(day=1), config.payment_partitions_ahead),
+        today + datetime.timedelta(days=config.payment_lookahead_days),
+    )
+    return await models.ensure_payment_partitions(today, horizon)
+
+
+def _archive_path(table: str) -> str:
+    path = os.path.join(config.payments_archive_dir, f"{table}.csv.gz")
+    n = 1
+    # Never overwrite: a month can only be archived twice if payments were
+    # added for it after the first archive, and both files are history.
+    while os.path.exists(path):
+        path = os.path.join(config.payments_archive_dir, f"{table}.{n}.csv.gz")
+        n += 1
+    return path
+
+
+async def _dump(table: str) -> str:
+    path = _archive_path(table)
+    tmp = path + ".tmp"
+    await gzip_copy(tmp, partial(models.dump_payment_partition, table))
+    os.replace(tmp, path)
+    return path
+
+
+async def archive_closed_months(today: datetime.date | None = None) -> list[str]:
+    """Archive settled months before the retention window; returns the files written."""
+    cutoff = retention_start(today)
+    os.makedirs(config.payments_archive_dir, exist_ok=True)
+    archived = []
+    for table, month, attached in await models.list_payment_partitions():
+        if attached:
+            if month >= cutoff:
+                continue
+            if not await models.detach_payment_partition(table):
+                logger.info("Keeping %s attached: it still has open payments", table)
+                continue
+        path = await _dump(table)
+        # Only dropped once the file is durably on disk.
+        await models.drop_payment_partition(table)
+        archived.append(path)
+    return archived
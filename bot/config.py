@@ -1,4 +1,5 @@
 import os
+import socket
 from dataclasses import dataclass, field
 from dotenv import load_dotenv
 
@@ -10,12 +11,67 @@ class Config:
     bot_token: str = ""
     database_url: str = ""
     admin_ids: list[int] = field(default_factory=list)
+    notify_workers: int = 8
+    notify_global_rate: float = 25.0
+    notify_per_chat_rate: float = 1.0
+    notify_max_retries: int = 5
+    # "polling" or "webhook"
+    bot_mode: str = "polling"
+    webhook_url: str = ""
+    webhook_path: str = "/webhook"
+    webhook_secret: str = ""
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8080
+    webhook_max_concurrency: int = 64
+    webhook_drain_timeout: float = 30.0
+    replica_id: str = ""
+    scheduler_shards: int = 1
+    job_lease_ttl: int = 60
+    fsm_cache_size: int = 10_000
+    fsm_ttl: int = 24 * 3600
+    base_currency: str = "RUB"
+    fx_rates_file: str = ""
+    payment_lookahead_days: int = 31
+    outbox_max_attempts: int = 8
+    outbox_retry_base: int = 30
+    outbox_lease: int = 300
+    payment_partitions_ahead: int = 3
+    payments_retention_months: int = 12
+    payments_archive_dir: str = "archive"
+    render_cache_size: int = 1000
 
     def __post_init__(self):
         self.bot_token = os.getenv("BOT_TOKEN", "")
         self.database_url = os.getenv("DATABASE_URL", "")
         raw_ids = os.getenv("ADMIN_IDS", "")
         self.admin_ids = [int(x.strip()) for x in raw_ids.split(",") if x.strip()]
+        self.notify_workers = int(os.getenv("NOTIFY_WORKERS", self.notify_workers))
+        self.notify_global_rate = float(os.getenv("NOTIFY_GLOBAL_RATE", self.notify_global_rate))
+        self.notify_per_chat_rate = float(os.getenv("NOTIFY_PER_CHAT_RATE", self.notify_per_chat_rate))
+        self.notify_max_retries = int(os.getenv("NOTIFY_MAX_RETRIES", self.notify_max_retries))
+        self.bot_mode = os.getenv("BOT_MODE", self.bot_mode).lower()
+        self.webhook_url = os.getenv("WEBHOOK_URL", "").rstrip("/")
+        self.webhook_path = os.getenv("WEBHOOK_PATH", self.webhook_path)
+        self.webhook_secret = os.getenv("WEBHOOK_SECRET", "")
+        self.webhook_host = os.getenv("WEBHOOK_HOST", self.webhook_host)
+        self.webhook_port = int(os.getenv("WEBHOOK_PORT", self.webhook_port))
+        self.webhook_max_concurrency = int(os.getenv("WEBHOOK_MAX_CONCURRENCY", self.webhook_max_concurrency))
+        self.webhook_drain_timeout = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", self.webhook_drain_timeout))
+        self.replica_id = os.getenv("REPLICA_ID") or f"{socket.gethostname()}:{os.getpid()}"
+        self.scheduler_shards = max(1, int(os.getenv("SCHEDULER_SHARDS", self.scheduler_shards)))
+        self.job_lease_ttl = int(os.getenv("JOB_LEASE_TTL", self.job_lease_ttl))
+        self.fsm_cache_size = int(os.getenv("FSM_CACHE_SIZE", self.fsm_cache_size))
+        self.fsm_ttl = int(os.getenv("FSM_TTL", self.fsm_ttl))
+        self.base_currency = os.getenv("BASE_CURRENCY", self.base_currency).upper()
+        self.fx_rates_file = os.getenv("FX_RATES_FILE", "")
+        self.payment_lookahead_days = int(os.getenv("PAYMENT_LOOKAHEAD_DAYS", self.payment_lookahead_days))
+        self.outbox_max_attempts = int(os.getenv("OUTBOX_MAX_ATTEMPTS", self.outbox_max_attempts))
+        self.outbox_retry_base = int(os.getenv("OUTBOX_RETRY_BASE", self.outbox_retry_base))
+        self.outbox_lease = int(os.getenv("OUTBOX_LEASE", self.outbox_lease))
+        self.payment_partitions_ahead = int(os.getenv("PAYMENT_PARTITIONS_AHEAD", self.payment_partitions_ahead))
+        self.payments_retention_months = int(os.getenv("PAYMENTS_RETENTION_MONTHS", self.payments_retention_months))
+        self.payments_archive_dir = os.getenv("PAYMENTS_ARCHIVE_DIR", self.payments_archive_dir)
+        self.render_cache_size = int(os.getenv("RENDER_CACHE_SIZE", self.render_cache_size))
 
 
 config = Config()
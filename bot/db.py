@@ -1,16 +1,50 @@
+import asyncio
+import json
+import logging
+from decimal import Decimal
+from typing import Callable
+
 import asyncpg
 from bot.config import config
 
+logger = logging.getLogger(__name__)
+
 pool: asyncpg.Pool | None = None
 
+# Dedicated connection for LISTEN: pooled connections are handed out to
+# other queries and would drop the subscriptions.
+_listener: asyncpg.Connection | None = None
+_channels: dict[str, Callable] = {}
+_reset_hooks: list[Callable[[], None]] = []
+_reconnect_task: asyncio.Task | None = None
+
+LISTENER_RETRY_SECONDS = 5
+
+
+async def _init_connection(conn: asyncpg.Connection) -> None:
+    await conn.set_type_codec(
+        "jsonb",
+        encoder=json.dumps,
+        decoder=lambda value: json.loads(value, parse_float=Decimal),
+        schema="pg_catalog",
+    )
+
 
 async def init_db():
     global pool
-    pool = await asyncpg.create_pool(config.database_url, min_size=2, max_size=10)
+    pool = await asyncpg.create_pool(
+        config.database_url, min_size=2, max_size=10, init=_init_connection,
+    )
 
 
 async def close_db():
-    global pool
+    global pool, _listener, _reconnect_task
+    if _reconnect_task:
+        _reconnect_task.cancel()
+        _reconnect_task = None
+    if _listener:
+        listener, _listener = _listener, None
+        await listener.close()
     if pool:
         await pool.close()
         pool = None
@@ -19,3 +53,56 @@ async def close_db():
 def get_pool() -> asyncpg.Pool:
     assert pool is not None, "Database pool is not initialized"
     return pool
+
+
+# ── LISTEN / NOTIFY ──────────────────────────────────────
+
+def listener_connected() -> bool:
+    return _listener is not None and not _listener.is_closed()
+
+
+async def listen(channel: str, callback: Callable, on_reset: Callable[[], None] | None = None) -> None:
+    """Subscribe ``callback(conn, pid, channel, payload)`` to a NOTIFY channel.
+
+    ``on_reset`` is called whenever the listener connection is lost, so that
+    caches relying on invalidation messages can drop their contents.
+    """
+    _channels[channel] = callback
+    if on_reset is not None:
+        _reset_hooks.append(on_reset)
+    if listener_connected():
+        await _listener.add_listener(channel, callback)
+    else:
+        await _connect_listener()
+
+
+async def _connect_listener() -> None:
+    global _listener
+    conn = await asyncpg.connect(config.database_url)
+    for channel, callback in _channels.items():
+        await conn.add_listener(channel, callback)
+    conn.add_termination_listener(_on_listener_lost)
+    _listener = conn
+
+
+def _on_listener_lost(conn: asyncpg.Connection) -> None:
+    global _listener, _reconnect_task
+    if conn is not _listener:
+        return
+    _listener = None
+    for hook in _reset_hooks:
+        hook()
+    logger.warning("LISTEN connection lost, reconnecting")
+    _reconnect_task = asyncio.get_running_loop().create_task(_reconnect_listener())
+
+
+async def _reconnect_listener() -> None:
+    while True:
+        try:
+            await _connect_listener()
+        except (OSError, asyncpg.PostgresError):
+            logger.warning("LISTEN reconnect failed, retrying in %ss", LISTENER_RETRY_SECONDS)
+            await asyncio.sleep(LISTENER_RETRY_SECONDS)
+            continue
+        logger.info("LISTEN connection restored")
+        return
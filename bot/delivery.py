@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramAPIError, TelegramRetryAfter
+from aiogram.types import InlineKeyboardMarkup
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+
+# ── Rate limiting ────────────────────────────────────────
+
+class TokenBucket:
+    """Classic token bucket: ``rate`` tokens per second, bursts up to ``capacity``."""
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    await asyncio.sleep(self._blocked_until - now)
+                    continue
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def block(self, seconds: float) -> None:
+        """Stop handing out tokens for ``seconds`` (used for 429 retry_after)."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+# ── Dispatcher ───────────────────────────────────────────
+
+@dataclass
+class Outgoing:
+    chat_id: int
+    text: str
+    reply_markup: InlineKeyboardMarkup | None = None
+    on_sent: Callable[[], Awaitable[None]] | None = None
+    on_failed: Callable[[str], Awaitable[None]] | None = None
+    attempts: int = 0
+
+
+@dataclass
+class DispatchStats:
+    sent: int = 0
+    failed: int = 0
+    retried: int = 0
+    submitted: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def backlog(self) -> int:
+        return self.submitted - self.sent - self.failed
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started_at
+
+    @property
+    def throughput(self) -> float:
+        elapsed = self.elapsed
+        return self.sent / elapsed if elapsed > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f"sent={self.sent} failed={self.failed} retried={self.retried} "
+            f"backlog={self.backlog} elapsed={self.elapsed:.1f}s "
+            f"throughput={self.throughput:.1f} msg/s"
+        )
+
+
+class NotificationDispatcher:
+    """Bounded worker pool that sends messages within Telegram's rate limits.
+
+    Usage::
+
+        async with NotificationDispatcher(bot) as dispatcher:
+            await dispatcher.submit(chat_id, text, reply_markup=kb)
+        # leaving the block waits until the queue is drained
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        workers: int | None = None,
+        global_rate: float | None = None,
+        per_chat_rate: float | None = None,
+        max_retries: int | None = None,
+    ):
+        self.bot = bot
+        self.workers = workers or config.notify_workers
+        self.per_chat_rate = per_chat_rate or config.notify_per_chat_rate
+        self.max_retries = max_retries if max_retries is not None else config.notify_max_retries
+        self.stats = DispatchStats()
+        self._global = TokenBucket(global_rate or config.notify_global_rate)
+        self._chats: dict[int, TokenBucket] = {}
+        self._queue: asyncio.Queue[Outgoing] = asyncio.Queue(maxsize=self.workers * 4)
+        self._tasks: list[asyncio.Task] = []
+
+    async def __aenter__(self) -> "NotificationDispatcher":
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.close()
+
+    def start(self) -> None:
+        if self._tasks:
+            return
+        self.stats = DispatchStats()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def submit(
+        self,
+        chat_id: int,
+        text: str,
+        reply_markup: InlineKeyboardMarkup | None = None,
+        on_sent: Callable[[], Awaitable[None]] | None = None,
+        on_failed: Callable[[str], Awaitable[None]] | None = None,
+    ) -> None:
+        """Queue a message; ``on_failed`` gets the error if it is given up on."""
+        self.stats.submitted += 1
+        await self._queue.put(Outgoing(chat_id, text, reply_markup, on_sent, on_failed))
+
+    async def join(self) -> None:
+        await self._queue.join()
+
+    async def close(self) -> None:
+        await self.join()
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info("Notification dispatch finished: %s", self.stats)
+
+    def _chat_bucket(self, chat_id: int) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = TokenBucket(self.per_chat_rate)
+        return bucket
+
+    async def _worker(self) -> None:
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            except Exception as e:
+                # Anything but an API error (network, a bug): drop this
+                # message and keep the worker, or submit() and join() hang.
+                self.stats.failed += 1
+                logger.exception("Unexpected error sending to chat %s", item.chat_id)
+                await self._callback(item, item.on_failed, str(e))
+            finally:
+                self._queue.task_done()
+
+    async def _deliver(self, item: Outgoing) -> None:
+        chat_bucket = self._chat_bucket(item.chat_id)
+        while True:
+            await chat_bucket.acquire()
+            await self._global.acquire()
+            item.attempts += 1
+            try:
+                await self.bot.send_message(
+                    chat_id=item.chat_id, text=item.text, reply_markup=item.reply_markup,
+                )
+            except TelegramRetryAfter as e:
+                if item.attempts > self.max_retries:
+                    self.stats.failed += 1
+                    logger.error("Giving up on chat %s after %d attempts", item.chat_id, item.attempts)
+                    await self._callback(item, item.on_failed, str(e))
+                    return
+                self.stats.retried += 1
+                logger.warning("Flood control for chat %s, retry after %ss", item.chat_id, e.retry_after)
+                chat_bucket.block(e.retry_after)
+                continue
+            except TelegramAPIError as e:
+                self.stats.failed += 1
+                logger.exception("Failed to send message to chat %s", item.chat_id)
+                await self._callback(item, item.on_failed, str(e))
+                return
+            break
+
+        self.stats.sent += 1
+        await self._callback(item, item.on_sent)
+
+    @staticmethod
+    async def _callback(item: Outgoing, callback, *args) -> None:
+        if callback is None:
+            return
+        try:
+            await callback(*args)
+        except Exception:
+            logger.exception("Delivery callback failed for chat %s", item.chat_id)
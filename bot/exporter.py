@@ -0,0 +1,67 @@
+"""Gzip CSV exports of servers and payments (/export).
+
+COPY output is compressed into a temp file chunk by chunk, so memory use
+stays flat however long the payment history is.
+"""
+import datetime
+import gzip
+import os
+import tempfile
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from functools import partial
+from typing import AsyncIterator, Awaitable, Callable
+
+from bot import models
+
+EXPORT_KINDS = ("servers", "payments")
+
+
+@dataclass(slots=True)
+class Export:
+    kind: str
+    path: str  # temp file, removed when the export context exits
+    filename: str
+    rows: int
+
+
+async def gzip_copy(path: str, copy: Callable[[Callable], Awaitable[int]]) -> int:
+    """Run ``copy(output)`` writing its chunks gzip-compressed to ``path``; returns its result."""
+    with open(path, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as f:
+            async def write(chunk: bytes) -> None:
+                f.write(chunk)
+
+            rows = await copy(write)
+        raw.flush()
+        os.fsync(raw.fileno())
+    return rows
+
+
+@asynccontextmanager
+async def export(
+    kind: str,
+    start: datetime.date | None = None,
+    end: datetime.date | None = None,
+    hoster: str | None = None,
+) -> AsyncIterator[Export]:
+    """Write one export to a temp file; ``start``/``end`` only apply to payments."""
+    if kind == "servers":
+        filename = f"servers_{datetime.date.today().isoformat()}.csv.gz"
+        copy = partial(models.export_servers, hoster=hoster)
+    elif kind == "payments":
+        filename = f"payments_{start or 'begin'}_{end or 'end'}.csv.gz"
+        copy = partial(
+            models.export_payments,
+            start=start or datetime.date.min, end=end or datetime.date.max, hoster=hoster,
+        )
+    else:
+        raise ValueError(f"unknown export: {kind}")
+
+    fd, path = tempfile.mkstemp(suffix=".csv.gz")
+    os.close(fd)
+    try:
+        rows = await gzip_copy(path, copy)
+        yield Export(kind, path, filename, rows)
+    finally:
+        os.unlink(path)
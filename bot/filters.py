@@ -0,0 +1,11 @@
+from aiogram.filters import Filter
+from aiogram.types import Message
+
+from bot.config import config
+
+
+class IsAdmin(Filter):
+    """Passes messages from users listed in ADMIN_IDS."""
+
+    async def __call__(self, message: Message) -> bool:
+        return message.from_user is not None and message.from_user.id in config.admin_ids
@@ -0,0 +1,130 @@
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Mapping
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from bot import models
+from bot.config import config
+from bot.db import listen, listener_connected
+
+FSM_CHANNEL = "fsm_changed"
+
+
+@dataclass(slots=True)
+class _Entry:
+    state: str | None
+    data: dict[str, Any]
+    expires: float  # time.monotonic() deadline, mirrors the row's TTL
+
+
+class PostgresStorage(BaseStorage):
+    """FSM storage on the shared asyncpg pool with a write-through LRU cache.
+
+    Every write goes to fsm_states and NOTIFYs other replicas, which evict
+    the key, so a conversation can continue on any node. Hot reads are
+    served from memory; entries idle for longer than ``ttl`` are treated
+    as gone (and purged from the table by the scheduler).
+    """
+
+    def __init__(self, cache_size: int | None = None, ttl: int | None = None):
+        self.cache_size = cache_size or config.fsm_cache_size
+        self.ttl = ttl or config.fsm_ttl
+        self._cache: OrderedDict[str, _Entry] = OrderedDict()
+        self._generation = 0
+        self._listening = False
+
+    async def start(self) -> None:
+        await listen(FSM_CHANNEL, self._on_changed, on_reset=self._reset)
+        self._listening = True
+
+    # ── cache plumbing ───────────────────────────────────
+
+    @staticmethod
+    def _key(key: StorageKey) -> str:
+        parts = [key.bot_id, key.chat_id, key.user_id, key.thread_id or "",
+                 getattr(key, "business_connection_id", None) or "", key.destiny]
+        return ":".join(map(str, parts))
+
+    def _cache_enabled(self) -> bool:
+        return self._listening and listener_connected()
+
+    def _on_changed(self, conn, pid, channel, payload: str) -> None:
+        origin, _, key = payload.partition("\n")
+        if origin == config.replica_id:
+            return
+        self._generation += 1
+        self._cache.pop(key, None)
+
+    def _reset(self) -> None:
+        self._generation += 1
+        self._cache.clear()
+
+    def _remember(self, key: str, entry: _Entry) -> None:
+        self._cache[key] = entry
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def _load(self, key: str) -> _Entry:
+        entry = self._cache.get(key)
+        if entry is not None and entry.expires > time.monotonic() and self._cache_enabled():
+            self._cache.move_to_end(key)
+            return entry
+
+        generation = self._generation
+        row = await models.get_fsm_state(key, self.ttl)
+        if row is None:
+            entry = _Entry(None, {}, time.monotonic() + self.ttl)
+        else:
+            state, data, age = row
+            entry = _Entry(state, data, time.monotonic() + self.ttl - age)
+        if self._cache_enabled() and generation == self._generation:
+            self._remember(key, entry)
+        else:
+            self._cache.pop(key, None)
+        return entry
+
+    def _payload(self, key: str) -> str:
+        return f"{config.replica_id}\n{key}"
+
+    # ── BaseStorage ──────────────────────────────────────
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        k = self._key(key)
+        value = state.state if isinstance(state, State) else state
+        await models.set_fsm_state(k, value, self.ttl, FSM_CHANNEL, self._payload(k))
+        entry = self._cache.get(k)
+        if entry is not None and self._cache_enabled():
+            if entry.expires <= time.monotonic():
+                entry.data = {}
+            entry.state = value
+            entry.expires = time.monotonic() + self.ttl
+            self._cache.move_to_end(k)
+        else:
+            self._cache.pop(k, None)
+
+    async def get_state(self, key: StorageKey) -> str | None:
+        return (await self._load(self._key(key))).state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        k = self._key(key)
+        value = dict(data)
+        await models.set_fsm_data(k, value, self.ttl, FSM_CHANNEL, self._payload(k))
+        entry = self._cache.get(k)
+        if entry is not None and self._cache_enabled():
+            if entry.expires <= time.monotonic():
+                entry.state = None
+            entry.data = value
+            entry.expires = time.monotonic() + self.ttl
+            self._cache.move_to_end(k)
+        else:
+            self._cache.pop(k, None)
+
+    async def get_data(self, key: StorageKey) -> dict[str, Any]:
+        return dict((await self._load(self._key(key))).data)
+
+    async def close(self) -> None:
+        self._cache.clear()
@@ -0,0 +1,130 @@
+"""Conversion of per-currency totals into config.base_currency.
+
+Rates live in fx_rates; the effective set for today is cached in process
+and dropped on NOTIFY when any replica loads new rates. Callers convert
+whole batches of totals against one cached snapshot, never per row.
+"""
+import csv
+import datetime
+from dataclasses import dataclass, field
+from decimal import Decimal, InvalidOperation
+from typing import Iterable, Mapping
+
+from bot import models
+from bot.config import config
+from bot.db import listen, listener_connected
+
+FX_CHANNEL = "fx_rates_changed"
+CURRENCY_SYMBOLS = {"RUB": "₽", "USD": "$", "EUR": "€"}
+CENT = Decimal("0.01")
+
+
+@dataclass(slots=True)
+class Rates:
+    day: datetime.date  # effective date the snapshot was taken for
+    rates: dict[str, tuple[Decimal, datetime.date]]
+
+
+@dataclass(slots=True)
+class Converted:
+    amount: Decimal
+    missing: list[str] = field(default_factory=list)  # currencies with no rate
+    as_of: datetime.date | None = None  # oldest rate date used
+
+
+_cache: Rates | None = None
+_generation = 0
+
+
+def _invalidate(*_args) -> None:
+    global _cache, _generation
+    _generation += 1
+    _cache = None
+
+
+async def init_fx_cache() -> None:
+    await listen(FX_CHANNEL, _invalidate, on_reset=_invalidate)
+
+
+async def get_rates(on: datetime.date | None = None) -> Rates:
+    global _cache
+    on = on or datetime.date.today()
+    if _cache is not None and _cache.day == on and listener_connected():
+        return _cache
+    generation = _generation
+    snapshot = Rates(on, await models.get_fx_rates(on))
+    if listener_connected() and generation == _generation and on == datetime.date.today():
+        _cache = snapshot
+    return snapshot
+
+
+def convert(totals: Mapping[str, Decimal], rates: Rates) -> Converted:
+    result = Converted(Decimal(0))
+    for currency, amount in totals.items():
+        if currency == config.base_currency:
+            result.amount += amount
+            continue
+        found = rates.rates.get(currency)
+        if found is None:
+            result.missing.append(currency)
+            continue
+        rate, rate_date = found
+        result.amount += amount * rate
+        if result.as_of is None or rate_date < result.as_of:
+            result.as_of = rate_date
+    result.amount = result.amount.quantize(CENT)
+    return result
+
+
+async def convert_many(totals: Iterable[Mapping[str, Decimal]]) -> list[Converted]:
+    """Convert a batch of currency -> amount maps against one rate snapshot."""
+    rates = await get_rates()
+    return [convert(t, rates) for t in totals]
+
+
+def format_base(amount: Decimal) -> str:
+    currency = config.base_currency
+    symbol = CURRENCY_SYMBOLS.get(currency, currency)
+    if currency in ("USD", "EUR"):
+        return f"{symbol}{amount}"
+    return f"{amount} {symbol}"
+
+
+def format_converted(c: Converted) -> str:
+    text = f"≈ {format_base(c.amount)}"
+    if c.as_of is not None:
+        text += f" (курс на {c.as_of.strftime('%d.%m.%Y')})"
+    if c.missing:
+        text += f", без {', '.join(sorted(c.missing))}: нет курса"
+    return text
+
+
+# ── Loading ──────────────────────────────────────────────
+
+def parse_rates(lines: Iterable[str]) -> list[tuple[str, datetime.date, Decimal]]:
+    """CSV lines ``currency,YYYY-MM-DD,rate`` (blank lines and ``#`` comments skipped)."""
+    rates = []
+    for n, row in enumerate(csv.reader(lines), start=1):
+        if not row or not row[0].strip() or row[0].lstrip().startswith("#"):
+            continue
+        try:
+            currency, day, rate = (v.strip() for v in row)
+            parsed = (currency.upper(), datetime.date.fromisoformat(day), Decimal(rate))
+        except (ValueError, InvalidOperation):
+            raise ValueError(f"line {n}: expected currency,YYYY-MM-DD,rate, got {row!r}") from None
+        if parsed[2] <= 0:
+            raise ValueError(f"line {n}: rate must be positive")
+        rates.append(parsed)
+    return rates
+
+
+async def save_rates(rates: list[tuple[str, datetime.date, Decimal]]) -> int:
+    saved = await models.upsert_fx_rates(rates, FX_CHANNEL)
+    _invalidate()
+    return saved
+
+
+async def load_rates_file(path: str) -> int:
+    with open(path, newline="") as f:
+        rates = parse_rates(f)
+    return await save_rates(rates)
@@ -0,0 +1,127 @@
+import datetime
+import os
+import shlex
+
+from aiogram import Bot, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import BufferedInputFile, FSInputFile, Message
+
+from bot import exporter, importer
+from bot.filters import IsAdmin
+from bot.reports import ChunkedMessage
+
+router = Router()
+
+# Bot API getFile refuses larger files.
+IMPORT_MAX_BYTES = 20 * 1024 * 1024
+IMPORT_ERRORS_SHOWN = 20
+IMPORT_USAGE = (
+    "Импорт серверов: отправьте CSV или JSONL файл с подписью /import "
+    "(или ответьте /import на сообщение с файлом).\n\n"
+    "Поля: hoster, server_name, payment_day (1–31), payment_type (invoice|auto), "
+    "monthly_cost (необязательно), currency (RUB|USD|EUR, по умолчанию RUB), count (по умолчанию 1).\n"
+    "CSV — с заголовком, разделитель «,» или «;». JSONL — один объект на строку.\n\n"
+    "Активные серверы с тем же хостером и именем обновляются, остальные добавляются."
+)
+
+
+# ── /import (admins) ─────────────────────────────────────
+
+@router.message(Command("import"), IsAdmin())
+async def cmd_import(message: Message, bot: Bot):
+    document = message.document
+    if document is None and message.reply_to_message is not None:
+        document = message.reply_to_message.document
+    if document is None:
+        await message.answer(IMPORT_USAGE)
+        return
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await message.answer("Файл больше 20 МБ — Telegram не отдаёт боту такие файлы. Разбейте его на части.")
+        return
+
+    stream = await bot.download(document)
+    try:
+        result = await importer.import_servers(stream, document.file_name)
+    except UnicodeDecodeError:
+        await message.answer("Файл не загружен: ожидается кодировка UTF-8.")
+        return
+    except ValueError as e:
+        await message.answer(f"Файл не загружен: {e}\n\n{IMPORT_USAGE}")
+        return
+
+    report = ChunkedMessage(message.answer, separator="\n")
+    await report.add(
+        f"Импорт завершён: добавлено {result.inserted}, обновлено {result.updated}, "
+        f"без изменений {result.unchanged}."
+    )
+    if result.errors:
+        await report.add(f"Пропущено строк с ошибками: {len(result.errors)}")
+        for line, error in result.errors[:IMPORT_ERRORS_SHOWN]:
+            await report.add(f"  строка {line}: {error}")
+    await report.flush()
+
+    if len(result.errors) > IMPORT_ERRORS_SHOWN:
+        await message.answer_document(
+            BufferedInputFile(importer.error_report(result.errors), filename="import_errors.csv"),
+            caption="Все ошибки импорта",
+        )
+
+
+# ── /export (admins) ─────────────────────────────────────
+
+# Bot API limit for files uploaded by bots.
+EXPORT_MAX_BYTES = 50 * 1024 * 1024
+EXPORT_USAGE = (
+    "Использование: /export [servers|payments] [from=ГГГГ-ММ-ДД] [to=ГГГГ-ММ-ДД] [hoster=Имя]\n"
+    "Без типа выгружаются оба. from/to фильтруют платежи по дате оплаты; "
+    "заархивированные месяцы в выгрузку не попадают."
+)
+
+
+def _parse_export_args(args: str | None) -> dict | None:
+    """``/export`` arguments -> kinds and exporter.export kwargs, None if invalid."""
+    params = {"kinds": [], "start": None, "end": None, "hoster": None}
+    try:
+        tokens = shlex.split(args or "")
+    except ValueError:
+        return None
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep and token in exporter.EXPORT_KINDS:
+            if token not in params["kinds"]:
+                params["kinds"].append(token)
+        elif key in ("from", "to") and value:
+            try:
+                params["start" if key == "from" else "end"] = datetime.date.fromisoformat(value)
+            except ValueError:
+                return None
+        elif key == "hoster" and value:
+            params["hoster"] = value
+        else:
+            return None
+    if params["start"] and params["end"] and params["start"] > params["end"]:
+        return None
+    params["kinds"] = params["kinds"] or list(exporter.EXPORT_KINDS)
+    return params
+
+
+@router.message(Command("export"), IsAdmin())
+async def cmd_export(message: Message, command: CommandObject):
+    params = _parse_export_args(command.args)
+    if params is None:
+        await message.answer(EXPORT_USAGE)
+        return
+    kinds = params.pop("kinds")
+    for kind in kinds:
+        async with exporter.export(kind, **params) as result:
+            size = os.path.getsize(result.path)
+            if size > EXPORT_MAX_BYTES:
+                await message.answer(
+                    f"Выгрузка {kind} — {size // (1024 * 1024)} МБ, больше лимита Telegram (50 МБ). "
+                    "Сузьте период или выберите хостера."
+                )
+                continue
+            await message.answer_document(
+                FSInputFile(result.path, filename=result.filename),
+                caption=f"{kind}: {result.rows} строк",
+            )
@@ -1,14 +1,33 @@
 from aiogram import F, Router
 from aiogram.types import CallbackQuery
 
-from bot import models
+from bot import fx, models, screens
+from bot.config import config
+from bot.keyboards.callback_data import (
+    BackToHoster,
+    DigestAction,
+    DigestPage,
+    DigestPayAll,
+    HosterListPage,
+    HosterServers,
+    PayDone,
+    PayOk,
+    PayProblem,
+    ServerDelete,
+    ServerDeleteConfirm,
+    ServerInfo,
+    ServerPage,
+)
 from bot.keyboards.inline import (
+    DIGEST_PAGE_SIZE,
+    HOSTER_PAGE_SIZE,
+    SERVER_PAGE_SIZE,
     confirm_delete_kb,
-    hoster_list_kb,
-    hoster_servers_kb,
     server_actions_kb,
 )
 
+from bot.notifications import render_digest
+
 router = Router()
 
 CURRENCY_SYMBOLS = {"RUB": "₽", "USD": "$", "EUR": "€"}
@@ -39,73 +58,66 @@ async def cb_noop(callback: CallbackQuery):
 
 # ── Pagination: hoster list ───────────────────────────────
 
-@router.callback_query(F.data.startswith("hlist_p:"))
-async def cb_hoster_list_page(callback: CallbackQuery):
-    page = int(callback.data[8:])
-    hosters = await models.list_hosters()
-    await callback.message.edit_text(
-        "Ваши хостеры:",
-        reply_markup=hoster_list_kb(hosters, page=page),
-    )
+@router.callback_query(HosterListPage.filter())
+async def cb_hoster_list_page(callback: CallbackQuery, callback_data: HosterListPage):
+    screen = await screens.hoster_list(callback_data.page, callback_data.cursor, callback_data.before)
+    text, kb = screen or (screens.EMPTY_LIST, None)
+    await callback.message.edit_text(text, reply_markup=kb)
     await callback.answer()
 
 
 # ── Pagination: servers within hoster ────────────────────
-# IMPORTANT: must be registered BEFORE the plain "hstr:" handler
-
-@router.callback_query(F.data.startswith("hstr_p:"))
-async def cb_hoster_page(callback: CallbackQuery):
-    # format: hstr_p:{page}:{hoster_name}
-    rest = callback.data[7:]          # e.g. "1:hostealo"
-    colon = rest.index(":")
-    page = int(rest[:colon])
-    hoster = rest[colon + 1:]
 
-    servers = await models.list_servers_by_hoster(hoster)
-    await callback.message.edit_text(
-        f"Серверы хостера {hoster}:",
-        reply_markup=hoster_servers_kb(servers, page=page),
-    )
+@router.callback_query(ServerPage.filter())
+async def cb_hoster_page(callback: CallbackQuery, callback_data: ServerPage):
+    screen = await screens.server_page(callback_data.page, callback_data.cursor, callback_data.before)
+    if screen is None:
+        await callback.answer("Список изменился, откройте его заново", show_alert=True)
+        return
+    text, kb = screen
+    await callback.message.edit_text(text, reply_markup=kb)
     await callback.answer()
 
 
 # ── Hoster: show servers (page 0) ────────────────────────
 
-@router.callback_query(F.data.startswith("hstr:"))
-async def cb_hoster_servers(callback: CallbackQuery):
-    hoster = callback.data[5:]
-    servers = await models.list_servers_by_hoster(hoster)
-    if not servers:
+@router.callback_query(HosterServers.filter())
+async def cb_hoster_servers(callback: CallbackQuery, callback_data: HosterServers):
+    screen = await screens.hoster_servers(callback_data.hoster_id)
+    if screen is None:
         await callback.answer("Нет серверов у этого хостера", show_alert=True)
         return
-    await callback.message.edit_text(
-        f"Серверы хостера {hoster}:",
-        reply_markup=hoster_servers_kb(servers, page=0),
-    )
+    text, kb = screen
+    await callback.message.edit_text(text, reply_markup=kb)
     await callback.answer()
 
 
 # ── Server info ──────────────────────────────────────────
 
-@router.callback_query(F.data.startswith("srv_info:"))
-async def cb_server_info(callback: CallbackQuery):
-    server_id = int(callback.data.split(":")[1])
+@router.callback_query(ServerInfo.filter())
+async def cb_server_info(callback: CallbackQuery, callback_data: ServerInfo):
+    server_id = callback_data.server_id
     server = await models.get_server(server_id)
     if not server:
         await callback.answer("Сервер не найден", show_alert=True)
         return
 
     cost_str = ""
-    if server["monthly_cost"] is not None:
-        cost_str = f"Стоимость: {_format_cost(server['monthly_cost'], server['currency'], server.get('count', 1))}\n"
-
-    count = server.get("count", 1)
+    if server.monthly_cost is not None:
+        cost_str = f"Стоимость: {_format_cost(server.monthly_cost, server.currency, server.count)}"
+        if server.currency != config.base_currency:
+            [c] = await fx.convert_many([{server.currency: server.monthly_cost * server.count}])
+            if not c.missing:
+                cost_str += f" ({fx.format_converted(c)})"
+        cost_str += "\n"
+
+    count = server.count
     count_str = f"Кол-во: {count}\n" if count > 1 else ""
-    ptype_label = "Инвойс" if server["payment_type"] == "invoice" else "Автосписание"
+    ptype_label = "Инвойс" if server.payment_type == "invoice" else "Автосписание"
     await callback.message.edit_text(
-        f"Хостер: {server['hoster']}\n"
-        f"Сервер: {server['server_name']}\n"
-        f"День оплаты: {server['payment_day']}\n"
+        f"Хостер: {server.hoster}\n"
+        f"Сервер: {server.server_name}\n"
+        f"День оплаты: {server.payment_day}\n"
         f"Тип: {ptype_label}\n"
         f"{count_str}"
         f"{cost_str}",
@@ -116,9 +128,9 @@ async def cb_server_info(callback: CallbackQuery):
 
 # ── Delete server ────────────────────────────────────────
 
-@router.callback_query(F.data.startswith("srv_del:"))
-async def cb_server_delete_confirm(callback: CallbackQuery):
-    server_id = int(callback.data.split(":")[1])
+@router.callback_query(ServerDelete.filter())
+async def cb_server_delete_confirm(callback: CallbackQuery, callback_data: ServerDelete):
+    server_id = callback_data.server_id
     await callback.message.edit_text(
         "Вы уверены, что хотите удалить этот сервер?",
         reply_markup=confirm_delete_kb(server_id),
@@ -126,74 +138,71 @@ async def cb_server_delete_confirm(callback: CallbackQuery):
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("srv_del_yes:"))
-async def cb_server_delete(callback: CallbackQuery):
-    server_id = int(callback.data.split(":")[1])
-    server = await models.get_server(server_id)
-    hoster = server["hoster"] if server else None
-
-    deleted = await models.delete_server(server_id)
+@router.callback_query(ServerDeleteConfirm.filter())
+async def cb_server_delete(callback: CallbackQuery, callback_data: ServerDeleteConfirm):
+    deleted, listing = await models.delete_server_and_list(
+        callback_data.server_id, SERVER_PAGE_SIZE, HOSTER_PAGE_SIZE,
+    )
     if deleted:
         await callback.answer("Сервер удалён", show_alert=True)
     else:
         await callback.answer("Сервер не найден", show_alert=True)
-
-    if hoster:
-        servers = await models.list_servers_by_hoster(hoster)
-        if servers:
-            await callback.message.edit_text(
-                f"Серверы хостера {hoster}:",
-                reply_markup=hoster_servers_kb(servers, page=0),
-            )
-            return
-
-    hosters = await models.list_hosters()
-    if hosters:
-        await callback.message.edit_text("Ваши хостеры:", reply_markup=hoster_list_kb(hosters))
-    else:
-        await callback.message.edit_text("Список серверов пуст.")
+    await _show_listing(callback, listing)
 
 
 # ── Navigation ────────────────────────────────────────────
 
+async def _show_listing(callback: CallbackQuery, listing: models.Listing) -> None:
+    text, kb = await screens.render_listing(listing)
+    await callback.message.edit_text(text, reply_markup=kb)
+
+
 @router.callback_query(F.data == "srv_back_list")
 async def cb_back_list(callback: CallbackQuery):
-    hosters = await models.list_hosters()
-    if hosters:
-        await callback.message.edit_text("Ваши хостеры:", reply_markup=hoster_list_kb(hosters))
-    else:
-        await callback.message.edit_text("Список серверов пуст.")
+    text, kb = await screens.hoster_list() or (screens.EMPTY_LIST, None)
+    await callback.message.edit_text(text, reply_markup=kb)
     await callback.answer()
 
 
-@router.callback_query(F.data.startswith("srv_back_hstr:"))
-async def cb_back_hoster(callback: CallbackQuery):
-    server_id = int(callback.data.split(":")[1])
-    server = await models.get_server(server_id)
-    if server:
-        hoster = server["hoster"]
-        servers = await models.list_servers_by_hoster(hoster)
-        if servers:
-            await callback.message.edit_text(
-                f"Серверы хостера {hoster}:",
-                reply_markup=hoster_servers_kb(servers, page=0),
-            )
-            await callback.answer()
-            return
-    hosters = await models.list_hosters()
-    if hosters:
-        await callback.message.edit_text("Ваши хостеры:", reply_markup=hoster_list_kb(hosters))
-    else:
-        await callback.message.edit_text("Список серверов пуст.")
+# Buttons sent before the compact callbacks: hlist_p:{page}[:{a|b}:{hoster}],
+# hstr_p:{page}:{hoster} or hstr_p:{page}:{a|b}:{server_id}, and hstr:{hoster}.
+# Their pages no longer line up, so they reopen the hoster's first page
+# (or the hoster list) instead of going unanswered.
+
+async def _legacy_hoster_id(data: str) -> int | None:
+    prefix, _, rest = data.partition(":")
+    if prefix == "hstr":
+        return await models.get_hoster_id(rest)
+    if prefix != "hstr_p":
+        return None
+    parts = rest.split(":", 2)
+    if len(parts) == 3 and parts[1] in ("a", "b") and parts[2].isdigit():
+        server = await models.get_server(int(parts[2]))
+        return server.hoster_id if server else None
+    return await models.get_hoster_id(rest.partition(":")[2])
+
+
+@router.callback_query(F.data.startswith(("hlist_p:", "hstr_p:", "hstr:")))
+async def cb_legacy_list(callback: CallbackQuery):
+    hoster_id = await _legacy_hoster_id(callback.data)
+    screen = await screens.hoster_servers(hoster_id) if hoster_id is not None else None
+    text, kb = screen or await screens.hoster_list() or (screens.EMPTY_LIST, None)
+    await callback.message.edit_text(text, reply_markup=kb)
+    await callback.answer()
+
+
+@router.callback_query(BackToHoster.filter())
+async def cb_back_hoster(callback: CallbackQuery, callback_data: BackToHoster):
+    text, kb = await screens.hoster_listing(callback_data.server_id)
+    await callback.message.edit_text(text, reply_markup=kb)
     await callback.answer()
 
 
 # ── Payment callbacks ────────────────────────────────────
 
-@router.callback_query(F.data.startswith("pay_done:"))
-async def cb_pay_done(callback: CallbackQuery):
-    payment_id = int(callback.data.split(":")[1])
-    payment = await models.mark_payment(payment_id, "paid")
+@router.callback_query(PayDone.filter())
+async def cb_pay_done(callback: CallbackQuery, callback_data: PayDone):
+    payment = await models.mark_payment(callback_data.payment_id, "paid")
     if payment:
         await callback.message.edit_text(
             callback.message.text + "\n\n✅ Отмечено как оплаченное."
@@ -201,10 +210,9 @@ async def cb_pay_done(callback: CallbackQuery):
     await callback.answer("Оплата отмечена!")
 
 
-@router.callback_query(F.data.startswith("pay_ok:"))
-async def cb_pay_ok(callback: CallbackQuery):
-    payment_id = int(callback.data.split(":")[1])
-    payment = await models.mark_payment(payment_id, "confirmed")
+@router.callback_query(PayOk.filter())
+async def cb_pay_ok(callback: CallbackQuery, callback_data: PayOk):
+    payment = await models.mark_payment(callback_data.payment_id, "confirmed")
     if payment:
         await callback.message.edit_text(
             callback.message.text + "\n\n✅ Списание подтверждено."
@@ -212,12 +220,55 @@ async def cb_pay_ok(callback: CallbackQuery):
     await callback.answer("Списание подтверждено!")
 
 
-@router.callback_query(F.data.startswith("pay_problem:"))
-async def cb_pay_problem(callback: CallbackQuery):
-    payment_id = int(callback.data.split(":")[1])
-    payment = await models.mark_payment(payment_id, "problem")
+@router.callback_query(PayProblem.filter())
+async def cb_pay_problem(callback: CallbackQuery, callback_data: PayProblem):
+    payment = await models.mark_payment(callback_data.payment_id, "problem")
     if payment:
         await callback.message.edit_text(
             callback.message.text + "\n\n❌ Отмечена проблема. Напомню через 12 часов."
         )
     await callback.answer("Проблема зафиксирована")
+
+
+# ── Digest callbacks ─────────────────────────────────────
+
+async def _show_digest(callback: CallbackQuery, digest_id: int, page: int) -> bool:
+    found = await models.get_digest_page(digest_id, page * DIGEST_PAGE_SIZE, DIGEST_PAGE_SIZE)
+    if found is None:
+        await callback.answer("Сводка устарела", show_alert=True)
+        return False
+    digest, payments = found
+    text, kb = render_digest(digest, payments, page)
+    await callback.message.edit_text(text, reply_markup=kb)
+    return True
+
+
+@router.callback_query(DigestPage.filter())
+async def cb_digest_page(callback: CallbackQuery, callback_data: DigestPage):
+    if await _show_digest(callback, callback_data.digest_id, callback_data.page):
+        await callback.answer()
+
+
+@router.callback_query(DigestAction.filter())
+async def cb_digest_action(callback: CallbackQuery, callback_data: DigestAction):
+    changed = await models.mark_payments([callback_data.payment_id], callback_data.status)
+    if not changed:
+        await callback.answer("Платёж уже закрыт")
+        return
+    if await _show_digest(callback, callback_data.digest_id, callback_data.page):
+        await callback.answer("Проблема зафиксирована" if callback_data.status == "problem" else "Оплата отмечена!")
+
+
+@router.callback_query(DigestPayAll.filter())
+async def cb_digest_pay_all(callback: CallbackQuery, callback_data: DigestPayAll):
+    found = await models.get_digest_payments(callback_data.digest_id)
+    if found is None:
+        await callback.answer("Сводка устарела", show_alert=True)
+        return
+    payment_type, payment_ids = found
+    changed = await models.mark_payments(payment_ids, "confirmed" if payment_type == "auto" else "paid")
+    if not changed:
+        await callback.answer("Все платежи уже закрыты")
+        return
+    if await _show_digest(callback, callback_data.digest_id, callback_data.page):
+        await callback.answer(f"Отмечено: {len(changed)}")
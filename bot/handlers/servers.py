@@ -1,18 +1,21 @@
-from decimal import Decimal, InvalidOperation
+import shlex
+from collections import defaultdict
+from decimal import Decimal
 
-from aiogram import F, Router
-from aiogram.filters import Command
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
 from aiogram.fsm.context import FSMContext
 from aiogram.fsm.state import State, StatesGroup
 from aiogram.types import CallbackQuery, Message
 
-from bot import models
+from bot import fx, models, screens, validation
+from bot.keyboards.callback_data import NEW_HOSTER, AddHoster, CurrencyChoice, PaymentTypeChoice
 from bot.keyboards.inline import (
     currency_kb,
-    hoster_list_kb,
     hoster_select_kb,
     payment_type_kb,
 )
+from bot.reports import send_report
 
 router = Router()
 
@@ -48,10 +51,9 @@ async def cmd_add(message: Message, state: FSMContext):
     hosters = await models.list_hosters()
     if hosters:
         await state.set_state(AddServer.hoster_select)
-        hoster_names = [h["hoster"] for h in hosters]
         await message.answer(
             "Выберите хостер или создайте новый:\n\n/cancel — отменить",
-            reply_markup=hoster_select_kb(hoster_names),
+            reply_markup=hoster_select_kb(hosters),
         )
     else:
         await state.set_state(AddServer.hoster_new)
@@ -61,41 +63,104 @@ async def cmd_add(message: Message, state: FSMContext):
 @router.message(Command("list"))
 async def cmd_list(message: Message, state: FSMContext):
     await state.clear()
-    hosters = await models.list_hosters()
-    if not hosters:
+    screen = await screens.hoster_list()
+    if screen is None:
         await message.answer("Список серверов пуст. Добавьте сервер командой /add")
         return
-    await message.answer("Ваши хостеры:", reply_markup=hoster_list_kb(hosters))
+    text, kb = screen
+    await message.answer(text, reply_markup=kb)
+
+
+UPCOMING_USAGE = (
+    "Использование: /upcoming [дней] [hoster=Имя] [type=invoice|auto] "
+    "[status=pending|paid|confirmed|problem|all]"
+)
+PAYMENT_STATUSES = ("pending", "paid", "confirmed", "problem")
+MAX_UPCOMING_DAYS = 366
+
+
+def _parse_upcoming_args(args: str | None) -> dict | None:
+    """``/upcoming`` arguments -> iter_upcoming_payments kwargs, None if invalid."""
+    params = {"days_ahead": 14, "hoster": None, "payment_type": None, "status": "pending"}
+    try:
+        tokens = shlex.split(args or "")
+    except ValueError:
+        return None
+    for token in tokens:
+        key, sep, value = token.partition("=")
+        if not sep:
+            if not token.isdigit() or not 1 <= int(token) <= MAX_UPCOMING_DAYS:
+                return None
+            params["days_ahead"] = int(token)
+        elif key == "hoster" and value:
+            params["hoster"] = value
+        elif key == "type" and value in validation.PAYMENT_TYPES:
+            params["payment_type"] = value
+        elif key == "status" and (value in PAYMENT_STATUSES or value == "all"):
+            params["status"] = None if value == "all" else value
+        else:
+            return None
+    return params
+
+
+def _format_upcoming(p: models.Payment) -> str:
+    cost_str = _format_cost(p.monthly_cost, p.currency, p.count) if p.monthly_cost else "—"
+    ptype_label = "Инвойс" if p.payment_type == "invoice" else "Авто"
+    return (
+        f"• {p.due_date.strftime('%d.%m.%Y')} — {p.hoster} / {p.server_name}\n"
+        f"  {cost_str} | {ptype_label} | {p.status}"
+    )
 
 
 @router.message(Command("upcoming"))
-async def cmd_upcoming(message: Message, state: FSMContext):
+async def cmd_upcoming(message: Message, command: CommandObject, state: FSMContext):
     await state.clear()
-    payments = await models.get_upcoming_payments(14)
-    if not payments:
-        await message.answer("Нет предстоящих оплат в ближайшие 14 дней.")
+    params = _parse_upcoming_args(command.args)
+    if params is None:
+        await message.answer(UPCOMING_USAGE)
         return
-    lines = []
-    for p in payments:
-        cost_str = _format_cost(p["monthly_cost"], p["currency"], p.get("count", 1)) if p["monthly_cost"] else "—"
-        ptype_label = "Инвойс" if p["payment_type"] == "invoice" else "Авто"
-        lines.append(
-            f"• {p['due_date'].strftime('%d.%m.%Y')} — {p['hoster']} / {p['server_name']}\n"
-            f"  {cost_str} | {ptype_label} | {p['status']}"
-        )
-    await message.answer("Ближайшие оплаты (14 дней):\n\n" + "\n\n".join(lines))
+
+    days = params["days_ahead"]
+    filters = [f"{k}={params[k]}" for k in ("hoster", "payment_type") if params[k]]
+    if params["status"] != "pending":
+        filters.append(f"status={params['status'] or 'all'}")
+    suffix = f", {', '.join(filters)}" if filters else ""
+
+    totals: dict[str, Decimal] = defaultdict(Decimal)
+
+    async def blocks():
+        async for p in models.iter_upcoming_payments(**params):
+            if p.monthly_cost:
+                totals[p.currency] += p.monthly_cost * p.count
+            yield _format_upcoming(p)
+
+    async def footer() -> str | None:
+        if not totals:
+            return None
+        [converted] = await fx.convert_many([totals])
+        return f"Итого: {fx.format_converted(converted)}"
+
+    await send_report(
+        message.answer,
+        f"Ближайшие оплаты ({days} дней{suffix}):",
+        blocks(),
+        empty=f"Нет предстоящих оплат в ближайшие {days} дней{suffix}.",
+        footer=footer,
+    )
 
 
 # ── FSM: hoster selection (callback) ─────────────────────
 
-@router.callback_query(AddServer.hoster_select, F.data.startswith("addh:"))
-async def fsm_hoster_select(callback: CallbackQuery, state: FSMContext):
-    choice = callback.data[5:]  # everything after "addh:"
-    if choice == "__new__":
+@router.callback_query(AddServer.hoster_select, AddHoster.filter())
+async def fsm_hoster_select(callback: CallbackQuery, callback_data: AddHoster, state: FSMContext):
+    hoster = None
+    if callback_data.hoster_id != NEW_HOSTER:
+        hoster = await models.get_hoster_name(callback_data.hoster_id)
+    if hoster is None:
         await state.set_state(AddServer.hoster_new)
         await callback.message.edit_text("Введите название хостера:\n\n/cancel — отменить")
     else:
-        await state.update_data(hoster=choice)
+        await state.update_data(hoster=hoster)
         await state.set_state(AddServer.server_name)
         await callback.message.edit_text("Введите имя/описание сервера:")
     await callback.answer()
@@ -105,14 +170,24 @@ async def fsm_hoster_select(callback: CallbackQuery, state: FSMContext):
 
 @router.message(AddServer.hoster_new)
 async def fsm_hoster_new(message: Message, state: FSMContext):
-    await state.update_data(hoster=message.text.strip())
+    try:
+        hoster = validation.name(message.text, "хостер")
+    except ValueError as e:
+        await message.answer(f"Некорректно — {e}. Введите название хостера:")
+        return
+    await state.update_data(hoster=hoster)
     await state.set_state(AddServer.server_name)
     await message.answer("Введите имя/описание сервера:")
 
 
 @router.message(AddServer.server_name)
 async def fsm_server_name(message: Message, state: FSMContext):
-    await state.update_data(server_name=message.text.strip())
+    try:
+        server_name = validation.name(message.text, "сервер")
+    except ValueError as e:
+        await message.answer(f"Некорректно — {e}. Введите имя/описание сервера:")
+        return
+    await state.update_data(server_name=server_name)
     await state.set_state(AddServer.payment_day)
     await message.answer("Введите день оплаты (1–31):")
 
@@ -120,9 +195,7 @@ async def fsm_server_name(message: Message, state: FSMContext):
 @router.message(AddServer.payment_day)
 async def fsm_payment_day(message: Message, state: FSMContext):
     try:
-        day = int(message.text.strip())
-        if not 1 <= day <= 31:
-            raise ValueError
+        day = validation.payment_day(message.text)
     except ValueError:
         await message.answer("Введите число от 1 до 31:")
         return
@@ -131,10 +204,14 @@ async def fsm_payment_day(message: Message, state: FSMContext):
     await message.answer("Тип оплаты:", reply_markup=payment_type_kb())
 
 
-@router.callback_query(AddServer.payment_type, F.data.startswith("ptype:"))
-async def fsm_payment_type(callback: CallbackQuery, state: FSMContext):
-    ptype = callback.data.split(":")[1]
-    await state.update_data(payment_type=ptype)
+@router.callback_query(AddServer.payment_type, PaymentTypeChoice.filter())
+async def fsm_payment_type(callback: CallbackQuery, callback_data: PaymentTypeChoice, state: FSMContext):
+    try:
+        payment_type = validation.payment_type(callback_data.value)
+    except ValueError:
+        await callback.answer()
+        return
+    await state.update_data(payment_type=payment_type)
     await state.set_state(AddServer.monthly_cost)
     await callback.message.edit_text("Введите стоимость за единицу в месяц (число, или 0 если неизвестна):")
     await callback.answer()
@@ -142,15 +219,13 @@ async def fsm_payment_type(callback: CallbackQuery, state: FSMContext):
 
 @router.message(AddServer.monthly_cost)
 async def fsm_monthly_cost(message: Message, state: FSMContext):
-    text = message.text.strip().replace(",", ".")
     try:
-        cost = Decimal(text)
-        if cost < 0:
-            raise InvalidOperation
-    except (InvalidOperation, ValueError):
+        cost = validation.monthly_cost(message.text)
+    except ValueError:
         await message.answer("Введите корректное число (например, 49.00):")
         return
-    await state.update_data(monthly_cost=cost if cost > 0 else None)
+    # FSM data is stored as JSON, so the amount travels as a string.
+    await state.update_data(monthly_cost=str(cost) if cost is not None else None)
     await state.set_state(AddServer.count)
     await message.answer("Количество серверов (введите 1 если один):")
 
@@ -158,9 +233,7 @@ async def fsm_monthly_cost(message: Message, state: FSMContext):
 @router.message(AddServer.count)
 async def fsm_count(message: Message, state: FSMContext):
     try:
-        count = int(message.text.strip())
-        if count < 1:
-            raise ValueError
+        count = validation.count(message.text)
     except ValueError:
         await message.answer("Введите целое число больше 0:")
         return
@@ -169,33 +242,37 @@ async def fsm_count(message: Message, state: FSMContext):
     await message.answer("Валюта:", reply_markup=currency_kb())
 
 
-@router.callback_query(AddServer.currency, F.data.startswith("cur:"))
-async def fsm_currency(callback: CallbackQuery, state: FSMContext):
-    currency = callback.data.split(":")[1]
+@router.callback_query(AddServer.currency, CurrencyChoice.filter())
+async def fsm_currency(callback: CallbackQuery, callback_data: CurrencyChoice, state: FSMContext):
+    try:
+        code = validation.currency(callback_data.code)
+    except ValueError:
+        await callback.answer()
+        return
     data = await state.get_data()
-    data["currency"] = currency
+    data["currency"] = code
 
     server = await models.add_server(
         hoster=data["hoster"],
         server_name=data["server_name"],
         payment_day=data["payment_day"],
         payment_type=data["payment_type"],
-        monthly_cost=data["monthly_cost"],
+        monthly_cost=Decimal(data["monthly_cost"]) if data["monthly_cost"] else None,
         currency=data["currency"],
         count=data["count"],
     )
 
     cost_str = ""
-    if server["monthly_cost"] is not None:
-        cost_str = f"\nСтоимость: {_format_cost(server['monthly_cost'], server['currency'], server['count'])}"
+    if server.monthly_cost is not None:
+        cost_str = f"\nСтоимость: {_format_cost(server.monthly_cost, server.currency, server.count)}"
 
-    ptype_label = "Инвойс" if server["payment_type"] == "invoice" else "Автосписание"
-    count_str = f"\nКол-во: {server['count']}" if server["count"] > 1 else ""
+    ptype_label = "Инвойс" if server.payment_type == "invoice" else "Автосписание"
+    count_str = f"\nКол-во: {server.count}" if server.count > 1 else ""
     await callback.message.edit_text(
         f"Сервер добавлен!\n\n"
-        f"Хостер: {server['hoster']}\n"
-        f"Сервер: {server['server_name']}\n"
-        f"День оплаты: {server['payment_day']}\n"
+        f"Хостер: {server.hoster}\n"
+        f"Сервер: {server.server_name}\n"
+        f"День оплаты: {server.payment_day}\n"
         f"Тип: {ptype_label}"
         f"{count_str}"
         f"{cost_str}"
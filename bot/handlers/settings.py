@@ -1,8 +1,14 @@
+import datetime
+from decimal import Decimal, InvalidOperation
+
 from aiogram import Router
-from aiogram.filters import Command
+from aiogram.filters import Command, CommandObject
 from aiogram.types import Message
 
-from bot import models
+from bot import fx, models
+from bot.config import config
+from bot.filters import IsAdmin
+from bot.scheduler import DIGEST_SETTING
 
 router = Router()
 
@@ -14,3 +20,59 @@ async def cmd_setchat(message: Message):
     await message.answer(
         f"Уведомления будут отправляться в этот чат (ID: {chat_id})."
     )
+
+
+@router.message(Command("digest"))
+async def cmd_digest(message: Message, command: CommandObject):
+    arg = (command.args or "").strip().lower()
+    if arg not in ("on", "off"):
+        current = await models.get_setting(DIGEST_SETTING) or "off"
+        await message.answer(
+            f"Режим сводки: {current}\n"
+            "/digest on — присылать уведомления одной сводкой по дню и типу оплаты\n"
+            "/digest off — по одному сообщению на платёж"
+        )
+        return
+    await models.set_setting(DIGEST_SETTING, arg)
+    if arg == "on":
+        await message.answer("Уведомления будут приходить сводкой.")
+    else:
+        await message.answer("Уведомления будут приходить по одному на платёж.")
+
+
+# ── FX rates (admins) ────────────────────────────────────
+
+FXRATE_USAGE = (
+    "Использование: /fxrate <валюта> <курс> [ГГГГ-ММ-ДД]\n"
+    f"Курс — сколько {config.base_currency} стоит 1 единица валюты."
+)
+
+
+@router.message(Command("fxrate"), IsAdmin())
+async def cmd_fxrate(message: Message, command: CommandObject):
+    parts = (command.args or "").split()
+    try:
+        if len(parts) not in (2, 3):
+            raise ValueError
+        currency = parts[0].upper()
+        rate = Decimal(parts[1].replace(",", "."))
+        day = datetime.date.fromisoformat(parts[2]) if len(parts) == 3 else datetime.date.today()
+        if rate <= 0 or currency == config.base_currency:
+            raise ValueError
+    except (ValueError, InvalidOperation):
+        await message.answer(FXRATE_USAGE)
+        return
+    await fx.save_rates([(currency, day, rate)])
+    await message.answer(f"Курс {currency} на {day.strftime('%d.%m.%Y')}: {fx.format_base(rate)}")
+
+
+@router.message(Command("fxrates"), IsAdmin())
+async def cmd_fxrates(message: Message):
+    rates = await fx.get_rates()
+    if not rates.rates:
+        await message.answer(f"Курсов нет. Добавьте: /fxrate USD 90.5\n\n{FXRATE_USAGE}")
+        return
+    lines = [f"Курсы к {config.base_currency}:"]
+    for currency, (rate, day) in sorted(rates.rates.items()):
+        lines.append(f"  {currency}: {fx.format_base(rate)} (на {day.strftime('%d.%m.%Y')})")
+    await message.answer("\n".join(lines))
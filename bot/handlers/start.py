@@ -12,7 +12,12 @@ async def cmd_start(message: Message):
         "Команды:\n"
         "/add — добавить сервер\n"
         "/list — список серверов\n"
-        "/upcoming — ближайшие оплаты\n"
+        "/upcoming [дней] [hoster=…] [type=…] [status=…] — ближайшие оплаты\n"
+        "/stats [хостер] — расходы и платежи по месяцам\n"
         "/setchat — привязать чат для уведомлений\n"
+        "/digest on|off — уведомления сводкой\n"
+        "/fxrate, /fxrates — курсы валют (для админов)\n"
+        "/import — загрузить серверы из CSV/JSONL (для админов)\n"
+        "/export [servers|payments] [from=…] [to=…] [hoster=…] — выгрузка в CSV (для админов)\n"
         "/cancel — отменить текущее действие"
     )
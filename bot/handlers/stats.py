@@ -0,0 +1,82 @@
+import datetime
+from collections import defaultdict
+from decimal import Decimal
+
+from aiogram import Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message
+
+from bot import fx, models
+from bot.scheduler import STATS_REFRESH_PERIOD
+
+router = Router()
+
+CURRENCY_SYMBOLS = {"RUB": "₽", "USD": "$", "EUR": "€"}
+MONTHS_BACK = 5
+MONTHS_AHEAD = 1
+# Report buckets for payment statuses; paid and confirmed both count as paid.
+STATUS_BUCKETS = {"paid": "оплачено", "confirmed": "оплачено", "pending": "ожидает", "problem": "проблема"}
+
+
+def _format_amount(amount, currency: str) -> str:
+    symbol = CURRENCY_SYMBOLS.get(currency, currency)
+    if currency in ("USD", "EUR"):
+        return f"{symbol}{amount}"
+    return f"{amount} {symbol}"
+
+
+def _add_months(month: datetime.date, n: int) -> datetime.date:
+    index = month.year * 12 + month.month - 1 + n
+    return datetime.date(index // 12, index % 12 + 1, 1)
+
+
+@router.message(Command("stats"))
+async def cmd_stats(message: Message, command: CommandObject):
+    hoster = command.args.strip() if command.args else None
+    spend = await models.get_monthly_spend(hoster)
+
+    if hoster:
+        if not spend:
+            await message.answer(f"Нет активных серверов у хостера {hoster}.")
+            return
+        lines = [f"Расходы в месяц — {hoster}:"]
+    else:
+        lines = ["Расходы в месяц (активные серверы):"]
+    lines += [f"  {_format_amount(total, cur)}" for cur, total in spend.items()] or ["  —"]
+
+    if hoster:
+        if len(spend) > 1:
+            [converted] = await fx.convert_many([spend])
+            lines.append(f"  Итого {fx.format_converted(converted)}")
+        await message.answer("\n".join(lines))
+        return
+
+    this_month = datetime.date.today().replace(day=1)
+    stats = await models.get_month_stats(
+        _add_months(this_month, -MONTHS_BACK), _add_months(this_month, MONTHS_AHEAD),
+    )
+    # (month, bucket) -> currency -> amount
+    buckets: dict = defaultdict(lambda: defaultdict(Decimal))
+    for s in stats:
+        buckets[s.month, STATUS_BUCKETS[s.status]][s.currency] += s.amount
+
+    # Fleet spend and every month bucket are converted against one rate snapshot.
+    converted = await fx.convert_many([spend, *buckets.values()])
+    if len(spend) > 1:
+        lines.append(f"  Итого {fx.format_converted(converted[0])}")
+
+    lines.append("\nПлатежи по месяцам:")
+    month = None
+    for ((bucket_month, label), amounts), total in zip(buckets.items(), converted[1:]):
+        if bucket_month != month:
+            month = bucket_month
+            lines.append(month.strftime("%m.%Y"))
+        parts = ", ".join(_format_amount(v, cur) for cur, v in amounts.items())
+        if len(amounts) > 1:
+            parts += f" ({fx.format_converted(total)})"
+        lines.append(f"  {label}: {parts}")
+    if not buckets:
+        lines.append("  —")
+    lines.append(f"\nОбновляется раз в {STATS_REFRESH_PERIOD // 60} минут.")
+
+    await message.answer("\n".join(lines))
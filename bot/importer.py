@@ -0,0 +1,125 @@
+"""Bulk server import from CSV or JSONL uploads (/import).
+
+Rows are parsed and validated (bot.validation, the same rules as /add)
+while they stream into models.import_servers, so an upload is never
+held as a list of rows. Invalid rows are skipped and reported by line.
+"""
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import BinaryIO, Iterator, Mapping
+
+from bot import models, validation
+
+FIELDS = models.IMPORT_COLUMNS[1:]
+REQUIRED_FIELDS = ("hoster", "server_name", "payment_day", "payment_type")
+
+
+@dataclass(slots=True)
+class ImportResult:
+    inserted: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    errors: list[tuple[int, str]] = field(default_factory=list)  # (line, message)
+
+
+def _is_jsonl(buffer: io.BufferedReader, filename: str | None) -> bool:
+    name = (filename or "").lower()
+    if name.endswith((".jsonl", ".ndjson", ".json")):
+        return True
+    if name.endswith((".csv", ".tsv", ".txt")):
+        return False
+    return buffer.peek(64).removeprefix(b"\xef\xbb\xbf").lstrip()[:1] == b"{"
+
+
+def _csv_rows(text: io.TextIOWrapper, errors: list[tuple[int, str]]) -> Iterator[tuple[int, Mapping]]:
+    header = text.readline()
+    try:
+        dialect = csv.Sniffer().sniff(header, delimiters=",;\t")
+    except csv.Error:
+        dialect = csv.excel
+    try:
+        columns = [c.strip().lower() for c in next(csv.reader([header], dialect), [])]
+    except csv.Error as e:
+        raise ValueError(f"некорректный заголовок CSV: {e}") from e
+    missing = [f for f in REQUIRED_FIELDS if f not in columns]
+    if missing:
+        raise ValueError(f"в заголовке CSV нет колонок: {', '.join(missing)}")
+
+    def rows() -> Iterator[tuple[int, Mapping]]:
+        reader = csv.DictReader(text, fieldnames=columns, dialect=dialect)
+        while True:
+            # line_num counts from after the header.
+            try:
+                row = next(reader)
+            except StopIteration:
+                return
+            except csv.Error as e:
+                # DictReader.line_num is only updated on success; the
+                # underlying reader resumes on the next line.
+                errors.append((reader.reader.line_num + 1, f"некорректная строка CSV: {e}"))
+                continue
+            if any(v and v.strip() for k, v in row.items() if k is not None):
+                yield reader.line_num + 1, row
+
+    return rows()
+
+
+def _jsonl_rows(text: io.TextIOWrapper, errors: list[tuple[int, str]]) -> Iterator[tuple[int, Mapping]]:
+    for line, raw in enumerate(text, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except json.JSONDecodeError as e:
+            errors.append((line, f"некорректный JSON: {e.msg}"))
+            continue
+        if not isinstance(row, dict):
+            errors.append((line, "ожидался JSON-объект"))
+            continue
+        yield line, {str(k).lower(): v for k, v in row.items()}
+
+
+def _records(rows: Iterator[tuple[int, Mapping]], errors: list[tuple[int, str]]) -> Iterator[tuple]:
+    seen: dict[tuple[str, str], int] = {}
+    for line, raw in rows:
+        try:
+            row = validation.server_row(raw)
+        except ValueError as e:
+            errors.append((line, str(e)))
+            continue
+        key = (row["hoster"], row["server_name"])
+        if key in seen:
+            errors.append((line, f"сервер уже есть в строке {seen[key]}"))
+            continue
+        seen[key] = line
+        yield (line, *(row[f] for f in FIELDS))
+
+
+async def import_servers(stream: BinaryIO, filename: str | None = None) -> ImportResult:
+    """Import servers from a CSV (with a header row) or JSONL upload.
+
+    Raises ValueError if the file as a whole is unreadable (bad header,
+    not UTF-8); nothing is imported then. Malformed CSV records are
+    skipped and reported like invalid rows.
+    """
+    result = ImportResult()
+    buffer = io.BufferedReader(stream)
+    jsonl = _is_jsonl(buffer, filename)
+    text = io.TextIOWrapper(buffer, encoding="utf-8-sig", newline="")
+    if jsonl:
+        rows = _jsonl_rows(text, result.errors)
+    else:
+        rows = _csv_rows(text, result.errors)
+    counts = await models.import_servers(_records(rows, result.errors))
+    result.inserted, result.updated, result.unchanged = counts["inserted"], counts["updated"], counts["unchanged"]
+    return result
+
+
+def error_report(errors: list[tuple[int, str]]) -> bytes:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    writer.writerow(("line", "error"))
+    writer.writerows(errors)
+    return out.getvalue().encode("utf-8-sig")
@@ -0,0 +1,95 @@
+from typing import Literal
+
+from aiogram.filters.callback_data import CallbackData
+
+# Callback payloads carry integer ids only, so they stay far below
+# Telegram's 64-byte limit whatever the hoster or server is called.
+# Prefixes of the pre-existing integer callbacks (srv_*, pay_*) are kept
+# so buttons already sent to chats keep working.
+
+
+# ── Hosters ──────────────────────────────────────────────
+
+class HosterListPage(CallbackData, prefix="hl"):
+    page: int
+    before: bool
+    cursor: int  # hoster id the page continues from
+
+
+class HosterServers(CallbackData, prefix="hs"):
+    hoster_id: int
+
+
+class ServerPage(CallbackData, prefix="sp"):
+    page: int
+    before: bool
+    cursor: int  # server id the page continues from
+
+
+class AddHoster(CallbackData, prefix="addh"):
+    hoster_id: int  # NEW_HOSTER for "create a new one"
+
+
+NEW_HOSTER = 0
+
+
+# ── Servers ──────────────────────────────────────────────
+
+class ServerInfo(CallbackData, prefix="srv_info"):
+    server_id: int
+
+
+class ServerDelete(CallbackData, prefix="srv_del"):
+    server_id: int
+
+
+class ServerDeleteConfirm(CallbackData, prefix="srv_del_yes"):
+    server_id: int
+
+
+class BackToHoster(CallbackData, prefix="srv_back_hstr"):
+    server_id: int
+
+
+# ── Payments ─────────────────────────────────────────────
+
+class PayDone(CallbackData, prefix="pay_done"):
+    payment_id: int
+
+
+class PayOk(CallbackData, prefix="pay_ok"):
+    payment_id: int
+
+
+class PayProblem(CallbackData, prefix="pay_problem"):
+    payment_id: int
+
+
+# ── Digests ──────────────────────────────────────────────
+
+class DigestPage(CallbackData, prefix="dg"):
+    digest_id: int
+    page: int
+
+
+class DigestAction(CallbackData, prefix="dga"):
+    digest_id: int
+    page: int
+    payment_id: int
+    # Checked on unpack, so a forged value matches no handler.
+    status: Literal["paid", "confirmed", "problem"]
+
+
+class DigestPayAll(CallbackData, prefix="dgall"):
+    digest_id: int
+    page: int
+
+
+# ── /add choices ─────────────────────────────────────────
+
+class PaymentTypeChoice(CallbackData, prefix="ptype"):
+    value: str
+
+
+class CurrencyChoice(CallbackData, prefix="cur"):
+    code: str
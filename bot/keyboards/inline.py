@@ -1,63 +1,111 @@
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 
+from bot.fx import Converted, format_base
+from bot.keyboards.callback_data import (
+    NEW_HOSTER,
+    AddHoster,
+    BackToHoster,
+    CurrencyChoice,
+    DigestAction,
+    DigestPage,
+    DigestPayAll,
+    HosterListPage,
+    HosterServers,
+    PayDone,
+    PaymentTypeChoice,
+    PayOk,
+    PayProblem,
+    ServerDelete,
+    ServerDeleteConfirm,
+    ServerInfo,
+    ServerPage,
+)
+from bot.models import Digest, Hoster, Payment, Server
+
 HOSTER_PAGE_SIZE = 8
 SERVER_PAGE_SIZE = 5
+DIGEST_PAGE_SIZE = 8
+
+
+def _total_pages(total: int, page_size: int) -> int:
+    return max(1, (total + page_size - 1) // page_size)
+
 
+def hoster_list_kb(
+    hosters: list[Hoster],
+    page: int = 0,
+    total: int | None = None,
+    converted: list[Converted] | None = None,
+) -> InlineKeyboardMarkup:
+    """Top-level list: one page of hosters with server counts.
 
-def hoster_list_kb(hosters: list[dict], page: int = 0) -> InlineKeyboardMarkup:
-    """Top-level list: one button per hoster with server count, paginated."""
-    total = len(hosters)
-    total_pages = max(1, (total + HOSTER_PAGE_SIZE - 1) // HOSTER_PAGE_SIZE)
-    start = page * HOSTER_PAGE_SIZE
-    end = min(start + HOSTER_PAGE_SIZE, total)
+    ``hosters`` is a single page (see models.list_hosters_page); navigation
+    buttons carry the id of the first/last hoster as keyset cursor.
+    ``converted`` holds each hoster's monthly total in the base currency.
+    """
+    if total is None:
+        total = len(hosters)
+    total_pages = _total_pages(total, HOSTER_PAGE_SIZE)
 
     buttons = []
-    for h in hosters[start:end]:
-        n = h["count"]
-        label = f"{h['hoster']}  ({n} серв.)"
+    for h, c in zip(hosters, converted or [None] * len(hosters)):
+        n = h.count
+        label = f"{h.hoster}  ({n} серв.)"
+        if c is not None and c.amount and not c.missing:
+            label = f"{h.hoster}  ({n} серв., ≈ {format_base(c.amount)})"
         buttons.append([
-            InlineKeyboardButton(text=label, callback_data=f"hstr:{h['hoster']}"),
+            InlineKeyboardButton(text=label, callback_data=HosterServers(hoster_id=h.id).pack()),
         ])
 
-    if total_pages > 1:
+    if total_pages > 1 and hosters:
         nav = []
         if page > 0:
-            nav.append(InlineKeyboardButton(text="◀", callback_data=f"hlist_p:{page - 1}"))
+            nav.append(InlineKeyboardButton(
+                text="◀",
+                callback_data=HosterListPage(page=page - 1, before=True, cursor=hosters[0].id).pack(),
+            ))
         nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
         if page < total_pages - 1:
-            nav.append(InlineKeyboardButton(text="▶", callback_data=f"hlist_p:{page + 1}"))
+            nav.append(InlineKeyboardButton(
+                text="▶",
+                callback_data=HosterListPage(page=page + 1, before=False, cursor=hosters[-1].id).pack(),
+            ))
         buttons.append(nav)
 
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def hoster_servers_kb(servers: list[dict], page: int = 0) -> InlineKeyboardMarkup:
-    """Servers inside a hoster, paginated, + back button."""
-    total = len(servers)
-    total_pages = max(1, (total + SERVER_PAGE_SIZE - 1) // SERVER_PAGE_SIZE)
-    start = page * SERVER_PAGE_SIZE
-    end = min(start + SERVER_PAGE_SIZE, total)
-    hoster = servers[0]["hoster"] if servers else ""
+def hoster_servers_kb(servers: list[Server], page: int = 0, total: int | None = None) -> InlineKeyboardMarkup:
+    """One page of servers inside a hoster + back button.
+
+    ``servers`` is a single page (see models.list_servers_page); navigation
+    buttons carry the id of the first/last server as keyset cursor.
+    """
+    if total is None:
+        total = len(servers)
+    total_pages = _total_pages(total, SERVER_PAGE_SIZE)
 
     buttons = []
-    for s in servers[start:end]:
-        label = s["server_name"]
-        if s.get("count", 1) > 1:
-            label += f" ×{s['count']}"
+    for s in servers:
+        label = s.server_name
+        if s.count > 1:
+            label += f" ×{s.count}"
         buttons.append([
-            InlineKeyboardButton(text=label, callback_data=f"srv_info:{s['id']}"),
+            InlineKeyboardButton(text=label, callback_data=ServerInfo(server_id=s.id).pack()),
         ])
 
-    if total_pages > 1:
+    if total_pages > 1 and servers:
         nav = []
         if page > 0:
             nav.append(InlineKeyboardButton(
-                text="◀", callback_data=f"hstr_p:{page - 1}:{hoster}"
+                text="◀",
+                callback_data=ServerPage(page=page - 1, before=True, cursor=servers[0].id).pack(),
             ))
         nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
         if page < total_pages - 1:
             nav.append(InlineKeyboardButton(
-                text="▶", callback_data=f"hstr_p:{page + 1}:{hoster}"
+                text="▶",
+                callback_data=ServerPage(page=page + 1, before=False, cursor=servers[-1].id).pack(),
             ))
         buttons.append(nav)
 
@@ -67,15 +115,15 @@ def hoster_servers_kb(servers: list[dict], page: int = 0) -> InlineKeyboardMarku
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
 
-def hoster_select_kb(hosters: list[str]) -> InlineKeyboardMarkup:
+def hoster_select_kb(hosters: list[Hoster]) -> InlineKeyboardMarkup:
     """Used in /add flow: pick existing hoster or create new."""
     buttons = []
     for h in hosters:
         buttons.append([
-            InlineKeyboardButton(text=h, callback_data=f"addh:{h}"),
+            InlineKeyboardButton(text=h.hoster, callback_data=AddHoster(hoster_id=h.id).pack()),
         ])
     buttons.append([
-        InlineKeyboardButton(text="+ Новый хостер", callback_data="addh:__new__"),
+        InlineKeyboardButton(text="+ Новый хостер", callback_data=AddHoster(hoster_id=NEW_HOSTER).pack()),
     ])
     return InlineKeyboardMarkup(inline_keyboard=buttons)
 
@@ -83,10 +131,10 @@ def hoster_select_kb(hosters: list[str]) -> InlineKeyboardMarkup:
 def server_actions_kb(server_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Удалить", callback_data=f"srv_del:{server_id}"),
+            InlineKeyboardButton(text="Удалить", callback_data=ServerDelete(server_id=server_id).pack()),
         ],
         [
-            InlineKeyboardButton(text="« Назад", callback_data=f"srv_back_hstr:{server_id}"),
+            InlineKeyboardButton(text="« Назад", callback_data=BackToHoster(server_id=server_id).pack()),
         ],
     ])
 
@@ -94,32 +142,75 @@ def server_actions_kb(server_id: int) -> InlineKeyboardMarkup:
 def confirm_delete_kb(server_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Да, удалить", callback_data=f"srv_del_yes:{server_id}"),
-            InlineKeyboardButton(text="Отмена", callback_data=f"srv_back_hstr:{server_id}"),
+            InlineKeyboardButton(text="Да, удалить", callback_data=ServerDeleteConfirm(server_id=server_id).pack()),
+            InlineKeyboardButton(text="Отмена", callback_data=BackToHoster(server_id=server_id).pack()),
         ],
     ])
 
 
 def payment_invoice_kb(payment_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
-        [InlineKeyboardButton(text="Оплачено ✓", callback_data=f"pay_done:{payment_id}")],
+        [InlineKeyboardButton(text="Оплачено ✓", callback_data=PayDone(payment_id=payment_id).pack())],
     ])
 
 
 def payment_auto_kb(payment_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Списание прошло ✓", callback_data=f"pay_ok:{payment_id}"),
-            InlineKeyboardButton(text="Проблема ✗", callback_data=f"pay_problem:{payment_id}"),
+            InlineKeyboardButton(text="Списание прошло ✓", callback_data=PayOk(payment_id=payment_id).pack()),
+            InlineKeyboardButton(text="Проблема ✗", callback_data=PayProblem(payment_id=payment_id).pack()),
         ],
     ])
 
 
+def digest_kb(digest: Digest, payments: list[Payment], page: int) -> InlineKeyboardMarkup:
+    """Per-payment actions for one digest page, navigation and "mark all"."""
+    paid_status = "confirmed" if digest.payment_type == "auto" else "paid"
+    buttons = []
+    for i, p in enumerate(payments, start=page * DIGEST_PAGE_SIZE + 1):
+        if p.status not in ("pending", "problem"):
+            continue
+        row = [InlineKeyboardButton(
+            text=f"{i}. ✓",
+            callback_data=DigestAction(
+                digest_id=digest.id, page=page, payment_id=p.id, status=paid_status,
+            ).pack(),
+        )]
+        if p.payment_type == "auto" and p.status != "problem":
+            row.append(InlineKeyboardButton(
+                text=f"{i}. ✗",
+                callback_data=DigestAction(
+                    digest_id=digest.id, page=page, payment_id=p.id, status="problem",
+                ).pack(),
+            ))
+        buttons.append(row)
+
+    total_pages = _total_pages(digest.total, DIGEST_PAGE_SIZE)
+    if total_pages > 1:
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton(
+                text="◀", callback_data=DigestPage(digest_id=digest.id, page=page - 1).pack(),
+            ))
+        nav.append(InlineKeyboardButton(text=f"{page + 1}/{total_pages}", callback_data="noop"))
+        if page < total_pages - 1:
+            nav.append(InlineKeyboardButton(
+                text="▶", callback_data=DigestPage(digest_id=digest.id, page=page + 1).pack(),
+            ))
+        buttons.append(nav)
+
+    buttons.append([InlineKeyboardButton(
+        text="Отметить все оплаченными ✓",
+        callback_data=DigestPayAll(digest_id=digest.id, page=page).pack(),
+    )])
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+
 def payment_type_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="Инвойс (invoice)", callback_data="ptype:invoice"),
-            InlineKeyboardButton(text="Автосписание (auto)", callback_data="ptype:auto"),
+            InlineKeyboardButton(text="Инвойс (invoice)", callback_data=PaymentTypeChoice(value="invoice").pack()),
+            InlineKeyboardButton(text="Автосписание (auto)", callback_data=PaymentTypeChoice(value="auto").pack()),
         ],
     ])
 
@@ -127,8 +218,8 @@ def payment_type_kb() -> InlineKeyboardMarkup:
 def currency_kb() -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
         [
-            InlineKeyboardButton(text="RUB ₽", callback_data="cur:RUB"),
-            InlineKeyboardButton(text="USD $", callback_data="cur:USD"),
-            InlineKeyboardButton(text="EUR €", callback_data="cur:EUR"),
+            InlineKeyboardButton(text="RUB ₽", callback_data=CurrencyChoice(code="RUB").pack()),
+            InlineKeyboardButton(text="USD $", callback_data=CurrencyChoice(code="USD").pack()),
+            InlineKeyboardButton(text="EUR €", callback_data=CurrencyChoice(code="EUR").pack()),
         ],
     ])
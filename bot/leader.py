@@ -0,0 +1,139 @@
+"""Run scheduled jobs once across replicas.
+
+Every replica's scheduler fires every job; the job_leases table decides
+who actually runs it. A run is identified by (job, fire_key) where the
+fire key is the schedule period the run belongs to, so replicas whose
+clocks or start times differ still agree on "this run". Replicas that
+lose the lease stay on standby until the run is finished and take over
+if the holder's lease expires first, or the holder's run fails.
+"""
+import asyncio
+import contextlib
+import logging
+import time
+import zlib
+from typing import Awaitable, Callable
+
+from bot import models
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+# A run that raises is released so it can be retried (here or on another
+# replica); after this many failures on one replica it is given up on.
+MAX_RUN_ATTEMPTS = 3
+
+_failures: dict[tuple[str, str], int] = {}
+
+
+def fire_key(period_seconds: int) -> str:
+    """Identifier of the current schedule period (UTC-aligned)."""
+    return str(int(time.time() // period_seconds))
+
+
+async def _run_holding(job: str, key: str, fn: Callable[[], Awaitable[None]], ttl: int) -> bool:
+    """Run ``fn`` under the lease; False if it failed and the lease was released."""
+    holder = config.replica_id
+    task = asyncio.create_task(fn())
+
+    async def renew() -> None:
+        while True:
+            await asyncio.sleep(ttl / 3)
+            if not await models.renew_job_lease(job, holder, ttl):
+                logger.error("Lost lease for %s, cancelling the run", job)
+                task.cancel()
+                return
+
+    renewer = asyncio.create_task(renew())
+    retry = False
+    try:
+        await task
+    except asyncio.CancelledError:
+        if not renewer.done():
+            raise
+        return True
+    except Exception:
+        failures = _failures[job, key] = _failures.get((job, key), 0) + 1
+        retry = failures < MAX_RUN_ATTEMPTS
+        if retry:
+            logger.exception("Job %s failed (attempt %d), releasing it for a retry", job, failures)
+        else:
+            logger.exception("Job %s failed %d times, giving up on %s", job, failures, key)
+    finally:
+        renewer.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await renewer
+    # Only once the renewer is gone, or it could extend the lease again.
+    if retry:
+        await models.release_job_lease(job, holder)
+        return False
+    _failures.pop((job, key), None)
+    await models.finish_job_lease(job, holder)
+    return True
+
+
+async def _try_run(job: str, key: str, fn: Callable[[], Awaitable[None]], ttl: int) -> bool | None:
+    """True if we ran it, False if it is done elsewhere, None if it is still to do.
+
+    A run still to do is either running elsewhere or failed here; the
+    callers try again after a pause, as does any other replica.
+    """
+    if await models.acquire_job_lease(job, key, config.replica_id, ttl):
+        logger.info("Running %s (%s) on %s", job, key, config.replica_id)
+        return True if await _run_holding(job, key, fn, ttl) else None
+    lease = await models.get_job_lease(job)
+    if lease is None:
+        return None
+    lease_key, finished, _expires_in = lease
+    if lease_key != key or finished:
+        return False
+    return None
+
+
+async def run_exclusive(
+    job: str,
+    key: str,
+    fn: Callable[[], Awaitable[None]],
+    ttl: int | None = None,
+) -> bool:
+    """Run ``fn`` on exactly one replica for this ``key``.
+
+    Returns once the run is finished by whichever replica did it; True if
+    it was this one.
+    """
+    ttl = ttl or config.job_lease_ttl
+    while True:
+        ran = await _try_run(job, key, fn, ttl)
+        if ran is not None:
+            return ran
+        await asyncio.sleep(ttl / 2)
+
+
+async def run_sharded(
+    job: str,
+    key: str,
+    shards: int,
+    fn: Callable[[int, int], Awaitable[None]],
+    ttl: int | None = None,
+) -> int:
+    """Split a run into ``shards`` independently leased pieces.
+
+    ``fn(shard, shards)`` processes one piece. Each replica starts at a
+    different shard so concurrent replicas spread out; returns how many
+    shards this replica ran.
+    """
+    ttl = ttl or config.job_lease_ttl
+    offset = zlib.crc32(config.replica_id.encode()) % shards
+    pending = [(offset + i) % shards for i in range(shards)]
+    ran = 0
+    while pending:
+        for shard in list(pending):
+            result = await _try_run(
+                f"{job}:{shard}", key, lambda shard=shard: fn(shard, shards), ttl,
+            )
+            if result is not None:
+                pending.remove(shard)
+                ran += result
+        if pending:
+            await asyncio.sleep(ttl / 2)
+    return ran
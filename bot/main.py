@@ -2,11 +2,15 @@ import asyncio
 import logging
 
 from aiogram import Bot, Dispatcher
+from aiogram.fsm.storage.base import BaseStorage
 
+from bot import fx, models
 from bot.config import config
 from bot.db import close_db, init_db
-from bot.handlers import callbacks, servers, settings, start
+from bot.fsm_storage import PostgresStorage
+from bot.handlers import bulk, callbacks, servers, settings, start, stats
 from bot.scheduler import setup_scheduler
+from bot.webhook import run_webhook
 
 logging.basicConfig(
     level=logging.INFO,
@@ -15,16 +19,31 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-async def main():
-    bot = Bot(token=config.bot_token)
-    dp = Dispatcher()
+def create_dispatcher(storage: BaseStorage | None = None) -> Dispatcher:
+    dp = Dispatcher(storage=storage) if storage is not None else Dispatcher()
 
     dp.include_router(start.router)
     dp.include_router(servers.router)
     dp.include_router(callbacks.router)
     dp.include_router(settings.router)
+    dp.include_router(stats.router)
+    dp.include_router(bulk.router)
+    return dp
+
+
+async def main():
+    bot = Bot(token=config.bot_token)
+    storage = PostgresStorage()
+    dp = create_dispatcher(storage)
 
     await init_db()
+    await models.init_settings_cache()
+    await models.init_data_version()
+    await fx.init_fx_cache()
+    if config.fx_rates_file:
+        loaded = await fx.load_rates_file(config.fx_rates_file)
+        logger.info("Loaded %d FX rate(s) from %s", loaded, config.fx_rates_file)
+    await storage.start()
     logger.info("Database connected")
 
     scheduler = setup_scheduler(bot)
@@ -32,9 +51,14 @@ async def main():
     logger.info("Scheduler started")
 
     try:
-        await dp.start_polling(bot)
+        if config.bot_mode == "webhook":
+            await run_webhook(bot, dp)
+        else:
+            await bot.delete_webhook()
+            await dp.start_polling(bot)
     finally:
         scheduler.shutdown()
+        await storage.close()
         await close_db()
         await bot.session.close()
 
@@ -1,6 +1,135 @@
 import datetime
+import re
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterable
 from decimal import Decimal
-from bot.db import get_pool
+from bot.db import get_pool, listen, listener_connected
+
+
+# ── Row types ────────────────────────────────────────────
+# Slotted rows instead of dict(record): no per-row hash table, and
+# attribute access everywhere. from_record() takes fields by name, so
+# columns a query does not select are simply None.
+
+@dataclass(slots=True)
+class Server:
+    id: int
+    hoster: str
+    hoster_id: int
+    server_name: str
+    payment_day: int
+    payment_type: str
+    monthly_cost: Decimal | None
+    currency: str
+    is_active: bool
+    created_at: datetime.datetime
+    count: int
+
+    @classmethod
+    def from_record(cls, record) -> "Server":
+        return cls(*map(record.get, cls.__slots__))
+
+
+@dataclass(slots=True)
+class Payment:
+    id: int
+    server_id: int
+    due_date: datetime.date
+    status: str
+    paid_at: datetime.datetime | None
+    notified_3d: bool
+    notified_1d: bool
+    # Joined from servers by the listing queries.
+    hoster: str | None = None
+    server_name: str | None = None
+    monthly_cost: Decimal | None = None
+    currency: str | None = None
+    payment_type: str | None = None
+    count: int | None = None
+
+    @classmethod
+    def from_record(cls, record) -> "Payment":
+        return cls(*map(record.get, cls.__slots__))
+
+
+@dataclass(slots=True)
+class Hoster:
+    id: int
+    hoster: str
+    count: int
+    monthly_totals: dict[str, Decimal]
+
+    @classmethod
+    def from_record(cls, record) -> "Hoster":
+        return cls(record["hoster_id"], record["hoster"], record["server_count"], record["monthly_totals"])
+
+
+@dataclass(slots=True)
+class MonthStat:
+    month: datetime.date
+    currency: str
+    status: str
+    payments: int
+    amount: Decimal
+
+    @classmethod
+    def from_record(cls, record) -> "MonthStat":
+        return cls(*map(record.get, cls.__slots__))
+
+
+@dataclass(slots=True)
+class OutboxItem:
+    id: int
+    kind: str  # due_3d | due_1d | problem
+    attempts: int
+    payment: Payment
+
+
+@dataclass(slots=True)
+class Digest:
+    id: int
+    kind: str  # outbox kind the digest collapses
+    due_date: datetime.date | None  # None for problem digests
+    payment_type: str
+    total: int
+
+    @classmethod
+    def from_record(cls, record) -> "Digest":
+        return cls(record["digest_id"], record["digest_kind"], record["digest_due_date"],
+                   record["digest_payment_type"], record["digest_total"])
+
+
+@dataclass(slots=True)
+class Listing:
+    """A navigation screen: one page of a hoster's servers, or else of hosters."""
+    servers: list[Server]
+    hosters: list[Hoster]
+    total: int
+
+
+# ── Data version ─────────────────────────────────────────
+# Version of what the list screens show (servers, hosters, FX rates), for
+# keying cached renders. Writes below bump it locally, so this replica
+# sees its own writes at once; the triggers of migration 014 NOTIFY the
+# others. Only trusted while the LISTEN connection is up.
+
+DATA_CHANNEL = "data_version"
+
+_data_version = 0
+
+
+def _bump_data_version(*_args) -> None:
+    global _data_version
+    _data_version += 1
+
+
+async def init_data_version() -> None:
+    await listen(DATA_CHANNEL, _bump_data_version, on_reset=_bump_data_version)
+
+
+def data_version() -> int | None:
+    """Current version, or None while changes on other replicas could be missed."""
+    return _data_version if listener_connected() else None
 
 
 # ── Servers ──────────────────────────────────────────────
@@ -13,7 +142,7 @@ async def add_server(
     monthly_cost: Decimal | None,
     currency: str,
     count: int = 1,
-) -> dict:
+) -> Server:
     pool = get_pool()
     row = await pool.fetchrow(
         """
@@ -23,16 +152,85 @@ async def add_server(
         """,
         hoster, server_name, payment_day, payment_type, monthly_cost, currency, count,
     )
-    return dict(row)
+    _bump_data_version()
+    return Server.from_record(row)
 
 
-async def get_server(server_id: int) -> dict | None:
+IMPORT_COLUMNS = ("line", "hoster", "server_name", "payment_day", "payment_type", "monthly_cost", "currency", "count")
+
+
+async def import_servers(records: Iterable[tuple]) -> dict:
+    """COPY validated rows (in IMPORT_COLUMNS order) into a staging table and merge.
+
+    Active servers matching a row's (hoster, server_name) are updated, the
+    other rows are inserted, all in one transaction. ``records`` is
+    consumed while streaming, so it can be a generator over the upload.
+    """
+    pool = get_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        await conn.execute(
+            """
+            CREATE TEMP TABLE import_staging (
+                line INTEGER PRIMARY KEY,
+                hoster VARCHAR(255) NOT NULL,
+                server_name VARCHAR(255) NOT NULL,
+                payment_day INTEGER NOT NULL,
+                payment_type VARCHAR(20) NOT NULL,
+                monthly_cost DECIMAL(10, 2),
+                currency VARCHAR(10) NOT NULL,
+                count INTEGER NOT NULL
+            ) ON COMMIT DROP
+            """
+        )
+        await conn.copy_records_to_table("import_staging", records=records, columns=IMPORT_COLUMNS)
+        await conn.execute("ANALYZE import_staging")
+        row = await conn.fetchrow(
+            """
+            WITH matched AS (
+                SELECT st.line, s.id AS server_id
+                FROM import_staging st
+                JOIN hosters h ON h.name = st.hoster
+                JOIN servers s ON s.hoster_id = h.id AND s.server_name = st.server_name AND s.is_active = TRUE
+            ),
+            updated AS (
+                UPDATE servers s
+                SET payment_day = st.payment_day, payment_type = st.payment_type,
+                    monthly_cost = st.monthly_cost, currency = st.currency, count = st.count
+                FROM matched m
+                JOIN import_staging st ON st.line = m.line
+                WHERE s.id = m.server_id
+                  AND (s.payment_day, s.payment_type, s.monthly_cost, s.currency, s.count)
+                      IS DISTINCT FROM (st.payment_day, st.payment_type, st.monthly_cost, st.currency, st.count)
+                RETURNING m.line
+            ),
+            inserted AS (
+                INSERT INTO servers (hoster, server_name, payment_day, payment_type, monthly_cost, currency, count)
+                SELECT st.hoster, st.server_name, st.payment_day, st.payment_type, st.monthly_cost, st.currency, st.count
+                FROM import_staging st
+                WHERE NOT EXISTS (SELECT 1 FROM matched m WHERE m.line = st.line)
+                ORDER BY st.line
+                RETURNING 1
+            )
+            SELECT (SELECT COUNT(*) FROM inserted) AS inserted,
+                   (SELECT COUNT(DISTINCT line) FROM updated) AS updated,
+                   (SELECT COUNT(DISTINCT line) FROM matched) AS matched
+            """
+        )
+    _bump_data_version()
+    return {
+        "inserted": row["inserted"],
+        "updated": row["updated"],
+        "unchanged": row["matched"] - row["updated"],
+    }
+
+
+async def get_server(server_id: int) -> Server | None:
     pool = get_pool()
     row = await pool.fetchrow("SELECT * FROM servers WHERE id = $1", server_id)
-    return dict(row) if row else None
+    return Server.from_record(row) if row else None
 
 
-async def list_servers(active_only: bool = True) -> list[dict]:
+async def list_servers(active_only: bool = True) -> list[Server]:
     pool = get_pool()
     if active_only:
         rows = await pool.fetch(
@@ -40,39 +238,225 @@ async def list_servers(active_only: bool = True) -> list[dict]:
         )
     else:
         rows = await pool.fetch("SELECT * FROM servers ORDER BY hoster, server_name")
-    return [dict(r) for r in rows]
+    return [Server.from_record(r) for r in rows]
 
 
-async def list_hosters() -> list[dict]:
+async def list_hosters() -> list[Hoster]:
     pool = get_pool()
     rows = await pool.fetch(
-        """
-        SELECT hoster, COUNT(*) AS count
-        FROM servers
-        WHERE is_active = TRUE
-        GROUP BY hoster
-        ORDER BY hoster
-        """
+        "SELECT hoster_id, hoster, server_count, monthly_totals FROM hoster_stats ORDER BY hoster"
     )
-    return [{"hoster": r["hoster"], "count": r["count"]} for r in rows]
+    return [Hoster.from_record(r) for r in rows]
 
 
-async def list_servers_by_hoster(hoster: str) -> list[dict]:
+async def get_hoster_name(hoster_id: int) -> str | None:
+    pool = get_pool()
+    return await pool.fetchval("SELECT name FROM hosters WHERE id = $1", hoster_id)
+
+
+async def get_hoster_id(name: str) -> int | None:
+    pool = get_pool()
+    return await pool.fetchval("SELECT id FROM hosters WHERE name = $1", name)
+
+
+async def list_servers_by_hoster(hoster: str) -> list[Server]:
     pool = get_pool()
     rows = await pool.fetch(
         "SELECT * FROM servers WHERE hoster = $1 AND is_active = TRUE ORDER BY server_name",
         hoster,
     )
-    return [dict(r) for r in rows]
+    return [Server.from_record(r) for r in rows]
+
+
+def _hoster_filter(column: str, param: str) -> str:
+    """SQL condition: ``column`` is a hoster named ``param``, ignoring case.
+
+    Names are only unique case-sensitively, so this can match several
+    hosters. A NULL ``param`` matches every row.
+    """
+    return f"({param}::varchar IS NULL OR {column} IN (SELECT id FROM hosters WHERE lower(name) = lower({param})))"
+
+
+async def list_hosters_page(
+    cursor_id: int | None = None,
+    before: bool = False,
+    limit: int = 8,
+) -> tuple[list[Hoster], int]:
+    """One page of hosters keyset-paginated on name, plus the total count.
+
+    ``cursor_id`` is the hoster the page continues from: the page holds the
+    hosters after it, or before it when ``before`` is set.
+    """
+    op, order = ("<", "DESC") if before else (">", "ASC")
+    pool = get_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT t.total, p.hoster_id, p.hoster, p.server_count, p.monthly_totals
+        FROM (SELECT COUNT(*) AS total FROM hoster_stats) t
+        LEFT JOIN LATERAL (
+            SELECT hoster_id, hoster, server_count, monthly_totals
+            FROM hoster_stats
+            WHERE $1::integer IS NULL OR hoster {op} (SELECT name FROM hosters WHERE id = $1)
+            ORDER BY hoster {order}
+            LIMIT $2
+        ) p ON TRUE
+        """,
+        cursor_id, limit,
+    )
+    hosters = [Hoster.from_record(r) for r in rows if r["hoster"] is not None]
+    if before:
+        hosters.reverse()
+    return hosters, rows[0]["total"]
+
+
+async def list_servers_page(
+    hoster_id: int | None = None,
+    cursor_id: int | None = None,
+    before: bool = False,
+    limit: int = 5,
+) -> tuple[list[Server], int]:
+    """One page of a hoster's servers keyset-paginated on (server_name, id).
+
+    Pass ``hoster_id`` for the first page, or ``cursor_id`` -- the server the
+    page continues from, whose hoster is used. Returns (servers, total).
+    """
+    if cursor_id is None:
+        anchor = "SELECT $1::integer AS hoster_id, NULL::varchar AS server_name, NULL::integer AS id"
+        keyset = "TRUE"
+        arg = hoster_id
+    else:
+        anchor = "SELECT hoster_id, server_name, id FROM servers WHERE id = $1"
+        op = "<" if before else ">"
+        keyset = f"(s.server_name, s.id) {op} (c.server_name, c.id)"
+        arg = cursor_id
+    order = "DESC" if before else "ASC"
+    pool = get_pool()
+    rows = await pool.fetch(
+        f"""
+        WITH c AS ({anchor})
+        SELECT t.total, p.*
+        FROM c
+        CROSS JOIN LATERAL (
+            SELECT COALESCE(
+                (SELECT server_count FROM hoster_stats WHERE hoster_id = c.hoster_id), 0
+            ) AS total
+        ) t
+        LEFT JOIN LATERAL (
+            SELECT s.* FROM servers s
+            WHERE s.hoster_id = c.hoster_id AND s.is_active = TRUE AND {keyset}
+            ORDER BY s.server_name {order}, s.id {order}
+            LIMIT $2
+        ) p ON TRUE
+        """,
+        arg, limit,
+    )
+    if not rows:
+        return [], 0
+    total = rows[0]["total"]
+    servers = [Server.from_record(r) for r in rows if r["id"] is not None]
+    if before:
+        servers.reverse()
+    return servers, total
 
 
 async def delete_server(server_id: int) -> bool:
     pool = get_pool()
     result = await pool.execute("DELETE FROM servers WHERE id = $1", server_id)
+    _bump_data_version()
     return result == "DELETE 1"
 
 
-async def update_server(server_id: int, **fields) -> dict | None:
+# The anchor CTE yields the server's (hoster_id, removed); the statement
+# returns the first page of that hoster's other active servers, or the
+# first page of hosters when there are none. A data-modifying anchor's
+# effects are invisible to the rest of the statement (and hoster_stats is
+# only updated by its trigger afterwards), so the removed server is
+# excluded and subtracted from the counts by hand.
+_LISTING_SQL = """
+    WITH a AS ({anchor}),
+    c AS (
+        SELECT a.hoster_id, a.removed,
+               COALESCE((SELECT server_count FROM hoster_stats hs WHERE hs.hoster_id = a.hoster_id), 0)
+               - (a.removed AND a.is_active)::int AS remaining
+        FROM a
+    ),
+    sp AS (
+        SELECT s.* FROM c
+        JOIN servers s ON s.hoster_id = c.hoster_id AND s.is_active = TRUE
+        WHERE NOT (c.removed AND s.id = $1)
+        ORDER BY s.server_name, s.id
+        LIMIT $2
+    ),
+    hp AS (
+        SELECT hs.hoster_id, hs.hoster, hs.server_count, hs.monthly_totals
+        FROM hoster_stats hs
+        WHERE NOT EXISTS (SELECT 1 FROM sp)
+          AND NOT EXISTS (SELECT 1 FROM c WHERE c.hoster_id = hs.hoster_id AND c.remaining <= 0)
+        ORDER BY hs.hoster
+        LIMIT $3
+    ),
+    t AS (
+        SELECT (SELECT COUNT(*) FROM a WHERE removed) AS removed,
+               (SELECT remaining FROM c) AS server_total,
+               (SELECT COUNT(*) FROM hoster_stats)
+               - (SELECT COUNT(*) FROM c JOIN hoster_stats hs USING (hoster_id) WHERE c.remaining <= 0)
+               AS hoster_total
+    )
+    SELECT t.removed, t.server_total, t.hoster_total, p.*
+    FROM t
+    LEFT JOIN LATERAL (
+        SELECT id, hoster_id, hoster, server_name, payment_day, payment_type, monthly_cost,
+               currency, is_active, created_at, count,
+               NULL::integer AS server_count, NULL::jsonb AS monthly_totals
+        FROM sp
+        UNION ALL
+        SELECT NULL, hoster_id, hoster, NULL, NULL, NULL, NULL,
+               NULL, NULL, NULL, NULL,
+               server_count, monthly_totals
+        FROM hp
+    ) p ON TRUE
+    ORDER BY p.server_name, p.id, p.hoster
+"""
+
+
+async def _listing(anchor: str, server_id: int, server_limit: int, hoster_limit: int) -> tuple[bool, Listing]:
+    pool = get_pool()
+    rows = await pool.fetch(_LISTING_SQL.format(anchor=anchor), server_id, server_limit, hoster_limit)
+    head = rows[0]
+    removed = head["removed"] > 0
+    if head["id"] is not None:
+        servers = [Server.from_record(r) for r in rows]
+        return removed, Listing(servers, [], head["server_total"])
+    hosters = [Hoster.from_record(r) for r in rows if r["hoster_id"] is not None]
+    return removed, Listing([], hosters, head["hoster_total"])
+
+
+async def delete_server_and_list(
+    server_id: int, server_limit: int = 5, hoster_limit: int = 8,
+) -> tuple[bool, Listing]:
+    """Delete a server and fetch the screen to show next, in one round trip.
+
+    Returns (deleted, listing): the first page of the hoster's remaining
+    servers, or the first page of hosters if none are left.
+    """
+    result = await _listing(
+        "DELETE FROM servers WHERE id = $1 RETURNING hoster_id, is_active, TRUE AS removed",
+        server_id, server_limit, hoster_limit,
+    )
+    _bump_data_version()
+    return result
+
+
+async def hoster_listing(server_id: int, server_limit: int = 5, hoster_limit: int = 8) -> Listing:
+    """First page of the server's hoster, or of hosters if it is gone -- one round trip."""
+    _, listing = await _listing(
+        "SELECT hoster_id, is_active, FALSE AS removed FROM servers WHERE id = $1",
+        server_id, server_limit, hoster_limit,
+    )
+    return listing
+
+
+async def update_server(server_id: int, **fields) -> Server | None:
     if not fields:
         return await get_server(server_id)
     pool = get_pool()
@@ -84,12 +468,13 @@ async def update_server(server_id: int, **fields) -> dict | None:
     values.append(server_id)
     query = f"UPDATE servers SET {', '.join(set_parts)} WHERE id = ${len(values)} RETURNING *"
     row = await pool.fetchrow(query, *values)
-    return dict(row) if row else None
+    _bump_data_version()
+    return Server.from_record(row) if row else None
 
 
 # ── Payments ─────────────────────────────────────────────
 
-async def ensure_payment(server_id: int, due_date: datetime.date) -> dict:
+async def ensure_payment(server_id: int, due_date: datetime.date) -> Payment:
     pool = get_pool()
     row = await pool.fetchrow(
         """
@@ -105,16 +490,102 @@ async def ensure_payment(server_id: int, due_date: datetime.date) -> dict:
             "SELECT * FROM payments WHERE server_id = $1 AND due_date = $2",
             server_id, due_date,
         )
-    return dict(row)
+    return Payment.from_record(row)
 
 
-async def get_payment(payment_id: int) -> dict | None:
+async def generate_payments_for_month(month_start: datetime.date) -> dict:
+    """Bulk ensure_payment for every active server, in one statement."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        WITH bounds AS (
+            SELECT $1::date AS month_start,
+                   EXTRACT(DAY FROM $1::date + INTERVAL '1 month' - INTERVAL '1 day')::integer AS last_day
+        ),
+        target AS (
+            SELECT s.id AS server_id,
+                   b.month_start + (LEAST(s.payment_day, b.last_day) - 1) AS due_date
+            FROM servers s, bounds b
+            WHERE s.is_active = TRUE
+        ),
+        inserted AS (
+            INSERT INTO payments (server_id, due_date)
+            SELECT server_id, due_date FROM target
+            ON CONFLICT (server_id, due_date) DO NOTHING
+            RETURNING 1
+        )
+        SELECT (SELECT COUNT(*) FROM target) AS total,
+               (SELECT COUNT(*) FROM inserted) AS created
+        """,
+        month_start.replace(day=1),
+    )
+    return {"created": row["created"], "existing": row["total"] - row["created"]}
+
+
+async def generate_payments(today: datetime.date, lookahead_days: int) -> dict:
+    """Create missing payments up to the month of ``today + lookahead_days``.
+
+    Only active servers whose generated_through watermark is behind that
+    month are visited; each gets every month from its watermark (or the
+    current month) through the horizon, and its watermark is advanced in
+    the same statement.
+    """
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        WITH params AS (
+            SELECT date_trunc('month', $1::date)::date AS first_month,
+                   date_trunc('month', $1::date + $2::integer)::date AS last_month
+        ),
+        lagging AS (
+            SELECT s.id, s.payment_day, p.last_month,
+                   GREATEST((s.generated_through + INTERVAL '1 month')::date, p.first_month) AS from_month
+            FROM servers s, params p
+            WHERE s.is_active = TRUE
+              AND (s.generated_through IS NULL OR s.generated_through < p.last_month)
+        ),
+        target AS (
+            SELECT l.id AS server_id,
+                   m.month + (LEAST(
+                       l.payment_day,
+                       EXTRACT(DAY FROM m.month + INTERVAL '1 month' - INTERVAL '1 day')::integer
+                   ) - 1) AS due_date
+            FROM lagging l,
+                 LATERAL (
+                     SELECT g::date AS month
+                     FROM generate_series(l.from_month, l.last_month, INTERVAL '1 month') g
+                 ) m
+        ),
+        inserted AS (
+            INSERT INTO payments (server_id, due_date)
+            SELECT server_id, due_date FROM target
+            ON CONFLICT (server_id, due_date) DO NOTHING
+            RETURNING 1
+        ),
+        advanced AS (
+            -- Re-checked against the latest row version, so a concurrent
+            -- payment_day edit (which resets the watermark) is not undone.
+            UPDATE servers s SET generated_through = l.last_month
+            FROM lagging l
+            WHERE s.id = l.id AND s.payment_day = l.payment_day AND s.is_active = TRUE
+            RETURNING 1
+        )
+        SELECT (SELECT COUNT(*) FROM advanced) AS servers,
+               (SELECT COUNT(*) FROM target) AS total,
+               (SELECT COUNT(*) FROM inserted) AS created
+        """,
+        today, lookahead_days,
+    )
+    return {"servers": row["servers"], "created": row["created"], "existing": row["total"] - row["created"]}
+
+
+async def get_payment(payment_id: int) -> Payment | None:
     pool = get_pool()
     row = await pool.fetchrow("SELECT * FROM payments WHERE id = $1", payment_id)
-    return dict(row) if row else None
+    return Payment.from_record(row) if row else None
 
 
-async def mark_payment(payment_id: int, status: str) -> dict | None:
+async def mark_payment(payment_id: int, status: str) -> Payment | None:
     pool = get_pool()
     paid_at = datetime.datetime.now() if status in ("paid", "confirmed") else None
     row = await pool.fetchrow(
@@ -124,18 +595,28 @@ async def mark_payment(payment_id: int, status: str) -> dict | None:
         """,
         status, paid_at, payment_id,
     )
-    return dict(row) if row else None
+    return Payment.from_record(row) if row else None
 
 
-async def set_notified(payment_id: int, days: int) -> None:
+async def mark_payments(payment_ids: list[int], status: str) -> list[int]:
+    """Set-based mark_payment for open (pending/problem) payments; returns changed ids."""
+    if not payment_ids:
+        return []
     pool = get_pool()
-    col = "notified_3d" if days == 3 else "notified_1d"
-    await pool.execute(
-        f"UPDATE payments SET {col} = TRUE WHERE id = $1", payment_id
+    rows = await pool.fetch(
+        """
+        UPDATE payments
+        SET status = $2,
+            paid_at = CASE WHEN $2 IN ('paid', 'confirmed') THEN LOCALTIMESTAMP END
+        WHERE id = ANY($1::integer[]) AND status IN ('pending', 'problem') AND status <> $2
+        RETURNING id
+        """,
+        payment_ids, status,
     )
+    return [r["id"] for r in rows]
 
 
-async def get_upcoming_payments(days_ahead: int = 14) -> list[dict]:
+async def get_upcoming_payments(days_ahead: int = 14) -> list[Payment]:
     pool = get_pool()
     rows = await pool.fetch(
         """
@@ -149,39 +630,658 @@ async def get_upcoming_payments(days_ahead: int = 14) -> list[dict]:
         """,
         days_ahead,
     )
-    return [dict(r) for r in rows]
+    return [Payment.from_record(r) for r in rows]
+
 
+async def iter_upcoming_payments(
+    days_ahead: int = 14,
+    hoster: str | None = None,
+    payment_type: str | None = None,
+    status: str | None = "pending",
+    page_size: int = 200,
+) -> AsyncIterator[Payment]:
+    """Stream upcoming payments in due-date order, ``page_size`` rows at a time.
 
-async def get_pending_notifications() -> list[dict]:
+    Pages are keyset-paginated on (due_date, id), so no connection or
+    transaction is held while the caller handles the rows. ``hoster`` is
+    matched case-insensitively; ``status=None`` means any status.
+    """
+    pool = get_pool()
+    after: tuple[datetime.date, int] | None = None
+    while True:
+        rows = await pool.fetch(
+            f"""
+            SELECT p.*, s.hoster, s.server_name, s.monthly_cost, s.currency, s.payment_type, s.count
+            FROM payments p
+            JOIN servers s ON s.id = p.server_id
+            WHERE p.due_date BETWEEN CURRENT_DATE AND CURRENT_DATE + $1::integer
+              AND ($2::varchar IS NULL OR p.status = $2)
+              AND {_hoster_filter("s.hoster_id", "$3")}
+              AND ($4::varchar IS NULL OR s.payment_type = $4)
+              AND s.is_active = TRUE
+              AND ($5::date IS NULL OR (p.due_date, p.id) > ($5, $6::integer))
+            ORDER BY p.due_date, p.id
+            LIMIT $7
+            """,
+            days_ahead, status, hoster, payment_type, *(after or (None, None)), page_size,
+        )
+        for row in rows:
+            yield Payment.from_record(row)
+        if len(rows) < page_size:
+            return
+        after = rows[-1]["due_date"], rows[-1]["id"]
+
+
+# ── Payment partitions ───────────────────────────────────
+# payments is partitioned by month (migration 013); these back bot/archive.py.
+
+_PARTITION_RE = re.compile(r"payments_\d{4}_\d{2}")
+
+
+def _partition(table: str) -> str:
+    if not _PARTITION_RE.fullmatch(table):
+        raise ValueError(f"not a monthly payments partition: {table!r}")
+    return table
+
+
+async def ensure_payment_partitions(start: datetime.date, end: datetime.date) -> int:
+    """Create the missing monthly partitions for [start, end]; returns how many."""
+    pool = get_pool()
+    return await pool.fetchval("SELECT payments_ensure_partitions($1, $2)", start, end)
+
+
+async def list_payment_partitions() -> list[tuple[str, datetime.date, bool]]:
+    """Monthly partition tables as (table, month, attached), oldest first.
+
+    Detached ones are left over from an archive run that did not finish.
+    """
     pool = get_pool()
     rows = await pool.fetch(
         """
-        SELECT p.*, s.hoster, s.server_name, s.monthly_cost, s.currency, s.payment_type, s.count
-        FROM payments p
+        SELECT c.relname, to_date(substr(c.relname, 10), 'YYYY_MM') AS month,
+               i.inhrelid IS NOT NULL AS attached
+        FROM pg_class c
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid AND i.inhparent = 'payments'::regclass
+        WHERE c.relkind = 'r'
+          AND c.relnamespace = current_schema()::regnamespace
+          AND c.relname ~ '^payments_[0-9]{4}_[0-9]{2}$'
+        ORDER BY c.relname
+        """
+    )
+    return [(r["relname"], r["month"], r["attached"]) for r in rows]
+
+
+async def detach_payment_partition(table: str) -> bool:
+    """Detach a month from payments; False if it still has open payments."""
+    pool = get_pool()
+    return await pool.fetchval("SELECT payments_detach_partition($1)", _partition(table))
+
+
+async def dump_payment_partition(table: str, output) -> int:
+    """COPY a partition out as CSV with a header; ``output`` as in asyncpg copy_from_table."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        status = await conn.copy_from_table(_partition(table), output=output, format="csv", header=True)
+    return _copy_count(status)
+
+
+async def drop_payment_partition(table: str) -> None:
+    """Drop a partition table once archived; refuses one still attached."""
+    table = _partition(table)
+    pool = get_pool()
+    async with pool.acquire() as conn, conn.transaction():
+        attached = await conn.fetchval(
+            "SELECT EXISTS (SELECT 1 FROM pg_inherits WHERE inhrelid = to_regclass($1))", table,
+        )
+        if attached:
+            raise ValueError(f"{table} is still attached to payments")
+        if await conn.fetchval("SELECT to_regclass($1) IS NOT NULL", table):
+            # DROP TABLE fires no row triggers; clear the outbox by hand.
+            await conn.execute(f"DELETE FROM outbox WHERE payment_id IN (SELECT id FROM {table})")
+            await conn.execute(f"DROP TABLE {table}")
+
+
+# ── Export ───────────────────────────────────────────────
+# COPY ... TO STDOUT as CSV; rows are handed to ``output`` (as in asyncpg
+# copy_from_query) chunk by chunk and never collected here.
+
+def _copy_count(status: str) -> int:
+    # "COPY 1234"
+    return int(status.split()[-1])
+
+
+async def export_servers(output, hoster: str | None = None) -> int:
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        status = await conn.copy_from_query(
+            f"""
+            SELECT s.id, s.hoster, s.server_name, s.payment_day, s.payment_type,
+                   s.monthly_cost, s.currency, s.count, s.is_active, s.created_at
+            FROM servers s
+            WHERE {_hoster_filter("s.hoster_id", "$1")}
+            ORDER BY s.hoster, s.server_name, s.id
+            """,
+            hoster,
+            output=output, format="csv", header=True,
+        )
+    return _copy_count(status)
+
+
+async def export_payments(
+    output, start: datetime.date, end: datetime.date, hoster: str | None = None,
+) -> int:
+    """Payments due in [start, end]; the bounds prune payments partitions."""
+    pool = get_pool()
+    async with pool.acquire() as conn:
+        status = await conn.copy_from_query(
+            f"""
+            SELECT p.id, p.due_date, p.status, p.paid_at, p.server_id, s.hoster, s.server_name,
+                   s.payment_type, s.monthly_cost, s.currency, s.count
+            FROM payments p
+            JOIN servers s ON s.id = p.server_id
+            WHERE p.due_date BETWEEN $1 AND $2
+              AND {_hoster_filter("s.hoster_id", "$3")}
+            ORDER BY p.due_date, p.id
+            """,
+            start, end, hoster,
+            output=output, format="csv", header=True,
+        )
+    return _copy_count(status)
+
+
+# ── Outbox ───────────────────────────────────────────────
+
+async def enqueue_due_notifications(shard: int = 0, shards: int = 1) -> int:
+    """Queue 3-day / 1-day reminders for due payments and flag them, atomically.
+
+    Returns the number of messages queued.
+    """
+    pool = get_pool()
+    return await pool.fetchval(
+        """
+        WITH due AS (
+            SELECT p.id, p.due_date,
+                   CASE
+                       WHEN p.due_date = CURRENT_DATE + 3 AND NOT p.notified_3d THEN 3
+                       WHEN p.due_date <= CURRENT_DATE + 1 AND NOT p.notified_1d THEN 1
+                   END AS days
+            FROM payments p
+            JOIN servers s ON s.id = p.server_id
+            WHERE p.status = 'pending'
+              AND s.is_active = TRUE
+              AND p.due_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 3
+              AND p.server_id % $2 = $1
+        ),
+        flagged AS (
+            UPDATE payments p
+            SET notified_3d = p.notified_3d OR d.days = 3,
+                notified_1d = p.notified_1d OR d.days = 1
+            FROM due d
+            WHERE p.id = d.id AND p.due_date = d.due_date AND d.days IS NOT NULL
+              AND p.due_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 3
+              AND p.status = 'pending'
+              AND NOT CASE WHEN d.days = 3 THEN p.notified_3d ELSE p.notified_1d END
+            RETURNING p.id, d.days
+        ),
+        queued AS (
+            INSERT INTO outbox (dedupe_key, kind, payment_id)
+            SELECT 'due_' || days || 'd:' || id, 'due_' || days || 'd', id FROM flagged
+            ON CONFLICT (dedupe_key) DO NOTHING
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM queued
+        """,
+        shard, shards,
+    )
+
+
+async def enqueue_problem_reminders(run_key: str, shard: int = 0, shards: int = 1) -> int:
+    """Queue one reminder per open problem payment for the run ``run_key``.
+
+    Every month with a problem payment stays attached (see migration 013),
+    however old; the partial problem index keeps the scan to those rows.
+    """
+    pool = get_pool()
+    return await pool.fetchval(
+        """
+        WITH queued AS (
+            INSERT INTO outbox (dedupe_key, kind, payment_id)
+            SELECT 'problem:' || p.id || ':' || $1, 'problem', p.id
+            FROM payments p
+            JOIN servers s ON s.id = p.server_id
+            WHERE p.status = 'problem' AND s.is_active = TRUE
+              AND p.server_id % $3 = $2
+            ON CONFLICT (dedupe_key) DO NOTHING
+            RETURNING 1
+        )
+        SELECT COUNT(*) FROM queued
+        """,
+        run_key, shard, shards,
+    )
+
+
+async def claim_outbox(limit: int, lease_seconds: int) -> list[OutboxItem]:
+    """Claim up to ``limit`` due messages, skipping rows other workers hold.
+
+    Claimed rows stay pending with next_attempt_at pushed ``lease_seconds``
+    ahead; the caller marks them sent, dropped or retried before that.
+    Rows whose payment is gone (no foreign key since migration 013) are
+    marked dropped by the claim itself and not returned.
+    """
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        WITH claimed AS (
+            UPDATE outbox o
+            SET attempts = o.attempts + 1,
+                next_attempt_at = NOW() + $2 * INTERVAL '1 second',
+                status = CASE WHEN c.orphaned THEN 'dropped' ELSE o.status END
+            FROM (
+                SELECT q.id, NOT EXISTS (SELECT 1 FROM payments p WHERE p.id = q.payment_id) AS orphaned
+                FROM outbox q
+                WHERE q.status = 'pending' AND q.next_attempt_at <= NOW()
+                ORDER BY q.next_attempt_at
+                LIMIT $1
+                FOR UPDATE OF q SKIP LOCKED
+            ) c
+            WHERE o.id = c.id
+            RETURNING o.id AS outbox_id, o.kind, o.attempts, o.payment_id, c.orphaned
+        )
+        SELECT c.outbox_id, c.kind, c.attempts,
+               p.*, s.hoster, s.server_name, s.monthly_cost, s.currency, s.payment_type, s.count
+        FROM claimed c
+        JOIN payments p ON p.id = c.payment_id
         JOIN servers s ON s.id = p.server_id
-        WHERE p.status = 'pending'
-          AND s.is_active = TRUE
-          AND p.due_date BETWEEN CURRENT_DATE AND CURRENT_DATE + 3
-        ORDER BY p.due_date
+        WHERE NOT c.orphaned
+        ORDER BY c.outbox_id
+        """,
+        limit, lease_seconds,
+    )
+    return [OutboxItem(r["outbox_id"], r["kind"], r["attempts"], Payment.from_record(r)) for r in rows]
+
+
+async def extend_outbox_lease(ids: list[int], lease_seconds: int) -> None:
+    """Push the lease on still-pending claimed rows ``lease_seconds`` ahead."""
+    if not ids:
+        return
+    pool = get_pool()
+    await pool.execute(
+        """
+        UPDATE outbox SET next_attempt_at = NOW() + $2 * INTERVAL '1 second'
+        WHERE id = ANY($1::bigint[]) AND status = 'pending'
+        """,
+        ids, lease_seconds,
+    )
+
+
+async def finish_outbox(ids: list[int], status: str = "sent") -> None:
+    if not ids:
+        return
+    pool = get_pool()
+    await pool.execute(
         """
+        UPDATE outbox
+        SET status = $2, sent_at = CASE WHEN $2 = 'sent' THEN NOW() END
+        WHERE id = ANY($1::bigint[])
+        """,
+        ids, status,
+    )
+
+
+async def retry_outbox(failures: list[tuple[int, str]], max_attempts: int, base_delay: int) -> None:
+    """Reschedule failed sends with exponential backoff; give up after ``max_attempts``."""
+    if not failures:
+        return
+    ids, errors = zip(*failures)
+    pool = get_pool()
+    await pool.execute(
+        """
+        UPDATE outbox o
+        SET last_error = f.error,
+            status = CASE WHEN o.attempts >= $3 THEN 'failed' ELSE 'pending' END,
+            next_attempt_at = NOW() + LEAST($4::integer * 2 ^ (o.attempts - 1), 86400) * INTERVAL '1 second'
+        FROM unnest($1::bigint[], $2::text[]) AS f(id, error)
+        WHERE o.id = f.id
+        """,
+        list(ids), list(errors), max_attempts, base_delay,
+    )
+
+
+async def create_digest(kind: str, due_date: datetime.date | None, payment_type: str, payment_ids: list[int]) -> int:
+    pool = get_pool()
+    return await pool.fetchval(
+        """
+        INSERT INTO digests (kind, due_date, payment_type, payment_ids)
+        VALUES ($1, $2, $3, $4::integer[])
+        RETURNING id
+        """,
+        kind, due_date, payment_type, payment_ids,
     )
-    return [dict(r) for r in rows]
+
+
+async def get_digest_page(digest_id: int, offset: int, limit: int) -> tuple[Digest, list[Payment]] | None:
+    """A digest and one page of its payments (in digest order), one query."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT d.id AS digest_id, d.kind AS digest_kind, d.due_date AS digest_due_date,
+               d.payment_type AS digest_payment_type, cardinality(d.payment_ids) AS digest_total,
+               p.*, s.hoster, s.server_name, s.monthly_cost, s.currency, s.payment_type, s.count
+        FROM digests d
+        LEFT JOIN LATERAL (
+            SELECT u.payment_id, u.n
+            FROM unnest(d.payment_ids) WITH ORDINALITY AS u(payment_id, n)
+            ORDER BY u.n
+            OFFSET $2 LIMIT $3
+        ) u ON TRUE
+        LEFT JOIN payments p ON p.id = u.payment_id
+        LEFT JOIN servers s ON s.id = p.server_id
+        WHERE d.id = $1
+        ORDER BY u.n
+        """,
+        digest_id, offset, limit,
+    )
+    if not rows:
+        return None
+    return Digest.from_record(rows[0]), [Payment.from_record(r) for r in rows if r["id"] is not None]
+
+
+async def get_digest_payments(digest_id: int) -> tuple[str, list[int]] | None:
+    """(payment_type, payment_ids) of a digest."""
+    pool = get_pool()
+    row = await pool.fetchrow("SELECT payment_type, payment_ids FROM digests WHERE id = $1", digest_id)
+    return (row["payment_type"], row["payment_ids"]) if row else None
+
+
+async def purge_outbox(days: int) -> int:
+    """Drop finished outbox rows and digests older than ``days``."""
+    pool = get_pool()
+    result = await pool.fetchval(
+        """
+        WITH o AS (
+            DELETE FROM outbox
+            WHERE status <> 'pending' AND created_at < NOW() - $1 * INTERVAL '1 day'
+            RETURNING 1
+        ),
+        d AS (
+            DELETE FROM digests WHERE created_at < NOW() - $1 * INTERVAL '1 day'
+        )
+        SELECT COUNT(*) FROM o
+        """,
+        days,
+    )
+    return result
+
+
+# ── Statistics ───────────────────────────────────────────
+
+async def refresh_payment_stats() -> None:
+    pool = get_pool()
+    await pool.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY payment_month_stats")
+
+
+async def get_month_stats(start: datetime.date, end: datetime.date) -> list[MonthStat]:
+    """Rows of payment_month_stats for months in [start, end]."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT month, currency, status, payments, amount
+        FROM payment_month_stats
+        WHERE month BETWEEN $1 AND $2
+        ORDER BY month, currency, status
+        """,
+        start, end,
+    )
+    return [MonthStat.from_record(r) for r in rows]
+
+
+async def get_monthly_spend(hoster: str | None = None) -> dict[str, Decimal]:
+    """Monthly cost of active servers per currency, from hoster_stats."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        f"""
+        SELECT t.key AS currency, SUM(t.value::numeric) AS total
+        FROM hoster_stats hs, jsonb_each_text(hs.monthly_totals) t
+        WHERE {_hoster_filter("hs.hoster_id", "$1")}
+        GROUP BY t.key
+        ORDER BY t.key
+        """,
+        hoster,
+    )
+    return {r["currency"]: r["total"] for r in rows}
+
+
+# ── FX rates ─────────────────────────────────────────────
+
+async def upsert_fx_rates(rates: list[tuple[str, datetime.date, Decimal]], channel: str) -> int:
+    """Insert or replace many (currency, rate_date, rate) rows and NOTIFY ``channel``."""
+    if not rates:
+        return 0
+    currencies, dates, values = zip(*rates)
+    pool = get_pool()
+    saved = await pool.fetchval(
+        """
+        WITH upsert AS (
+            INSERT INTO fx_rates (currency, rate_date, rate)
+            SELECT * FROM unnest($1::varchar[], $2::date[], $3::numeric[])
+            ON CONFLICT (currency, rate_date) DO UPDATE SET rate = EXCLUDED.rate
+            RETURNING 1
+        )
+        SELECT t.n FROM (SELECT COUNT(*) AS n FROM upsert) t, pg_notify($4, '')
+        """,
+        list(currencies), list(dates), list(values), channel,
+    )
+    _bump_data_version()
+    return saved
+
+
+async def get_fx_rates(on: datetime.date) -> dict[str, tuple[Decimal, datetime.date]]:
+    """Effective rate per currency on ``on``: currency -> (rate, rate_date)."""
+    pool = get_pool()
+    rows = await pool.fetch(
+        """
+        SELECT DISTINCT ON (currency) currency, rate, rate_date
+        FROM fx_rates
+        WHERE rate_date <= $1
+        ORDER BY currency, rate_date DESC
+        """,
+        on,
+    )
+    return {r["currency"]: (r["rate"], r["rate_date"]) for r in rows}
+
+
+# ── Job leases ───────────────────────────────────────────
+
+async def acquire_job_lease(job: str, fire_key: str, holder: str, ttl: int) -> bool:
+    """Take the lease for one run of ``job``.
+
+    Succeeds if the lease is free (finished or expired) and this fire_key
+    has not already been completed -- so an expired, unfinished run can be
+    taken over, but a finished one is never repeated.
+    """
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        INSERT INTO job_leases AS l (job, fire_key, holder, expires_at, finished)
+        VALUES ($1, $2, $3, NOW() + $4 * INTERVAL '1 second', FALSE)
+        ON CONFLICT (job) DO UPDATE
+        SET fire_key = EXCLUDED.fire_key,
+            holder = EXCLUDED.holder,
+            expires_at = EXCLUDED.expires_at,
+            finished = FALSE
+        WHERE (l.finished OR l.expires_at < NOW())
+          AND NOT (l.finished AND l.fire_key = EXCLUDED.fire_key)
+        RETURNING holder
+        """,
+        job, fire_key, holder, ttl,
+    )
+    return row is not None
+
+
+async def renew_job_lease(job: str, holder: str, ttl: int) -> bool:
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        UPDATE job_leases SET expires_at = NOW() + $3 * INTERVAL '1 second'
+        WHERE job = $1 AND holder = $2 AND NOT finished
+        """,
+        job, holder, ttl,
+    )
+    return result == "UPDATE 1"
+
+
+async def finish_job_lease(job: str, holder: str) -> None:
+    pool = get_pool()
+    await pool.execute(
+        "UPDATE job_leases SET finished = TRUE WHERE job = $1 AND holder = $2",
+        job, holder,
+    )
+
+
+async def release_job_lease(job: str, holder: str) -> None:
+    """Expire an unfinished lease now, so its run can be taken over at once."""
+    pool = get_pool()
+    await pool.execute(
+        "UPDATE job_leases SET expires_at = NOW() WHERE job = $1 AND holder = $2 AND NOT finished",
+        job, holder,
+    )
+
+
+async def get_job_lease(job: str) -> tuple[str, bool, float] | None:
+    """(fire_key, finished, seconds until expiry) of the current lease."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT fire_key, finished, EXTRACT(EPOCH FROM expires_at - NOW())::float AS expires_in
+        FROM job_leases WHERE job = $1
+        """,
+        job,
+    )
+    return (row["fire_key"], row["finished"], row["expires_in"]) if row else None
+
+
+# ── FSM state ────────────────────────────────────────────
+
+async def get_fsm_state(key: str, ttl: int) -> tuple[str | None, dict, float] | None:
+    """(state, data, age in seconds) unless missing or idle longer than ``ttl``."""
+    pool = get_pool()
+    row = await pool.fetchrow(
+        """
+        SELECT state, data, EXTRACT(EPOCH FROM NOW() - updated_at)::float AS age
+        FROM fsm_states
+        WHERE key = $1 AND updated_at > NOW() - $2 * INTERVAL '1 second'
+        """,
+        key, ttl,
+    )
+    return (row["state"], row["data"], row["age"]) if row else None
+
+
+# Writes touch one column; the other is reset if the row had already
+# expired, so a stale conversation is never revived.
+
+async def set_fsm_state(key: str, state: str | None, ttl: int, channel: str, payload: str) -> None:
+    pool = get_pool()
+    await pool.execute(
+        """
+        WITH upsert AS (
+            INSERT INTO fsm_states AS f (key, state) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE
+            SET state = $2,
+                data = CASE WHEN f.updated_at > NOW() - $3 * INTERVAL '1 second'
+                            THEN f.data ELSE '{}'::jsonb END,
+                updated_at = NOW()
+            RETURNING key
+        )
+        SELECT pg_notify($4, $5) FROM upsert
+        """,
+        key, state, ttl, channel, payload,
+    )
+
+
+async def set_fsm_data(key: str, data: dict, ttl: int, channel: str, payload: str) -> None:
+    pool = get_pool()
+    await pool.execute(
+        """
+        WITH upsert AS (
+            INSERT INTO fsm_states AS f (key, data) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE
+            SET data = $2,
+                state = CASE WHEN f.updated_at > NOW() - $3 * INTERVAL '1 second'
+                             THEN f.state END,
+                updated_at = NOW()
+            RETURNING key
+        )
+        SELECT pg_notify($4, $5) FROM upsert
+        """,
+        key, data, ttl, channel, payload,
+    )
+
+
+async def purge_fsm_states(ttl: int) -> int:
+    """Drop conversations idle for longer than ``ttl`` and empty leftovers."""
+    pool = get_pool()
+    result = await pool.execute(
+        """
+        DELETE FROM fsm_states
+        WHERE updated_at < NOW() - $1 * INTERVAL '1 second'
+           OR (state IS NULL AND data = '{}'::jsonb)
+        """,
+        ttl,
+    )
+    return int(result.split()[-1])
 
 
 # ── Settings ─────────────────────────────────────────────
+# Settings are read on every notification, so they are served from an
+# in-process cache. Writes go through set_setting, which NOTIFYs other
+# replicas; the cache is only trusted while the LISTEN connection is up.
+
+SETTINGS_CHANNEL = "settings_changed"
+
+_settings_cache: dict[str, str | None] = {}
+_settings_generation = 0  # bumped on every invalidation, guards in-flight reads
+
+
+def _on_settings_changed(conn, pid, channel, key: str) -> None:
+    global _settings_generation
+    _settings_generation += 1
+    _settings_cache.pop(key, None)
+
+
+def _reset_settings_cache() -> None:
+    global _settings_generation
+    _settings_generation += 1
+    _settings_cache.clear()
+
+
+async def init_settings_cache() -> None:
+    await listen(SETTINGS_CHANNEL, _on_settings_changed, on_reset=_reset_settings_cache)
+
 
 async def get_setting(key: str) -> str | None:
+    if key in _settings_cache:
+        return _settings_cache[key]
+    generation = _settings_generation
     pool = get_pool()
     row = await pool.fetchrow("SELECT value FROM settings WHERE key = $1", key)
-    return row["value"] if row else None
+    value = row["value"] if row else None
+    if listener_connected() and generation == _settings_generation:
+        _settings_cache[key] = value
+    return value
 
 
 async def set_setting(key: str, value: str) -> None:
     pool = get_pool()
     await pool.execute(
         """
-        INSERT INTO settings (key, value) VALUES ($1, $2)
-        ON CONFLICT (key) DO UPDATE SET value = $2
+        WITH upsert AS (
+            INSERT INTO settings (key, value) VALUES ($1, $2)
+            ON CONFLICT (key) DO UPDATE SET value = $2
+            RETURNING key
+        )
+        SELECT pg_notify($3, key) FROM upsert
         """,
-        key, value,
+        key, value, SETTINGS_CHANNEL,
     )
+    if listener_connected():
+        _settings_cache[key] = value
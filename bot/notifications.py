@@ -1,9 +1,8 @@
-import datetime
-
-from aiogram import Bot
+from aiogram.types import InlineKeyboardMarkup
 
 from bot import models
-from bot.keyboards.inline import payment_auto_kb, payment_invoice_kb
+from bot.models import Payment
+from bot.keyboards.inline import DIGEST_PAGE_SIZE, digest_kb, payment_auto_kb, payment_invoice_kb
 
 CURRENCY_SYMBOLS = {"RUB": "₽", "USD": "$", "EUR": "€"}
 
@@ -15,14 +14,10 @@ def _format_cost(amount, currency: str) -> str:
     return f"{amount} {symbol}"
 
 
-async def send_notification(bot: Bot, payment: dict, days_left: int) -> None:
-    chat_id = await models.get_setting("notify_chat_id")
-    if not chat_id:
-        return
-
-    ptype = payment["payment_type"]
-    cost_str = _format_cost(payment["monthly_cost"], payment["currency"]) if payment["monthly_cost"] else "—"
-    date_str = payment["due_date"].strftime("%d.%m.%Y")
+def render_notification(payment: Payment, days_left: int) -> tuple[str, InlineKeyboardMarkup | None]:
+    ptype = payment.payment_type
+    cost_str = _format_cost(payment.monthly_cost, payment.currency) if payment.monthly_cost else "—"
+    date_str = payment.due_date.strftime("%d.%m.%Y")
 
     if ptype == "invoice":
         if days_left == 3:
@@ -30,7 +25,7 @@ async def send_notification(bot: Bot, payment: dict, days_left: int) -> None:
         else:
             header = "🔴 Оплата завтра!"
         ptype_label = "Инвойс"
-        kb = payment_invoice_kb(payment["id"])
+        kb = payment_invoice_kb(payment.id)
     else:
         if days_left == 3:
             header = "ℹ️ Автосписание через 3 дня"
@@ -39,35 +34,66 @@ async def send_notification(bot: Bot, payment: dict, days_left: int) -> None:
         else:
             header = "ℹ️ Автосписание завтра"
             ptype_label = "Автосписание"
-            kb = payment_auto_kb(payment["id"])
+            kb = payment_auto_kb(payment.id)
 
     text = (
         f"{header}\n\n"
-        f"Хостер: {payment['hoster']}\n"
-        f"Сервер: {payment['server_name']}\n"
+        f"Хостер: {payment.hoster}\n"
+        f"Сервер: {payment.server_name}\n"
         f"Сумма: {cost_str}\n"
         f"Тип: {ptype_label}\n"
         f"Дата: {date_str}"
     )
+    return text, kb
 
-    await bot.send_message(chat_id=int(chat_id), text=text, reply_markup=kb)
-
-
-async def send_problem_reminder(bot: Bot, payment: dict) -> None:
-    chat_id = await models.get_setting("notify_chat_id")
-    if not chat_id:
-        return
 
-    cost_str = _format_cost(payment["monthly_cost"], payment["currency"]) if payment["monthly_cost"] else "—"
-    date_str = payment["due_date"].strftime("%d.%m.%Y")
+def render_problem_reminder(payment: Payment) -> tuple[str, InlineKeyboardMarkup]:
+    cost_str = _format_cost(payment.monthly_cost, payment.currency) if payment.monthly_cost else "—"
+    date_str = payment.due_date.strftime("%d.%m.%Y")
 
     text = (
         f"🔁 Напоминание: проблема с оплатой\n\n"
-        f"Хостер: {payment['hoster']}\n"
-        f"Сервер: {payment['server_name']}\n"
+        f"Хостер: {payment.hoster}\n"
+        f"Сервер: {payment.server_name}\n"
         f"Сумма: {cost_str}\n"
         f"Дата: {date_str}"
     )
 
-    kb = payment_auto_kb(payment["id"])
-    await bot.send_message(chat_id=int(chat_id), text=text, reply_markup=kb)
+    return text, payment_auto_kb(payment.id)
+
+
+def render_outbox(item: models.OutboxItem) -> tuple[str, InlineKeyboardMarkup | None] | None:
+    """Text for a queued message, or None if its payment no longer needs it."""
+    payment = item.payment
+    if item.kind == "problem":
+        return render_problem_reminder(payment) if payment.status == "problem" else None
+    if payment.status != "pending":
+        return None
+    return render_notification(payment, 3 if item.kind == "due_3d" else 1)
+
+
+# ── Digests ──────────────────────────────────────────────
+
+DIGEST_HEADERS = {
+    "due_3d": "⚠️ Оплаты через 3 дня",
+    "due_1d": "🔴 Оплаты завтра",
+    "problem": "🔁 Напоминание: проблемы с оплатой",
+}
+STATUS_ICONS = {"pending": "⏳", "paid": "✅", "confirmed": "✅", "problem": "❌"}
+
+
+def render_digest(
+    digest: models.Digest, payments: list[Payment], page: int,
+) -> tuple[str, InlineKeyboardMarkup]:
+    ptype_label = "Инвойс" if digest.payment_type == "invoice" else "Автосписание"
+    header = f"{DIGEST_HEADERS[digest.kind]} — {ptype_label}"
+    if digest.due_date is not None:
+        header += f", {digest.due_date.strftime('%d.%m.%Y')}"
+    lines = [f"{header} ({digest.total})", ""]
+    for i, p in enumerate(payments, start=page * DIGEST_PAGE_SIZE + 1):
+        cost_str = _format_cost(p.monthly_cost, p.currency) if p.monthly_cost else "—"
+        line = f"{i}. {STATUS_ICONS.get(p.status, '')} {p.hoster} / {p.server_name} — {cost_str}"
+        if digest.due_date is None:
+            line += f" ({p.due_date.strftime('%d.%m.%Y')})"
+        lines.append(line)
+    return "\n".join(lines), digest_kb(digest, payments, page)
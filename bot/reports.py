@@ -0,0 +1,97 @@
+import asyncio
+from typing import AsyncIterable, Awaitable, Callable
+
+from aiogram.exceptions import TelegramRetryAfter
+
+from bot.config import config
+
+# Telegram rejects messages longer than this many characters.
+MESSAGE_LIMIT = 4096
+
+
+class ChunkedMessage:
+    """Accumulates report blocks and sends them as messages fill up.
+
+    Messages are split between blocks, or between lines when a block does
+    not fit on its own, so only one message worth of text is ever held.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[object]],
+        limit: int = MESSAGE_LIMIT,
+        separator: str = "\n\n",
+    ):
+        self.send = send
+        self.limit = limit
+        self.separator = separator
+        self.sent = 0
+        self._buffer = ""
+
+    async def add(self, block: str) -> None:
+        candidate = f"{self._buffer}{self.separator}{block}" if self._buffer else block
+        if len(candidate) <= self.limit:
+            self._buffer = candidate
+            return
+        await self.flush()
+        if len(block) <= self.limit:
+            self._buffer = block
+            return
+        for line in block.split("\n"):
+            # A single over-long line is cut hard; nothing else is split mid-line.
+            while len(line) > self.limit:
+                await self.flush()
+                await self._send(line[:self.limit])
+                line = line[self.limit:]
+            candidate = f"{self._buffer}\n{line}" if self._buffer else line
+            if len(candidate) > self.limit:
+                await self.flush()
+                candidate = line
+            self._buffer = candidate
+
+    async def flush(self) -> None:
+        if self._buffer:
+            await self._send(self._buffer)
+            self._buffer = ""
+
+    async def _send(self, text: str) -> None:
+        # A long report to one chat runs into flood control; wait it out
+        # rather than stopping halfway.
+        for attempt in range(config.notify_max_retries + 1):
+            try:
+                await self.send(text)
+                break
+            except TelegramRetryAfter as e:
+                if attempt == config.notify_max_retries:
+                    raise
+                await asyncio.sleep(e.retry_after)
+        self.sent += 1
+
+
+async def send_report(
+    send: Callable[[str], Awaitable[object]],
+    header: str,
+    blocks: AsyncIterable[str],
+    empty: str,
+    footer: Callable[[], Awaitable[str | None]] | None = None,
+) -> int:
+    """Stream ``blocks`` under ``header``; sends ``empty`` if there are none.
+
+    ``footer`` is awaited after the last block (so it can summarise them)
+    and its text, if any, closes the report. Returns the number of blocks.
+    """
+    chunks = ChunkedMessage(send)
+    count = 0
+    async for block in blocks:
+        if count == 0:
+            await chunks.add(header)
+        await chunks.add(block)
+        count += 1
+    if count == 0:
+        await chunks.add(empty)
+        await chunks.flush()
+        return 0
+    if footer is not None and (text := await footer()):
+        await chunks.add(text)
+    await chunks.flush()
+    return count
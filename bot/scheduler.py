@@ -1,67 +1,230 @@
-import calendar
+import asyncio
+import contextlib
 import datetime
 import logging
+from collections import defaultdict
 
 from aiogram import Bot
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 
-from bot import models
-from bot.notifications import send_notification, send_problem_reminder
+from bot import archive, models, screens
+from bot.config import config
+from bot.delivery import NotificationDispatcher
+from bot.leader import fire_key, run_exclusive, run_sharded
+from bot.keyboards.inline import DIGEST_PAGE_SIZE
+from bot.notifications import render_digest, render_outbox
 
 logger = logging.getLogger(__name__)
 
+NOTIFY_BATCH_SIZE = 500
+# Digests are built per claimed batch, so claim more to keep groups whole.
+DIGEST_BATCH_SIZE = 5000
+DIGEST_SETTING = "digest_mode"
 
-async def generate_monthly_payments() -> None:
-    today = datetime.date.today()
-    servers = await models.list_servers(active_only=True)
-    last_day = calendar.monthrange(today.year, today.month)[1]
 
-    for s in servers:
-        pay_day = min(s["payment_day"], last_day)
-        due_date = today.replace(day=pay_day)
-        await models.ensure_payment(s["id"], due_date)
+async def generate_monthly_payments() -> dict:
+    counts = await models.generate_payments(datetime.date.today(), config.payment_lookahead_days)
+    logger.info(
+        "Payments generated for %d lagging server(s): %d created, %d existing",
+        counts["servers"], counts["created"], counts["existing"],
+    )
+    return counts
 
 
 async def check_and_notify(bot: Bot) -> None:
-    today = datetime.date.today()
-
+    # Only queues; drain_outbox_job delivers.
     await generate_monthly_payments()
+    await notify_due_payments(bot)
+
+
+async def notify_due_payments(bot: Bot, shard: int = 0, shards: int = 1) -> None:
+    # Reminders are flagged and queued in one statement; the outbox drain
+    # delivers them (here and on every other replica).
+    queued = await models.enqueue_due_notifications(shard, shards)
+    logger.info("Queued %d payment reminder(s) (shard %d/%d)", queued, shard + 1, shards)
+
+
+async def check_problems(bot: Bot, shard: int = 0, shards: int = 1, run_key: str | None = None) -> None:
+    queued = await models.enqueue_problem_reminders(run_key or fire_key(PROBLEM_PERIOD), shard, shards)
+    logger.info("Queued %d problem reminder(s) (shard %d/%d)", queued, shard + 1, shards)
+
+
+async def _digest_messages(live: list[tuple[models.OutboxItem, tuple]]) -> list[tuple[list[int], str, object]]:
+    """Collapse queued messages into one digest per (kind, day, payment type)."""
+    groups: dict[tuple, list[tuple[models.OutboxItem, tuple]]] = defaultdict(list)
+    for item, rendered in live:
+        day = None if item.kind == "problem" else item.payment.due_date
+        groups[item.kind, day, item.payment.payment_type].append((item, rendered))
+
+    messages = []
+    for (kind, day, payment_type), entries in groups.items():
+        if len(entries) == 1:
+            [(item, (text, kb))] = entries
+            messages.append(([item.id], text, kb))
+            continue
+        payments = [item.payment for item, _ in entries]
+        digest_id = await models.create_digest(kind, day, payment_type, [p.id for p in payments])
+        digest = models.Digest(digest_id, kind, day, payment_type, len(payments))
+        text, kb = render_digest(digest, payments[:DIGEST_PAGE_SIZE], 0)
+        messages.append(([item.id for item, _ in entries], text, kb))
+    return messages
+
+
+def _claim_size(batch_size: int, per_chat_rate: float) -> int:
+    # Everything goes to one chat, so a batch takes at least
+    # size / per_chat_rate seconds to send; keep that well inside the lease.
+    return max(1, min(batch_size, int(config.outbox_lease * per_chat_rate / 2)))
+
+
+async def _hold_outbox_lease(ids: list[int]) -> None:
+    """Keep extending the lease on a batch until cancelled."""
+    while True:
+        await asyncio.sleep(config.outbox_lease / 3)
+        try:
+            await models.extend_outbox_lease(ids, config.outbox_lease)
+        except Exception:
+            logger.exception("Failed to extend the outbox lease")
+
+
+async def drain_outbox(bot: Bot) -> int:
+    """Deliver queued messages until none are due; returns how many were sent.
+
+    Batches are claimed with SKIP LOCKED, so concurrent drains never send
+    the same message, but the scheduler only runs one at a time (see
+    drain_outbox_job) to keep within the per-chat rate. Each message
+    is marked sent as soon as Telegram accepts it, and the batch lease is
+    extended while it is being sent. With the digest setting on, each
+    batch is collapsed into digest messages.
+    """
+    chat_id = await models.get_setting("notify_chat_id")
+    if not chat_id:
+        return 0
+    digest_mode = await models.get_setting(DIGEST_SETTING) == "on"
+
+    sent_total = 0
+    async with NotificationDispatcher(bot) as dispatcher:
+        if digest_mode:
+            # Digests collapse rows, so a batch sends far fewer messages
+            # than it claims; the lease is extended for the rest.
+            batch_size = DIGEST_BATCH_SIZE
+        else:
+            batch_size = _claim_size(NOTIFY_BATCH_SIZE, dispatcher.per_chat_rate)
+        while True:
+            items = await models.claim_outbox(batch_size, config.outbox_lease)
+            if not items:
+                break
+            sent = 0
+            dropped: list[int] = []
+            failed: list[tuple[int, str]] = []
+            live = []
+            for item in items:
+                rendered = render_outbox(item)
+                if rendered is None:
+                    dropped.append(item.id)
+                else:
+                    live.append((item, rendered))
+            await models.finish_outbox(dropped, "dropped")
 
-    payments = await models.get_pending_notifications()
+            lease = asyncio.create_task(_hold_outbox_lease([item.id for item, _ in live]))
+            try:
+                if digest_mode:
+                    messages = await _digest_messages(live)
+                else:
+                    messages = [([item.id], text, kb) for item, (text, kb) in live]
 
-    for p in payments:
-        days_left = (p["due_date"] - today).days
+                for outbox_ids, text, kb in messages:
+                    async def on_sent(outbox_ids=outbox_ids) -> None:
+                        nonlocal sent
+                        await models.finish_outbox(outbox_ids)
+                        sent += len(outbox_ids)
 
-        if days_left == 3 and not p["notified_3d"]:
-            await send_notification(bot, p, days_left=3)
-            await models.set_notified(p["id"], days=3)
+                    async def on_failed(error: str, outbox_ids=outbox_ids) -> None:
+                        failed.extend((outbox_id, error) for outbox_id in outbox_ids)
 
-        elif days_left <= 1 and not p["notified_1d"]:
-            await send_notification(bot, p, days_left=1)
-            await models.set_notified(p["id"], days=1)
+                    await dispatcher.submit(int(chat_id), text, reply_markup=kb, on_sent=on_sent, on_failed=on_failed)
+                await dispatcher.join()
+            finally:
+                lease.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await lease
 
-    logger.info("Daily payment check completed")
+            await models.retry_outbox(failed, config.outbox_max_attempts, config.outbox_retry_base)
+            sent_total += sent
 
+    if sent_total:
+        logger.info("Outbox drained: %s", dispatcher.stats)
+    return sent_total
 
-async def check_problems(bot: Bot) -> None:
-    pool = models.get_pool()
-    rows = await pool.fetch(
-        """
-        SELECT p.*, s.hoster, s.server_name, s.monthly_cost, s.currency, s.payment_type
-        FROM payments p
-        JOIN servers s ON s.id = p.server_id
-        WHERE p.status = 'problem' AND s.is_active = TRUE
-        """
+
+# ── Scheduled entry points ───────────────────────────────
+# Every replica fires these; job leases make each run happen once.
+
+DAILY_PERIOD = 24 * 3600
+PROBLEM_PERIOD = 12 * 3600
+PURGE_PERIOD = 3600
+OUTBOX_DRAIN_PERIOD = 30
+OUTBOX_RETENTION_DAYS = 30
+STATS_REFRESH_PERIOD = 15 * 60
+
+
+async def daily_check_job(bot: Bot) -> None:
+    key = fire_key(DAILY_PERIOD)
+    await run_exclusive("generate_payments", key, generate_monthly_payments)
+    await run_sharded(
+        "daily_check", key, config.scheduler_shards,
+        lambda shard, shards: notify_due_payments(bot, shard, shards),
     )
-    for row in rows:
-        await send_problem_reminder(bot, dict(row))
+
+
+async def problem_reminder_job(bot: Bot) -> None:
+    key = fire_key(PROBLEM_PERIOD)
+    await run_sharded(
+        "problem_reminder", key, config.scheduler_shards,
+        lambda shard, shards: check_problems(bot, shard, shards, key),
+    )
+
+
+async def drain_outbox_job(bot: Bot) -> None:
+    # The only drainer. Everything goes to one chat and each drain's
+    # dispatcher limits only its own sends, so a single replica drains at
+    # a time; the queueing jobs above leave delivery to the next tick.
+    await run_exclusive("drain_outbox", fire_key(OUTBOX_DRAIN_PERIOD), lambda: drain_outbox(bot))
+
+
+async def purge_job() -> None:
+    async def purge() -> None:
+        removed = await models.purge_fsm_states(config.fsm_ttl)
+        logger.info("Purged %d stale FSM state(s)", removed)
+        removed = await models.purge_outbox(OUTBOX_RETENTION_DAYS)
+        logger.info("Purged %d finished outbox message(s)", removed)
+
+    await run_exclusive("purge", fire_key(PURGE_PERIOD), purge)
+
+
+async def partitions_job() -> None:
+    async def maintain() -> None:
+        created = await archive.ensure_partitions()
+        logger.info("Created %d payment partition(s)", created)
+        for path in await archive.archive_closed_months():
+            logger.info("Archived payments to %s", path)
+
+    await run_exclusive("payment_partitions", fire_key(DAILY_PERIOD), maintain)
+
+
+async def render_cache_stats_job() -> None:
+    # Per process, so no lease: every replica logs its own cache.
+    logger.info("Render cache: %s", screens.render_cache.stats())
+
+
+async def refresh_stats_job() -> None:
+    await run_exclusive("refresh_payment_stats", fire_key(STATS_REFRESH_PERIOD), models.refresh_payment_stats)
 
 
 def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
     scheduler = AsyncIOScheduler(timezone="Europe/Moscow")
 
     scheduler.add_job(
-        check_and_notify,
+        daily_check_job,
         "cron",
         hour=9,
         minute=0,
@@ -70,13 +233,59 @@ def setup_scheduler(bot: Bot) -> AsyncIOScheduler:
         replace_existing=True,
     )
 
+    # Cron, not an interval: interval triggers count from process start, so
+    # replicas could fire on either side of a PROBLEM_PERIOD boundary and
+    # each win a different fire key. 00:00/12:00 Moscow is mid-period in UTC.
     scheduler.add_job(
-        check_problems,
-        "interval",
-        hours=12,
+        problem_reminder_job,
+        "cron",
+        hour="*/12",
+        minute=0,
         kwargs={"bot": bot},
         id="problem_reminder",
         replace_existing=True,
     )
 
+    scheduler.add_job(
+        purge_job,
+        "interval",
+        seconds=PURGE_PERIOD,
+        id="purge",
+        replace_existing=True,
+    )
+
+    scheduler.add_job(
+        drain_outbox_job,
+        "interval",
+        seconds=OUTBOX_DRAIN_PERIOD,
+        kwargs={"bot": bot},
+        id="drain_outbox",
+        replace_existing=True,
+    )
+
+    scheduler.add_job(
+        partitions_job,
+        "cron",
+        hour=3,
+        minute=30,
+        id="payment_partitions",
+        replace_existing=True,
+    )
+
+    scheduler.add_job(
+        render_cache_stats_job,
+        "interval",
+        seconds=PURGE_PERIOD,
+        id="render_cache_stats",
+        replace_existing=True,
+    )
+
+    scheduler.add_job(
+        refresh_stats_job,
+        "interval",
+        seconds=STATS_REFRESH_PERIOD,
+        id="refresh_payment_stats",
+        replace_existing=True,
+    )
+
     return scheduler
@@ -0,0 +1,133 @@
+"""Hoster and server list screens, rendered through a versioned cache.
+
+A screen is the (text, keyboard) a list message is edited to. Renders are
+kept in an LRU keyed by (screen, page args, models.data_version(), day),
+so browsing an unchanged fleet neither queries the database nor rebuilds
+the keyboard objects. Any write to servers or FX rates moves the version
+on, which retires every entry at once; the day is part of the key because
+converted totals follow the rate in effect today.
+"""
+import datetime
+from collections import OrderedDict
+from typing import Awaitable, Callable
+
+from aiogram.types import InlineKeyboardMarkup
+
+from bot import fx, models
+from bot.config import config
+from bot.keyboards.inline import HOSTER_PAGE_SIZE, SERVER_PAGE_SIZE, hoster_list_kb, hoster_servers_kb
+
+Screen = tuple[str, InlineKeyboardMarkup | None]
+
+EMPTY_LIST = "Список серверов пуст."
+
+
+class RenderCache:
+    """LRU of rendered screens; bypassed while the data version is unknown."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._entries: OrderedDict[tuple, object] = OrderedDict()
+        self._version: tuple | None = None
+
+    async def get(self, key: tuple, render: Callable[[], Awaitable[object]]):
+        data_version = models.data_version()
+        if data_version is None:
+            self.bypassed += 1
+            return await render()
+        version = (data_version, datetime.date.today())
+        if version != self._version:
+            # Older entries can no longer be hit; free them now.
+            self._entries.clear()
+            self._version = version
+        full_key = (*key, *version)
+        if full_key in self._entries:
+            self.hits += 1
+            self._entries.move_to_end(full_key)
+            return self._entries[full_key]
+
+        self.misses += 1
+        value = await render()
+        # A write during the render moved the version on; the result may
+        # predate it and its key can never be hit, so it is not kept.
+        if models.data_version() == data_version and self._version == version:
+            self._entries[full_key] = value
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+        return value
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+        }
+
+
+render_cache = RenderCache(config.render_cache_size)
+
+
+# ── Screens ──────────────────────────────────────────────
+
+async def _hoster_list_screen(hosters: list[models.Hoster], page: int, total: int) -> Screen:
+    converted = await fx.convert_many(h.monthly_totals for h in hosters)
+    return "Ваши хостеры:", hoster_list_kb(hosters, page=page, total=total, converted=converted)
+
+
+def _servers_screen(servers: list[models.Server], page: int, total: int) -> Screen:
+    return f"Серверы хостера {servers[0].hoster}:", hoster_servers_kb(servers, page=page, total=total)
+
+
+async def hoster_list(page: int = 0, cursor: int | None = None, before: bool = False) -> Screen | None:
+    """A page of hosters (the first one if the page has emptied); None if there are none."""
+    async def render() -> Screen | None:
+        hosters, total = await models.list_hosters_page(cursor, before=before, limit=HOSTER_PAGE_SIZE)
+        first_page = page
+        if not hosters and cursor is not None:
+            first_page = 0
+            hosters, total = await models.list_hosters_page(limit=HOSTER_PAGE_SIZE)
+        if not hosters:
+            return None
+        return await _hoster_list_screen(hosters, first_page, total)
+
+    return await render_cache.get(("hosters", page, cursor, before), render)
+
+
+async def hoster_servers(hoster_id: int) -> Screen | None:
+    """First page of a hoster's servers; None if it has none."""
+    async def render() -> Screen | None:
+        servers, total = await models.list_servers_page(hoster_id=hoster_id, limit=SERVER_PAGE_SIZE)
+        return _servers_screen(servers, 0, total) if servers else None
+
+    return await render_cache.get(("hoster_servers", hoster_id), render)
+
+
+async def server_page(page: int, cursor: int, before: bool) -> Screen | None:
+    """A further page of a hoster's servers; None if the list changed under it."""
+    async def render() -> Screen | None:
+        servers, total = await models.list_servers_page(cursor_id=cursor, before=before, limit=SERVER_PAGE_SIZE)
+        return _servers_screen(servers, page, total) if servers else None
+
+    return await render_cache.get(("server_page", page, cursor, before), render)
+
+
+async def render_listing(listing: models.Listing) -> Screen:
+    if listing.servers:
+        return _servers_screen(listing.servers, 0, listing.total)
+    if listing.hosters:
+        return await _hoster_list_screen(listing.hosters, 0, listing.total)
+    return EMPTY_LIST, None
+
+
+async def hoster_listing(server_id: int) -> Screen:
+    """The screen "back" from a server leads to: its hoster, or the hoster list."""
+    async def render() -> Screen:
+        return await render_listing(await models.hoster_listing(server_id, SERVER_PAGE_SIZE, HOSTER_PAGE_SIZE))
+
+    return await render_cache.get(("hoster_listing", server_id), render)
@@ -0,0 +1,105 @@
+"""Server field rules shared by the /add conversation and /import.
+
+Each validator takes raw user input (text, or a JSON value) and returns
+the normalised value, or raises ValueError with a message for the user.
+"""
+import unicodedata
+from decimal import Decimal, InvalidOperation
+from typing import Any, Mapping
+
+PAYMENT_TYPES = ("invoice", "auto")
+CURRENCIES = ("RUB", "USD", "EUR")
+NAME_MAX_LENGTH = 255
+# servers.monthly_cost is DECIMAL(10, 2).
+COST_LIMIT = Decimal("1e8")
+CENT = Decimal("0.01")
+
+
+def _text(value: Any) -> str:
+    return "" if value is None else str(value).strip()
+
+
+def name(value: Any, field: str = "название") -> str:
+    text = _text(value)
+    if not text:
+        raise ValueError(f"{field}: пустое значение")
+    if len(text) > NAME_MAX_LENGTH:
+        raise ValueError(f"{field}: длиннее {NAME_MAX_LENGTH} символов")
+    # Control characters (NUL is refused by Postgres) and lone surrogates
+    # (not encodable as UTF-8) can only come from a crafted upload.
+    if any(unicodedata.category(c) in ("Cc", "Cs") for c in text):
+        raise ValueError(f"{field}: недопустимые символы")
+    return text
+
+
+def payment_day(value: Any) -> int:
+    try:
+        day = int(_text(value))
+    except ValueError:
+        day = 0
+    if not 1 <= day <= 31:
+        raise ValueError("день оплаты: нужно число от 1 до 31")
+    return day
+
+
+def payment_type(value: Any) -> str:
+    text = _text(value).lower()
+    if text not in PAYMENT_TYPES:
+        raise ValueError(f"тип оплаты: {' или '.join(PAYMENT_TYPES)}")
+    return text
+
+
+def monthly_cost(value: Any) -> Decimal | None:
+    """Cost per unit; 0 or empty means unknown (None)."""
+    text = _text(value).replace(",", ".")
+    if not text:
+        return None
+    try:
+        cost = Decimal(text)
+    except InvalidOperation:
+        cost = Decimal(-1)
+    if not cost.is_finite() or cost < 0 or cost >= COST_LIMIT:
+        raise ValueError("стоимость: нужно неотрицательное число (например, 49.00)")
+    return cost.quantize(CENT) if cost > 0 else None
+
+
+def count(value: Any) -> int:
+    try:
+        n = int(_text(value))
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise ValueError("количество: нужно целое число больше 0")
+    return n
+
+
+def currency(value: Any) -> str:
+    code = _text(value).upper()
+    if code not in CURRENCIES:
+        raise ValueError(f"валюта: одна из {', '.join(CURRENCIES)}")
+    return code
+
+
+def server_row(row: Mapping[str, Any]) -> dict:
+    """Validate an imported server; currency and count default like in the table.
+
+    Raises ValueError listing every invalid field.
+    """
+    fields = {
+        "hoster": lambda v: name(v, "хостер"),
+        "server_name": lambda v: name(v, "сервер"),
+        "payment_day": payment_day,
+        "payment_type": payment_type,
+        "monthly_cost": monthly_cost,
+        "currency": lambda v: currency(v if _text(v) else "RUB"),
+        "count": lambda v: count(v if _text(v) else 1),
+    }
+    result, errors = {}, []
+    for key, validate in fields.items():
+        try:
+            result[key] = validate(row.get(key))
+        except ValueError as e:
+            errors.append(str(e))
+    if errors:
+        raise ValueError("; ".join(errors))
+    return result
@@ -0,0 +1,109 @@
+import asyncio
+import hmac
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from aiohttp import web
+
+from bot.config import config
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """Receives updates over HTTP and runs each one as its own task.
+
+    Telegram gets its 200 as soon as the update is parsed; handlers run
+    concurrently (bounded by ``max_concurrency``). When too many updates are
+    queued the server answers 503 and Telegram redelivers later.
+    """
+
+    def __init__(self, bot: Bot, dp: Dispatcher, secret: str, max_concurrency: int):
+        self.bot = bot
+        self.dp = dp
+        self.secret = secret
+        self.max_pending = max_concurrency * 4
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._closing = False
+
+    def app(self, path: str) -> web.Application:
+        app = web.Application()
+        app.router.add_post(path, self.handle)
+        app.router.add_get("/healthz", self.health)
+        return app
+
+    async def health(self, request: web.Request) -> web.Response:
+        return web.Response(status=503 if self._closing else 200, text="draining" if self._closing else "ok")
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, ""), self.secret):
+            return web.Response(status=401)
+        if self._closing or len(self._tasks) >= self.max_pending:
+            return web.Response(status=503)
+
+        try:
+            update = Update.model_validate(await request.json(), context={"bot": self.bot})
+        except ValueError:
+            logger.warning("Rejected malformed webhook payload")
+            return web.Response(status=400)
+
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.Response()
+
+    async def _process(self, update: Update) -> None:
+        async with self._semaphore:
+            try:
+                await self.dp.feed_update(self.bot, update)
+            except Exception:
+                logger.exception("Failed to process update %s", update.update_id)
+
+    async def drain(self, timeout: float) -> None:
+        """Stop accepting updates and wait for the in-flight ones."""
+        self._closing = True
+        if not self._tasks:
+            return
+        logger.info("Draining %d in-flight update(s)", len(self._tasks))
+        done, pending = await asyncio.wait(set(self._tasks), timeout=timeout)
+        for task in pending:
+            task.cancel()
+        if pending:
+            logger.warning("Cancelled %d update(s) still running after %ss", len(pending), timeout)
+
+
+async def run_webhook(bot: Bot, dp: Dispatcher) -> None:
+    if not config.webhook_url or not config.webhook_secret:
+        raise RuntimeError("WEBHOOK_URL and WEBHOOK_SECRET must be set when BOT_MODE=webhook")
+
+    server = WebhookServer(bot, dp, config.webhook_secret, config.webhook_max_concurrency)
+    runner = web.AppRunner(server.app(config.webhook_path))
+    await runner.setup()
+    await web.TCPSite(runner, config.webhook_host, config.webhook_port).start()
+
+    await bot.set_webhook(
+        url=config.webhook_url + config.webhook_path,
+        secret_token=config.webhook_secret,
+        allowed_updates=dp.resolve_used_update_types(),
+    )
+    logger.info("Webhook server listening on %s:%s", config.webhook_host, config.webhook_port)
+    await dp.emit_startup(bot=bot)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    try:
+        await stop.wait()
+    finally:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.remove_signal_handler(sig)
+        # The webhook stays registered: other replicas keep serving it.
+        await server.drain(config.webhook_drain_timeout)
+        await runner.cleanup()
+        await dp.emit_shutdown(bot=bot)
@@ -0,0 +1,62 @@
+-- Per-hoster summary of active servers, kept current by triggers on servers.
+-- monthly_totals maps currency -> SUM(monthly_cost * count).
+CREATE TABLE IF NOT EXISTS hoster_stats (
+    hoster VARCHAR(255) PRIMARY KEY,
+    server_count INTEGER NOT NULL DEFAULT 0,
+    monthly_totals JSONB NOT NULL DEFAULT '{}'::jsonb
+);
+
+CREATE OR REPLACE FUNCTION hoster_stats_apply(
+    p_hoster VARCHAR, p_currency VARCHAR, p_servers INTEGER, p_cost NUMERIC
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO hoster_stats AS hs (hoster, server_count, monthly_totals)
+    VALUES (p_hoster, p_servers, jsonb_strip_nulls(jsonb_build_object(p_currency, p_cost)))
+    ON CONFLICT (hoster) DO UPDATE
+    SET server_count = hs.server_count + EXCLUDED.server_count,
+        monthly_totals = jsonb_strip_nulls(hs.monthly_totals || jsonb_build_object(
+            p_currency,
+            NULLIF(COALESCE((hs.monthly_totals ->> p_currency)::numeric, 0) + COALESCE(p_cost, 0), 0)
+        ));
+
+    DELETE FROM hoster_stats WHERE hoster = p_hoster AND server_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION servers_hoster_stats_trg() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+        PERFORM hoster_stats_apply(OLD.hoster, OLD.currency, -1, -(OLD.monthly_cost * OLD.count));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+        PERFORM hoster_stats_apply(NEW.hoster, NEW.currency, 1, NEW.monthly_cost * NEW.count);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS servers_hoster_stats ON servers;
+CREATE TRIGGER servers_hoster_stats
+    AFTER INSERT OR DELETE OR UPDATE OF hoster, currency, monthly_cost, count, is_active ON servers
+    FOR EACH ROW EXECUTE FUNCTION servers_hoster_stats_trg();
+
+-- Backfill from the current contents of servers.
+TRUNCATE hoster_stats;
+INSERT INTO hoster_stats (hoster, server_count, monthly_totals)
+SELECT c.hoster, c.server_count, COALESCE(t.monthly_totals, '{}'::jsonb)
+FROM (
+    SELECT hoster, COUNT(*) AS server_count
+    FROM servers WHERE is_active = TRUE
+    GROUP BY hoster
+) c
+LEFT JOIN (
+    SELECT hoster, jsonb_object_agg(currency, total) AS monthly_totals
+    FROM (
+        SELECT hoster, currency, SUM(monthly_cost * count) AS total
+        FROM servers
+        WHERE is_active = TRUE AND monthly_cost IS NOT NULL
+        GROUP BY hoster, currency
+    ) per_currency
+    WHERE total <> 0
+    GROUP BY hoster
+) t ON t.hoster = c.hoster;
@@ -0,0 +1,15 @@
+-- Indexes for the hot read paths:
+--   servers page / hoster lookup  -> list_servers_page, list_servers_by_hoster
+--   pending payments by due date  -> get_upcoming_payments, get_pending_notifications
+--   problem payments              -> check_problems
+CREATE INDEX IF NOT EXISTS idx_servers_hoster_active
+    ON servers (hoster, server_name, id)
+    WHERE is_active = TRUE;
+
+CREATE INDEX IF NOT EXISTS idx_payments_pending_due
+    ON payments (due_date)
+    WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_payments_problem_due
+    ON payments (due_date)
+    WHERE status = 'problem';
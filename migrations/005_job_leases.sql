@@ -0,0 +1,10 @@
+-- One row per scheduled job (or job shard). A replica may run the job for
+-- a given fire_key only after winning the lease; an unfinished lease that
+-- expires can be taken over by a standby replica.
+CREATE TABLE IF NOT EXISTS job_leases (
+    job VARCHAR(100) PRIMARY KEY,
+    fire_key VARCHAR(100) NOT NULL,
+    holder VARCHAR(255) NOT NULL,
+    expires_at TIMESTAMPTZ NOT NULL,
+    finished BOOLEAN NOT NULL DEFAULT FALSE
+);
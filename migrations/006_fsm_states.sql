@@ -0,0 +1,9 @@
+-- aiogram FSM state shared by all replicas (see bot/fsm_storage.py).
+CREATE TABLE IF NOT EXISTS fsm_states (
+    key VARCHAR(255) PRIMARY KEY,
+    state VARCHAR(255),
+    data JSONB NOT NULL DEFAULT '{}'::jsonb,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_fsm_states_updated_at ON fsm_states (updated_at);
@@ -0,0 +1,70 @@
+-- Hosters get integer ids so callbacks and lookups don't carry names.
+-- servers.hoster keeps the name (written by the app); a trigger resolves
+-- it to servers.hoster_id, creating the hoster on first use.
+CREATE TABLE IF NOT EXISTS hosters (
+    id SERIAL PRIMARY KEY,
+    name VARCHAR(255) UNIQUE NOT NULL
+);
+
+INSERT INTO hosters (name)
+SELECT DISTINCT hoster FROM servers
+ON CONFLICT (name) DO NOTHING;
+
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS hoster_id INTEGER REFERENCES hosters(id);
+UPDATE servers s SET hoster_id = h.id
+FROM hosters h
+WHERE h.name = s.hoster AND s.hoster_id IS DISTINCT FROM h.id;
+ALTER TABLE servers ALTER COLUMN hoster_id SET NOT NULL;
+
+CREATE OR REPLACE FUNCTION servers_resolve_hoster_trg() RETURNS TRIGGER AS $$
+BEGIN
+    INSERT INTO hosters (name) VALUES (NEW.hoster) ON CONFLICT (name) DO NOTHING;
+    SELECT id INTO NEW.hoster_id FROM hosters WHERE name = NEW.hoster;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS servers_resolve_hoster ON servers;
+CREATE TRIGGER servers_resolve_hoster
+    BEFORE INSERT OR UPDATE OF hoster ON servers
+    FOR EACH ROW EXECUTE FUNCTION servers_resolve_hoster_trg();
+
+CREATE INDEX IF NOT EXISTS idx_servers_hoster_id_active
+    ON servers (hoster_id, server_name, id)
+    WHERE is_active = TRUE;
+
+-- hoster_stats is addressed by id as well.
+ALTER TABLE hoster_stats ADD COLUMN IF NOT EXISTS hoster_id INTEGER;
+UPDATE hoster_stats hs SET hoster_id = h.id FROM hosters h WHERE h.name = hs.hoster;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_hoster_stats_hoster_id ON hoster_stats (hoster_id);
+
+DROP FUNCTION IF EXISTS hoster_stats_apply(VARCHAR, VARCHAR, INTEGER, NUMERIC);
+
+CREATE OR REPLACE FUNCTION hoster_stats_apply(
+    p_hoster_id INTEGER, p_hoster VARCHAR, p_currency VARCHAR, p_servers INTEGER, p_cost NUMERIC
+) RETURNS VOID AS $$
+BEGIN
+    INSERT INTO hoster_stats AS hs (hoster, hoster_id, server_count, monthly_totals)
+    VALUES (p_hoster, p_hoster_id, p_servers, jsonb_strip_nulls(jsonb_build_object(p_currency, p_cost)))
+    ON CONFLICT (hoster) DO UPDATE
+    SET server_count = hs.server_count + EXCLUDED.server_count,
+        monthly_totals = jsonb_strip_nulls(hs.monthly_totals || jsonb_build_object(
+            p_currency,
+            NULLIF(COALESCE((hs.monthly_totals ->> p_currency)::numeric, 0) + COALESCE(p_cost, 0), 0)
+        ));
+
+    DELETE FROM hoster_stats WHERE hoster = p_hoster AND server_count <= 0;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION servers_hoster_stats_trg() RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.is_active THEN
+        PERFORM hoster_stats_apply(OLD.hoster_id, OLD.hoster, OLD.currency, -1, -(OLD.monthly_cost * OLD.count));
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.is_active THEN
+        PERFORM hoster_stats_apply(NEW.hoster_id, NEW.hoster, NEW.currency, 1, NEW.monthly_cost * NEW.count);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
@@ -0,0 +1,15 @@
+-- Monthly payment amounts by currency and status for /stats. Amounts use
+-- the server's current monthly_cost * count. Refreshed CONCURRENTLY by the
+-- scheduler (refresh_payment_stats), which needs the unique index below.
+CREATE MATERIALIZED VIEW IF NOT EXISTS payment_month_stats AS
+SELECT date_trunc('month', p.due_date)::date AS month,
+       s.currency,
+       p.status,
+       COUNT(*) AS payments,
+       COALESCE(SUM(s.monthly_cost * s.count), 0) AS amount
+FROM payments p
+JOIN servers s ON s.id = p.server_id
+GROUP BY 1, 2, 3;
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_payment_month_stats
+    ON payment_month_stats (month, currency, status);
@@ -0,0 +1,9 @@
+-- Exchange rates: how many units of the base currency (BASE_CURRENCY) one
+-- unit of `currency` is worth on `rate_date`. The latest rate on or before
+-- a day is the effective one.
+CREATE TABLE IF NOT EXISTS fx_rates (
+    currency VARCHAR(10) NOT NULL,
+    rate_date DATE NOT NULL,
+    rate NUMERIC(18, 8) NOT NULL CHECK (rate > 0),
+    PRIMARY KEY (currency, rate_date)
+);
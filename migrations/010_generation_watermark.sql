@@ -0,0 +1,25 @@
+-- servers.generated_through: first day of the last month whose payment has
+-- been generated for the server (NULL = none yet). The generator only
+-- visits servers lagging behind its horizon. Changing the payment day or
+-- re-activating a server resets the watermark so it is regenerated.
+ALTER TABLE servers ADD COLUMN IF NOT EXISTS generated_through DATE;
+
+CREATE OR REPLACE FUNCTION servers_reset_generation_trg() RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.payment_day IS DISTINCT FROM OLD.payment_day
+       OR (NEW.is_active AND NOT OLD.is_active) THEN
+        NEW.generated_through := NULL;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS servers_reset_generation ON servers;
+CREATE TRIGGER servers_reset_generation
+    BEFORE UPDATE OF payment_day, is_active ON servers
+    FOR EACH ROW EXECUTE FUNCTION servers_reset_generation_trg();
+
+-- Lagging active servers: NULL or older watermarks.
+CREATE INDEX IF NOT EXISTS idx_servers_generated_through
+    ON servers (generated_through NULLS FIRST)
+    WHERE is_active = TRUE;
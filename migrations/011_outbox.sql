@@ -0,0 +1,23 @@
+-- Durable notification outbox. Rows are enqueued set-based by the
+-- scheduler (dedupe_key makes enqueueing idempotent) and delivered by
+-- workers on every replica, which claim batches with FOR UPDATE SKIP
+-- LOCKED. A claimed row's next_attempt_at is pushed forward as a lease,
+-- so rows held by a crashed worker become claimable again.
+CREATE TABLE IF NOT EXISTS outbox (
+    id BIGSERIAL PRIMARY KEY,
+    dedupe_key VARCHAR(100) UNIQUE NOT NULL,
+    kind VARCHAR(20) NOT NULL CHECK (kind IN ('due_3d', 'due_1d', 'problem')),
+    payment_id INTEGER NOT NULL REFERENCES payments(id) ON DELETE CASCADE,
+    status VARCHAR(10) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'sent', 'failed', 'dropped')),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    last_error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    sent_at TIMESTAMPTZ
+);
+
+CREATE INDEX IF NOT EXISTS idx_outbox_pending
+    ON outbox (next_attempt_at)
+    WHERE status = 'pending';
+
+CREATE INDEX IF NOT EXISTS idx_outbox_payment ON outbox (payment_id);
@@ -0,0 +1,10 @@
+-- Digest messages: one message stands for many payments. The ids are kept
+-- so the message can be paginated and acted on after it was sent.
+CREATE TABLE IF NOT EXISTS digests (
+    id SERIAL PRIMARY KEY,
+    kind VARCHAR(20) NOT NULL,
+    due_date DATE,
+    payment_type VARCHAR(20) NOT NULL,
+    payment_ids INTEGER[] NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
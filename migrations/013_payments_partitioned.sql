@@ -0,0 +1,141 @@
+-- payments range-partitioned by due_date, one partition per month
+-- (payments_YYYY_MM) plus payments_default for anything out of range.
+-- Queries bounded on due_date only scan the months they cover.
+--
+-- Partition keys must be part of every unique constraint, so the primary
+-- key becomes (id, due_date); ids still come from payments_id_seq and stay
+-- unique. Foreign keys cannot reference that, so the outbox -> payments
+-- ON DELETE CASCADE is replaced by a trigger.
+--
+-- Future months are created by payments_ensure_partitions() from the
+-- scheduler; closed months past the retention window are detached,
+-- dumped to gzip CSV and dropped (bot/archive.py).
+BEGIN;
+
+DROP MATERIALIZED VIEW IF EXISTS payment_month_stats;
+ALTER TABLE outbox DROP CONSTRAINT IF EXISTS outbox_payment_id_fkey;
+
+ALTER TABLE payments RENAME TO payments_unpartitioned;
+ALTER TABLE payments_unpartitioned RENAME CONSTRAINT payments_pkey TO payments_unpartitioned_pkey;
+ALTER TABLE payments_unpartitioned
+    RENAME CONSTRAINT payments_server_id_due_date_key TO payments_unpartitioned_server_id_due_date_key;
+DROP INDEX IF EXISTS idx_payments_pending_due;
+DROP INDEX IF EXISTS idx_payments_problem_due;
+
+CREATE TABLE payments (
+    id INTEGER NOT NULL DEFAULT nextval('payments_id_seq'),
+    server_id INTEGER NOT NULL REFERENCES servers(id) ON DELETE CASCADE,
+    due_date DATE NOT NULL,
+    status VARCHAR(20) NOT NULL DEFAULT 'pending' CHECK (status IN ('pending', 'paid', 'confirmed', 'problem')),
+    paid_at TIMESTAMP,
+    notified_3d BOOLEAN NOT NULL DEFAULT FALSE,
+    notified_1d BOOLEAN NOT NULL DEFAULT FALSE,
+    PRIMARY KEY (id, due_date),
+    UNIQUE (server_id, due_date)
+) PARTITION BY RANGE (due_date);
+
+ALTER SEQUENCE payments_id_seq OWNED BY payments.id;
+
+CREATE TABLE payments_default PARTITION OF payments DEFAULT;
+
+CREATE INDEX idx_payments_pending_due ON payments (due_date) WHERE status = 'pending';
+CREATE INDEX idx_payments_problem_due ON payments (due_date) WHERE status = 'problem';
+
+-- Creates the missing monthly partitions for [p_from, p_to]. Rows that
+-- landed in payments_default for such a month are moved into it first,
+-- since a partition cannot be attached over rows the default still holds.
+CREATE OR REPLACE FUNCTION payments_ensure_partitions(p_from DATE, p_to DATE) RETURNS INTEGER AS $$
+DECLARE
+    m DATE;
+    part TEXT;
+    created INTEGER := 0;
+BEGIN
+    FOR m IN
+        SELECT g::date FROM generate_series(date_trunc('month', p_from), date_trunc('month', p_to), INTERVAL '1 month') g
+    LOOP
+        part := 'payments_' || to_char(m, 'YYYY_MM');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+        EXECUTE format('CREATE TABLE %I (LIKE payments INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', part);
+        -- A move is not a delete: keep the rows' outbox messages.
+        PERFORM set_config('payments.moving', 'on', true);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM payments_default WHERE due_date >= %L AND due_date < %L RETURNING *)
+             INSERT INTO %I SELECT * FROM moved',
+            m, (m + INTERVAL '1 month')::date, part
+        );
+        PERFORM set_config('payments.moving', 'off', true);
+        EXECUTE format(
+            'ALTER TABLE payments ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part, m, (m + INTERVAL '1 month')::date
+        );
+        created := created + 1;
+    END LOOP;
+    RETURN created;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Detaches a monthly partition unless it still holds open (pending or
+-- problem) payments; those months stay attached until they are settled.
+-- Open rows are looked for before DETACH, which locks all of payments, so
+-- a month that is not ready is skipped without blocking anything. The
+-- lookups only read the partial pending/problem indexes, which are empty
+-- for a settled month.
+CREATE OR REPLACE FUNCTION payments_detach_partition(p_table TEXT) RETURNS BOOLEAN AS $$
+DECLARE
+    open_query TEXT := format('SELECT EXISTS (SELECT 1 FROM %I WHERE status IN (''pending'', ''problem''))', p_table);
+    has_open BOOLEAN;
+BEGIN
+    EXECUTE open_query INTO has_open;
+    IF has_open THEN
+        RETURN FALSE;
+    END IF;
+    BEGIN
+        EXECUTE format('ALTER TABLE payments DETACH PARTITION %I', p_table);
+        -- Re-checked under the DETACH lock, in case the month reopened meanwhile.
+        EXECUTE open_query INTO has_open;
+        IF has_open THEN
+            RAISE EXCEPTION 'partition % has open payments', p_table USING ERRCODE = 'object_in_use';
+        END IF;
+    EXCEPTION WHEN object_in_use THEN
+        RETURN FALSE;
+    END;
+    RETURN TRUE;
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT payments_ensure_partitions(
+    LEAST((SELECT MIN(due_date) FROM payments_unpartitioned), CURRENT_DATE),
+    (CURRENT_DATE + INTERVAL '3 months')::date
+);
+
+INSERT INTO payments SELECT * FROM payments_unpartitioned;
+DROP TABLE payments_unpartitioned;
+
+CREATE OR REPLACE FUNCTION payments_delete_outbox_trg() RETURNS TRIGGER AS $$
+BEGIN
+    IF current_setting('payments.moving', true) IS DISTINCT FROM 'on' THEN
+        DELETE FROM outbox WHERE payment_id = OLD.id;
+    END IF;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER payments_delete_outbox
+    AFTER DELETE ON payments
+    FOR EACH ROW EXECUTE FUNCTION payments_delete_outbox_trg();
+
+-- Same definition as 008; it depended on the old table.
+CREATE MATERIALIZED VIEW payment_month_stats AS
+SELECT date_trunc('month', p.due_date)::date AS month,
+       s.currency,
+       p.status,
+       COUNT(*) AS payments,
+       COALESCE(SUM(s.monthly_cost * s.count), 0) AS amount
+FROM payments p
+JOIN servers s ON s.id = p.server_id
+GROUP BY 1, 2, 3;
+
+CREATE UNIQUE INDEX idx_payment_month_stats
+    ON payment_month_stats (month, currency, status);
+
+COMMIT;
@@ -0,0 +1,25 @@
+-- Cross-replica invalidation of cached list screens (bot/screens.py).
+-- Any statement that changes what the hoster/server lists show NOTIFYs
+-- data_version; every replica bumps its models.data_version() on it.
+-- Identical notifications within a transaction are delivered once.
+CREATE OR REPLACE FUNCTION notify_data_version_trg() RETURNS TRIGGER AS $$
+BEGIN
+    PERFORM pg_notify('data_version', TG_TABLE_NAME);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- generated_through is bookkeeping the lists do not show, so the daily
+-- payment generation does not invalidate them.
+DROP TRIGGER IF EXISTS servers_data_version ON servers;
+CREATE TRIGGER servers_data_version
+    AFTER INSERT OR DELETE
+          OR UPDATE OF hoster, server_name, payment_day, payment_type, monthly_cost, currency, count, is_active
+    ON servers
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_data_version_trg();
+
+-- Hoster totals are shown converted into the base currency.
+DROP TRIGGER IF EXISTS fx_rates_data_version ON fx_rates;
+CREATE TRIGGER fx_rates_data_version
+    AFTER INSERT OR UPDATE OR DELETE ON fx_rates
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_data_version_trg();